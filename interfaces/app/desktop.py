@@ -1,12 +1,12 @@
 import os
-import shutil
 import sys
 from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout,
                              QHBoxLayout, QFileDialog, QListWidget, QLabel,
-                             QGridLayout, QSplitter, QMessageBox, QFrame, QSizePolicy, QDialog)
-from PyQt5.QtCore import Qt, QDir, QSize, QPoint, QUrl
+                             QGridLayout, QSplitter, QMessageBox, QFrame, QSizePolicy, QDialog, QProgressBar)
+from PyQt5.QtCore import Qt, QDir, QSize, QPoint, QUrl, QThread, pyqtSignal
 from PyQt5.QtGui import QPalette, QColor, QIcon, QPixmap, QDesktopServices, QFont
 
+COPY_CHUNK_SIZE = 8 * 1024 * 1024  # Bytes copied between progress updates and cancel checks
 
 # Define the black and yellow theme for dark mode
 DARK_THEME = {
@@ -81,6 +81,59 @@ class CustomMessageBox(QDialog):
         self.setFixedSize(350, 150)
 
 
+class ProcessingWorker(QThread):
+    """Processes the queued videos on a background thread so the window stays responsive."""
+    progress = pyqtSignal(int)  # Progress of the whole queue in percent
+    file_started = pyqtSignal(int, str)  # Queue index and path of the video being processed
+    file_finished = pyqtSignal(str)  # Path of a video that was copied successfully
+    file_failed = pyqtSignal(str, str)  # Path of the video and the error message
+    queue_finished = pyqtSignal(list, bool)  # Created files and whether the queue was cancelled
+
+    def __init__(self, videos, target_directory, parent=None):
+        super().__init__(parent)
+        self.videos = list(videos)
+        self.target_directory = target_directory
+
+    def run(self):
+        """Copies every video to 'run_func_test_<name>' chunk by chunk, reporting byte-level progress."""
+        sizes = [os.path.getsize(video) if os.path.isfile(video) else 0 for video in self.videos]
+        total_bytes = max(1, sum(sizes))
+        done_bytes = 0
+        created = []
+
+        for index, (video, size) in enumerate(zip(self.videos, sizes)):
+            if self.isInterruptionRequested():
+                break
+            self.file_started.emit(index, video)
+
+            target_path = os.path.join(self.target_directory, f"run_func_test_{os.path.basename(video)}")
+            part_path = target_path + '.part'  # A cancelled or failed copy never looks like a finished file
+            file_start = done_bytes
+            try:
+                with open(video, 'rb') as source, open(part_path, 'wb') as target:
+                    while not self.isInterruptionRequested():
+                        chunk = source.read(COPY_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        target.write(chunk)
+                        done_bytes += len(chunk)
+                        self.progress.emit(int(done_bytes * 100 / total_bytes))
+                if self.isInterruptionRequested():
+                    os.remove(part_path)
+                    break
+                os.replace(part_path, target_path)
+                created.append(target_path)
+                self.file_finished.emit(video)
+            except OSError as e:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                done_bytes = file_start + size
+                self.progress.emit(int(done_bytes * 100 / total_bytes))
+                self.file_failed.emit(video, str(e))
+
+        self.queue_finished.emit(created, self.isInterruptionRequested())
+
+
 class VideoUploader(QWidget):
     def __init__(self):
         super().__init__()
@@ -125,6 +178,10 @@ class VideoUploader(QWidget):
         self.run_button = QPushButton('Run')
         self.run_button.clicked.connect(self.run_process)
 
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.cancel_process)
+        self.cancel_button.setEnabled(False)
+
         self.language_button = QPushButton('Switch to Ukrainian')
         self.language_button.clicked.connect(self.switch_language)
         self.language = 'EN'
@@ -135,11 +192,13 @@ class VideoUploader(QWidget):
         self.browse_button.setFixedHeight(button_height)
         self.refresh_button.setFixedHeight(button_height)
         self.run_button.setFixedHeight(button_height)
+        self.cancel_button.setFixedHeight(button_height)
         self.language_button.setFixedHeight(button_height)
 
         # Place 'Run' and 'Switch to Ukrainian' buttons above 'Select Directory' and 'Refresh'
         left_button_layout = QHBoxLayout()
         left_button_layout.addWidget(self.run_button)
+        left_button_layout.addWidget(self.cancel_button)
         left_button_layout.addWidget(self.language_button)
 
         # Directory selection, Browse, and Refresh button layout
@@ -171,9 +230,16 @@ class VideoUploader(QWidget):
         self.drop_label.setAcceptDrops(True)
         self.setAcceptDrops(True)
 
+        # Progress of the queued videos, shown under the drop area
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(False)
+
         # Make the drag and drop area take up the full height of the window
         drop_layout = QVBoxLayout()
         drop_layout.addWidget(self.drop_label)
+        drop_layout.addWidget(self.progress_bar)
 
         center_widget = QWidget()
         center_widget.setLayout(drop_layout)
@@ -191,10 +257,14 @@ class VideoUploader(QWidget):
         # Apply the initial theme (dark mode)
         self.apply_theme(DARK_THEME)
 
-        # Store the selected video path
-        self.selected_video = None
+        # Store the queued video paths
+        self.selected_videos = []
         self.selected_directory = None
 
+        # Background worker of the current run and the errors it reported
+        self.worker = None
+        self.failed_videos = []
+
     def create_custom_title_bar(self, layout):
         """Creates a custom title bar with dark color and a window logo."""
         title_bar = QHBoxLayout()
@@ -311,11 +381,13 @@ class VideoUploader(QWidget):
         self.refresh_button.setStyleSheet(f"background-color: {theme['button_background']}; color: {theme['text_color']}; border-radius: 10px;")
         self.browse_button.setStyleSheet(f"background-color: {theme['run_button_color']}; color: {theme['text_color']}; border-radius: 10px;")
         self.run_button.setStyleSheet(f"background-color: {theme['run_button_color']}; color: {theme['text_color']}; border-radius: 10px;")
+        self.cancel_button.setStyleSheet(f"background-color: {theme['run_button_color']}; color: {theme['text_color']}; border-radius: 10px;")
         self.language_button.setStyleSheet(f"background-color: {theme['run_button_color']}; color: {theme['text_color']}; border-radius: 10px;")
 
         # Update the styles for drop area and file list using custom theme colors
         self.drop_label.setStyleSheet(f"border: 2px dashed {theme['border']}; padding: 20px; color: {theme['drop_label_text_color']}; background-color: {theme['background']};")
         self.file_list.setStyleSheet(f"background-color: {theme['background']}; color: {theme['file_list_text_color']}; border: 1px solid {theme['border']};")
+        self.progress_bar.setStyleSheet(f"QProgressBar {{ border: 1px solid {theme['border']}; border-radius: 5px; text-align: center; color: {theme['drop_label_text_color']}; }} QProgressBar::chunk {{ background-color: {theme['run_button_color']}; }}")
 
         # Ensure the theme for the rest of the interface
         self.setStyleSheet(f"background-color: {theme['background']}; color: {theme['text_color']};")
@@ -338,11 +410,27 @@ class VideoUploader(QWidget):
                 self.file_list.addItem(file)
 
     def browse_file(self):
-        """Opens a file dialog to select a video file."""
-        video_path, _ = QFileDialog.getOpenFileName(self, "Select Video", "", "Video Files (*.mp4 *.avi *.mkv)")
-        if video_path:
-            self.selected_video = video_path
-            self.drop_label.setText(f"Selected: {os.path.basename(video_path)}")
+        """Opens a file dialog to add video files to the queue."""
+        video_paths, _ = QFileDialog.getOpenFileNames(self, "Select Video", "", "Video Files (*.mp4 *.avi *.mkv)")
+        if video_paths:
+            self.add_videos(video_paths)
+
+    def add_videos(self, paths):
+        """Adds videos to the processing queue and lists them in the drop area."""
+        for path in paths:
+            if os.path.isfile(path) and path not in self.selected_videos:
+                self.selected_videos.append(path)
+        self.update_drop_label()
+
+    def update_drop_label(self):
+        """Lists the queued videos in the drop area, or shows the hint when the queue is empty."""
+        if self.selected_videos:
+            names = "\n".join(os.path.basename(video) for video in self.selected_videos)
+            self.drop_label.setText(f"Selected ({len(self.selected_videos)}):\n{names}")
+        elif self.language == 'EN':
+            self.drop_label.setText('Drag and drop video files here\nOr click "Browse" to select')
+        else:
+            self.drop_label.setText('Перетягніть відео сюди\nАбо натисніть "Огляд", щоб вибрати відео')
 
     def open_file(self, item):
         """Open file on double-click."""
@@ -357,18 +445,20 @@ class VideoUploader(QWidget):
             event.ignore()
 
     def dropEvent(self, event):
-        """Handles the drop event and sets the selected video."""
+        """Handles the drop event and queues every dropped video."""
         files = [url.toLocalFile() for url in event.mimeData().urls()]
         if files:
-            self.selected_video = files[0]
-            self.drop_label.setText(f"Selected: {os.path.basename(self.selected_video)}")
+            self.add_videos(files)
             event.acceptProposedAction()
 
     def run_process(self):
-        """Copies and renames the selected video to 'run_func_test'."""
+        """Starts copying the queued videos to 'run_func_test_<name>' on a background thread."""
         current_theme = DARK_THEME if self.dark_mode else LIGHT_THEME
 
-        if not self.selected_video:
+        if self.worker is not None:
+            return
+
+        if not self.selected_videos:
             msg = CustomMessageBox(
                 title="No Video", 
                 message="Please select a video before running.", 
@@ -388,24 +478,85 @@ class VideoUploader(QWidget):
             msg.exec_()
             return
 
-        target_path = os.path.join(self.selected_directory, "run_func_test.mp4")
-        try:
-            shutil.copy(self.selected_video, target_path)
+        # The worker only reports through signals, so all widgets are still updated on the GUI thread
+        self.failed_videos = []
+        self.worker = ProcessingWorker(self.selected_videos, self.selected_directory, self)
+        self.worker.progress.connect(self.progress_bar.setValue)
+        self.worker.file_started.connect(self.on_file_started)
+        self.worker.file_finished.connect(self.on_file_finished)
+        self.worker.file_failed.connect(self.on_file_failed)
+        self.worker.queue_finished.connect(self.on_queue_finished)
+
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.run_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.worker.start()
+
+    def cancel_process(self):
+        """Asks the worker to stop after the current chunk."""
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.cancel_button.setEnabled(False)
+
+    def on_file_started(self, index, path):
+        """Shows which queued video is being processed."""
+        self.progress_bar.setFormat(f"{index + 1}/{len(self.worker.videos)} {os.path.basename(path)}: %p%")
+
+    def on_file_finished(self, path):
+        """Removes a copied video from the queue, so a later run after a failure or cancel does not copy it again."""
+        if path in self.selected_videos:
+            self.selected_videos.remove(path)
+            self.update_drop_label()
+
+    def on_file_failed(self, path, error):
+        """Collects the errors to show them once the queue is finished."""
+        self.failed_videos.append(f"{os.path.basename(path)}: {error}")
+
+    def on_queue_finished(self, created, cancelled):
+        """Resets the controls and reports the result of the run."""
+        current_theme = DARK_THEME if self.dark_mode else LIGHT_THEME
+
+        self.worker.wait()
+        # Copied videos already left the queue (on_file_finished); failed, skipped and newly added ones stay
+        processed = self.worker.videos
+        self.worker.deleteLater()
+        self.worker = None
+        self.run_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.progress_bar.setVisible(False)
+        self.refresh_directory()
+
+        if self.failed_videos:
             msg = CustomMessageBox(
-                title="Success", 
-                message=f"Video copied and renamed to 'run_func_test.mp4' in {self.selected_directory}", 
-                icon_type='info',  # Use 'info' icon
+                title="Error", 
+                message="Failed to copy:\n" + "\n".join(self.failed_videos), 
+                icon_type='error',  # Use 'error' icon
                 current_theme=current_theme
             )
-            msg.exec_()
-        except Exception as e:
+        elif cancelled:
             msg = CustomMessageBox(
-                title="Error", 
-                message=f"Failed to copy the file: {e}", 
-                icon_type='error',  # Use 'error' icon
+                title="Cancelled", 
+                message=f"Cancelled after {len(created)} of {len(processed)} videos", 
+                icon_type='warning',  # Use 'warning' icon
                 current_theme=current_theme
             )
-            msg.exec_()
+        else:
+            msg = CustomMessageBox(
+                title="Success", 
+                message=f"{len(created)} video(s) copied to {self.selected_directory}", 
+                icon_type='info',  # Use 'info' icon
+                current_theme=current_theme
+            )
+        msg.exec_()
+
+    def closeEvent(self, event):
+        """Stops a running worker before the window is closed."""
+        if self.worker is not None:
+            self.worker.queue_finished.disconnect()  # No result message for a window that is closing
+            self.worker.requestInterruption()
+            self.worker.wait()
+        event.accept()
 
     def switch_language(self):
         """Switches between English and Ukrainian."""
@@ -414,19 +565,24 @@ class VideoUploader(QWidget):
             self.dir_button.setText('Вибрати каталог')
             self.browse_button.setText('Огляд')
             self.run_button.setText('Запуск')
-            self.drop_label.setText('Перетягніть відео сюди\nАбо натисніть "Огляд", щоб вибрати відео')
+            self.cancel_button.setText('Скасувати')
             self.language_button.setText('Переключитися на англійську')
         else:
             self.language = 'EN'
             self.dir_button.setText('Select Directory')
             self.browse_button.setText('Browse')
             self.run_button.setText('Run')
-            self.drop_label.setText('Drag and drop video files here\nOr click "Browse" to select')
+            self.cancel_button.setText('Cancel')
             self.language_button.setText('Switch to Ukrainian')
+        self.update_drop_label()  # Keeps the list of queued videos
 
 
-if __name__ == '__main__':
+def run():
     app = QApplication(sys.argv)
     uploader = VideoUploader()
     uploader.show()
     sys.exit(app.exec_())
+
+
+if __name__ == '__main__':
+    run()
@@ -1,7 +1,36 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import telebot
 from telebot import types
 from tg_bot_config import TOKEN, WHITE_LIST, TRANSLATIONS
 
+# The processing code lives in the top-level scripts folder
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+
+# Processing settings
+MODEL_PATH = 'models/ML-DAN_v4.0.keras'
+MODEL_PROFILE = 'v4'
+MODEL_SERVER = None       # Address of a running scripts/model_server.py, e.g. 'http://127.0.0.1:8765' (None - load the model in the bot)
+SPOOL_DIR = 'spool'       # Working files of the jobs (the model daemon only accepts files in here)
+CACHE_DIR = 'spool/cache' # Results of earlier requests, keyed by file content (shared with the web app; None - no cache)
+WATERMARK_IMAGE = None    # Image overlaid on "Enhance video" results, e.g. 'scripts/images/watermark.png' (None - no watermark)
+MAX_WORKERS = 2           # Files processed at the same time
+MAX_QUEUED_JOBS = 32      # Files accepted (processing + waiting) before new uploads are refused
+PROGRESS_INTERVAL = 5.0   # Minimum seconds between edits of a progress message (Telegram rate-limits edits)
+
+# TRANSLATIONS keys used by the file processing (missing keys are shown as is by translate()):
+# send_file, job_queued, queue_full, downloading_file, processing_started,
+# processing_progress (with a {} placeholder for the processed duration), uploading_result, processing_failed
+
+# Output file extension of every operation (same as media_pipeline.OPERATIONS)
+OPERATIONS = {'enhance_video': '.mp4', 'enhance_audio': '.wav', 'extract_audio': '.mp3'}
 
 # Initialize the bot
 bot = telebot.TeleBot(TOKEN)
@@ -9,6 +38,13 @@ bot = telebot.TeleBot(TOKEN)
 # Store user language preferences (default to Ukrainian)
 user_languages = {}
 
+# Operation chosen with the menu buttons, applied to the next file the user sends
+pending_operations = {}
+
+# Background workers: handlers only enqueue files, so polling never waits for downloads, ffmpeg or the model
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+job_slots = threading.BoundedSemaphore(MAX_QUEUED_JOBS)
+
 # Helper function to get the correct translation for a user
 def translate(user_id, key):
     lang = user_languages.get(user_id, 'uk')  # Default to Ukrainian if no language is set
@@ -110,18 +146,107 @@ def main_menu_handler(message):
 @whitelist_only
 def enchance_audio_on_video(message):
     user_id = message.from_user.id
-    bot.send_message(message.chat.id, translate(user_id, 'success'))
+    pending_operations[user_id] = 'enhance_video'
+    bot.send_message(message.chat.id, translate(user_id, 'send_file'))
 
 @whitelist_only
 def enchance_audio(message):
     user_id = message.from_user.id
-    bot.send_message(message.chat.id, translate(user_id, 'success'))
+    pending_operations[user_id] = 'enhance_audio'
+    bot.send_message(message.chat.id, translate(user_id, 'send_file'))
 
 @whitelist_only
 def get_audio_from_video(message):
     user_id = message.from_user.id
-    bot.send_message(message.chat.id, translate(user_id, 'success'))
+    pending_operations[user_id] = 'extract_audio'
+    bot.send_message(message.chat.id, translate(user_id, 'send_file'))
+
+# Operation used when a file arrives without choosing one in the menu first
+def default_operation(message):
+    if message.content_type in ('video', 'video_note'):
+        return 'enhance_video'
+    if message.content_type == 'document' and (message.document.mime_type or '').startswith('video/'):
+        return 'enhance_video'
+    return 'enhance_audio'
+
+# Edit the progress message, ignoring "message is not modified" and similar API errors
+def edit_progress(chat_id, message_id, text):
+    try:
+        bot.edit_message_text(text, chat_id, message_id)
+    except telebot.apihelper.ApiException:
+        pass
+
+# Progress callback for media_pipeline.process_media that edits the message at most every PROGRESS_INTERVAL seconds
+def progress_updater(chat_id, message_id, user_id):
+    last_update = [0.0]
+
+    def update(seconds):
+        now = time.monotonic()
+        if now - last_update[0] >= PROGRESS_INTERVAL:
+            last_update[0] = now
+            minutes, seconds = divmod(int(seconds), 60)
+            edit_progress(chat_id, message_id, translate(user_id, 'processing_progress').format(f"{minutes}:{seconds:02d}"))
+    return update
+
+# Worker thread: download the file, run the pipeline and send the result back
+def process_upload(chat_id, user_id, file_id, operation, message_id):
+    try:
+        os.makedirs(SPOOL_DIR, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=SPOOL_DIR) as work_dir:
+            edit_progress(chat_id, message_id, translate(user_id, 'downloading_file'))
+            file_info = bot.get_file(file_id)
+            input_file = os.path.join(work_dir, 'input' + os.path.splitext(file_info.file_path)[1])
+            with open(input_file, 'wb') as file:
+                file.write(bot.download_file(file_info.file_path))
+
+            edit_progress(chat_id, message_id, translate(user_id, 'processing_started'))
+            output_file = os.path.join(work_dir, 'result' + OPERATIONS[operation])
+            progress = progress_updater(chat_id, message_id, user_id)
+            if MODEL_SERVER:
+                # The daemon keeps the model warm, the bot only waits for the result
+                from model_server import ModelClient
+                ModelClient(MODEL_SERVER).process(operation, input_file, output_file, progress=progress)
+            else:
+                # Imported here so that TensorFlow is loaded by the first job and not at bot start-up
+                from media_pipeline import process_media
+                process_media(operation, input_file, output_file, MODEL_PATH, MODEL_PROFILE, progress=progress,
+                              cache_dir=CACHE_DIR, watermark_image=WATERMARK_IMAGE)
+
+            edit_progress(chat_id, message_id, translate(user_id, 'uploading_result'))
+            with open(output_file, 'rb') as result:
+                if operation == 'enhance_video':
+                    bot.send_video(chat_id, result, supports_streaming=True)
+                else:
+                    bot.send_audio(chat_id, result)
+        edit_progress(chat_id, message_id, translate(user_id, 'success'))
+    except Exception as e:
+        print(f"Помилка обробки файлу {file_id}: {e}")
+        edit_progress(chat_id, message_id, translate(user_id, 'processing_failed'))
+    finally:
+        job_slots.release()
+
+# Files sent by whitelisted users are queued for the background workers
+@bot.message_handler(content_types=['document', 'audio', 'voice', 'video', 'video_note'])
+@whitelist_only
+def media_handler(message):
+    user_id = message.from_user.id
+    operation = pending_operations.pop(user_id, None) or default_operation(message)
+    if not job_slots.acquire(blocking=False):
+        bot.reply_to(message, translate(user_id, 'queue_full'))
+        return
+
+    try:
+        media = getattr(message, message.content_type)
+        progress_message = bot.reply_to(message, translate(user_id, 'job_queued'))
+        executor.submit(process_upload, message.chat.id, user_id, media.file_id, operation, progress_message.message_id)
+    except Exception:
+        job_slots.release()
+        raise
 
 # Run the bot
-if __name__ == '__main__':
+def run():
     bot.polling(none_stop=True)
+
+
+if __name__ == '__main__':
+    run()
@@ -1,9 +1,11 @@
 import os
-import json
-from flask import Flask, render_template, request, flash, redirect, url_for, session
-from werkzeug.utils import secure_filename
-from io import BytesIO
+import time
+from flask import (Flask, render_template, request, flash, redirect, url_for, session, send_file, jsonify, abort, g,
+                   Response)
 import website_config
+from jobs import JobQueue
+from user_store import UserStore
+import metrics  # scripts/metrics.py, importable once jobs has extended sys.path
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
@@ -12,31 +14,44 @@ app.secret_key = 'your_secret_key'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mkv'}
 
 # Global variables
-uploaded_file = None
-USERS_FILE = 'users.json'  # Path to the JSON file for user data
+USERS_FILE = 'users.json'  # Legacy JSON user data, imported into USERS_DB once
+USERS_DB = 'users.db'  # SQLite database with the registered users
+SPOOL_DIR = 'spool'  # Directory for uploaded files and processing results
+MODEL_PATH = 'models/ML-DAN_v4.0.keras'  # Model used by the "Enhance" buttons
+MODEL_PROFILE = 'v4'  # Feature settings of the model (see scripts/denoise_audio.py)
+MAX_WORKERS = None  # Number of processing worker processes (None - one per CPU core)
+MODEL_SERVER = None  # Address of a running scripts/model_server.py, e.g. 'http://127.0.0.1:8765' (None - load the model in the workers)
+CACHE_DIR = os.path.join(SPOOL_DIR, 'cache')  # Results of earlier requests, keyed by file content (None - no cache)
+WATERMARK_IMAGE = None  # Image overlaid on "Enhance video" results, e.g. 'scripts/images/watermark.png' (None - no watermark)
+USE_X_SENDFILE = False  # Let a front-end server (nginx/Apache) send result files itself via X-Sendfile
+
+app.config['USE_X_SENDFILE'] = USE_X_SENDFILE
+
+# Registered users (indexed lookups, safe for several worker processes)
+user_store = UserStore(USERS_DB, json_path=USERS_FILE)
+
+# Uploads are kept on disk and processed in background worker processes
+job_queue = JobQueue(SPOOL_DIR, MODEL_PATH, MODEL_PROFILE, max_workers=MAX_WORKERS, server_address=MODEL_SERVER,
+                     cache_dir=CACHE_DIR, watermark_image=WATERMARK_IMAGE)
+
+# Time every request, so slow pages show up in /metrics next to the pipeline stages
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def observe_request_time(response):
+    if 'request_start' in g:
+        metrics.REQUEST_SECONDS.observe(request.endpoint or 'unknown', time.perf_counter() - g.request_start)
+    return response
 
 # Function to check allowed extensions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Load users from the JSON file
-def load_users():
-    if not os.path.exists(USERS_FILE):
-        with open(USERS_FILE, 'w') as file:
-            json.dump({"users": []}, file)
-    with open(USERS_FILE, 'r') as file:
-        return json.load(file)
-
-# Save users to the JSON file
-def save_users(users):
-    with open(USERS_FILE, 'w') as file:
-        json.dump(users, file)
-
 # Home page route
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    global uploaded_file
-
     # Set default language if not set
     if 'language' not in session:
         session['language'] = 'en'  # Default language
@@ -52,24 +67,112 @@ def index():
         if 'file' in request.files:
             file = request.files['file']
             if file and allowed_file(file.filename):
-                uploaded_file = file.read()
+                # Stream the upload to the spool directory instead of reading it into memory
+                session['upload_id'] = job_queue.save_upload(file)
                 flash(website_config.TRANSLATIONS[session['language']]['file_uploaded'], 'success')
             else:
                 flash(website_config.TRANSLATIONS[session['language']]['invalid_file'], 'danger')
 
         # Handle processing (Enhance buttons)
         if 'enhance' in request.form:
-            if uploaded_file:
-                return send_file(BytesIO(uploaded_file), as_attachment=True, download_name="processed_video.mp4")
+            if job_queue.upload_path(session.get('upload_id')):
+                operation = request.form['enhance'] or 'enhance_video'
+                try:
+                    job_id = job_queue.submit(session['upload_id'], operation)
+                except ValueError:
+                    abort(400)
+                session['job_id'] = job_id
+                if request.accept_mimetypes.best == 'application/json':
+                    return jsonify(job_queue.status(job_id)), 202
+                flash(website_config.TRANSLATIONS[session['language']]['job_queued'], 'success')
+                return redirect(url_for('index'))
             else:
                 flash(website_config.TRANSLATIONS[session['language']]['no_file_selected'], 'danger')
 
     return render_template(
         'index.html',
         language=session['language'],
-        translations=website_config.TRANSLATIONS[session['language']]
+        translations=website_config.TRANSLATIONS[session['language']],
+        job=job_queue.status(session.get('job_id'))
     )
 
+# Job status route (polled by the client after pressing an "Enhance" button)
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
+
+# Result download route
+@app.route('/jobs/<job_id>/download', methods=['GET'])
+def job_download(job_id):
+    result_path = job_queue.result_path(job_id)
+    if result_path is None:
+        abort(404)
+    extension = os.path.splitext(result_path)[1]
+    # Served from the file (the WSGI server can use sendfile), with ETag/Last-Modified
+    # and Range support, so an interrupted download resumes instead of starting over
+    return send_file(result_path, as_attachment=True, download_name=f"processed{extension}", conditional=True,
+                     etag=True, max_age=0)
+
+# Resumable upload routes: POST creates an upload, PUT appends a chunk at Upload-Offset,
+# GET tells a client where to resume after an interrupted transfer
+@app.route('/uploads', methods=['POST'])
+def upload_start():
+    data = request.get_json(silent=True) or {}
+    filename = data.get('filename', '')
+    if not allowed_file(filename) or type(data.get('size')) is not int:  # bool is a subclass of int
+        abort(400)
+    try:
+        upload_id = job_queue.start_upload(filename, data['size'])
+    except ValueError:
+        abort(400)
+    return jsonify(job_queue.upload_offset(upload_id)), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    status = job_queue.upload_offset(upload_id)
+    if status is None:
+        abort(404)
+    return jsonify(status)
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        abort(400)
+    try:
+        # request.stream is read piece by piece, the chunk is never held in memory as a whole
+        status = job_queue.append_upload(upload_id, offset, request.stream)
+    except KeyError:
+        abort(404)
+    except ValueError:
+        return jsonify(job_queue.upload_offset(upload_id)), 409
+
+    if status['complete']:
+        session['upload_id'] = upload_id
+        flash(website_config.TRANSLATIONS[session.get('language', 'en')]['file_uploaded'], 'success')
+    return jsonify(status)
+
+# Prometheus metrics route: stage timings, request latency, queue depth and cache hit rate
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    text = metrics.render()
+    text += metrics.format_metric('mldan_queue_depth', 'gauge', 'Jobs queued or running.', job_queue.queue_depth())
+    text += metrics.format_metric('mldan_running_jobs', 'gauge', 'Jobs being processed by a worker.',
+                                  job_queue.running_jobs())
+    text += metrics.format_metric('mldan_workers', 'gauge', 'Size of the worker pool.', job_queue.max_workers)
+    cache_stats = job_queue.cache_stats()
+    if cache_stats is not None:
+        text += metrics.format_metric('mldan_cache_hits_total', 'counter', 'Result cache hits.', cache_stats['hits'])
+        text += metrics.format_metric('mldan_cache_misses_total', 'counter', 'Result cache misses.',
+                                      cache_stats['misses'])
+        text += metrics.format_metric('mldan_cache_hit_ratio', 'gauge', 'Result cache hit rate.',
+                                      cache_stats['hit_rate'])
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
 # Registration route
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -77,16 +180,12 @@ def register():
         username = request.form.get('username')
         password = request.form.get('password')
 
-        # Load existing users
-        users = load_users()
-
-        # Check if user already exists
-        if any(user['username'] == username for user in users['users']):
+        # Add new user; the insert fails if the user already exists
+        if not username or not password:
+            flash(website_config.TRANSLATIONS[session['language']]['invalid_credentials'], 'danger')
+        elif not user_store.add(username, password):
             flash(website_config.TRANSLATIONS[session['language']]['user_exists'], 'danger')
         else:
-            # Add new user
-            users['users'].append({'username': username, 'password': password})
-            save_users(users)
             flash(website_config.TRANSLATIONS[session['language']]['registration_successful'], 'success')
             return redirect(url_for('index'))  # Redirect to main page after registration
 
@@ -99,11 +198,8 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
 
-        # Load existing users
-        users = load_users()
-
         # Check if credentials are correct
-        if any(user['username'] == username and user['password'] == password for user in users['users']):
+        if user_store.check(username, password):
             # Store user details in session
             session['username'] = username
             session['password'] = password
@@ -144,5 +240,9 @@ def my_account():
     )
 
 
+def run(host='127.0.0.1', port=5000, debug=True):
+    app.run(host=host, port=port, debug=debug)
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    run()
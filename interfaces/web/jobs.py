@@ -0,0 +1,473 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from werkzeug.utils import secure_filename
+
+# The processing code lives in the top-level scripts folder
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'scripts'))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+
+import metrics
+from result_cache import HASH_CHUNK_SIZE, ResultCache, file_digest, model_version, stream_digest
+
+JOB_TTL = 60 * 60  # Seconds to keep uploads and finished results on disk
+
+# Files kept next to an upload in the spool directory. They are on disk (not in
+# memory) so that every web worker process sees the same upload state.
+PART_SUFFIX = '.part'                # Data of an unfinished resumable upload
+UPLOAD_INFO_SUFFIX = '.upload.json'  # Declared size of an unfinished resumable upload
+DIGEST_SUFFIX = '.sha256'            # Content hash of a finished upload, used by the result cache
+SIDECAR_SUFFIXES = (PART_SUFFIX, '.json', DIGEST_SUFFIX)  # Never valid upload id endings
+STATUS_SUFFIX = '.job.json'          # State of a job in the results folder, read by every web worker
+
+
+def run_job(operation: str, input_file: str, output_file: str, model_path: str, profile: str,
+            cache_dir: Optional[str] = None, input_digest: Optional[str] = None,
+            watermark_image: Optional[str] = None) -> Dict:
+    """
+    Worker process entry point: split -> denoise -> combine one uploaded file.
+
+    Returns:
+        Dict: Seconds per pipeline stage (``stages``) and in total (``seconds``),
+        recorded by the web process in ``JobQueue._record_timings``.
+    """
+    # Imported here so that the web app starts without the pipeline. submit() also imports it (numpy and
+    # soundfile) in the web process; only the worker processes load TensorFlow, in get_model
+    from media_pipeline import get_cache, process_media, process_media_cached
+
+    start = time.perf_counter()
+    with metrics.job_timings(observe=False) as stages:
+        if cache_dir is not None:
+            process_media_cached(get_cache(cache_dir), operation, input_file, output_file, model_path, profile,
+                                 input_digest=input_digest, watermark_image=watermark_image)
+        else:
+            process_media(operation, input_file, output_file, model_path, profile, watermark_image=watermark_image)
+    return {'operation': operation, 'stages': stages, 'seconds': time.perf_counter() - start}
+
+
+def run_remote_job(server_address: str, operation: str, input_file: str, output_file: str) -> str:
+    """Worker thread entry point: hand the job to the model daemon and wait for it."""
+    from model_server import ModelClient
+
+    # The daemon keeps the per-stage timings (its /metrics), here only the wait is visible
+    with metrics.job_timings(operation), metrics.span('remote'):
+        return ModelClient(server_address).process(operation, input_file, output_file)
+
+
+class JobQueue:
+    """
+    Spool directory for uploads plus a process pool that handles "Enhance" jobs.
+
+    Uploads are streamed to disk and referenced by id, so request handlers never
+    keep a whole video in memory. Jobs run in worker processes and Flask only
+    tracks their futures, so a request never waits for ffmpeg or TensorFlow.
+    With ``server_address`` set, jobs are forwarded to a running
+    ``scripts/model_server.py`` instead and the web app never loads the model.
+    With ``cache_dir`` set, uploads are hashed while they are saved and a
+    result that is already in the ``ResultCache`` is returned without
+    starting a job. With ``watermark_image`` set, "enhance_video" results
+    get the watermark in the same ffmpeg pass that adds the denoised audio
+    (forwarded jobs use the daemon's ``--watermark`` instead). Large files
+    can be uploaded in resumable chunks (``start_upload``/``append_upload``).
+
+    The state of every job is also written to ``results/<job id>.job.json``,
+    so with several gunicorn workers a status or download request that lands
+    on a worker other than the one running the job still finds it.
+    """
+    def __init__(self, spool_dir: str, model_path: str, profile: str, max_workers: Optional[int] = None,
+                 server_address: Optional[str] = None, cache_dir: Optional[str] = None,
+                 watermark_image: Optional[str] = None):
+        spool_dir = os.path.abspath(spool_dir)
+        self.upload_dir = os.path.join(spool_dir, 'uploads')
+        self.result_dir = os.path.join(spool_dir, 'results')
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.result_dir, exist_ok=True)
+
+        self.model_path = model_path
+        self.profile = profile
+        self.server_address = server_address
+        if server_address:
+            # Threads only wait for the daemon, the model and ffmpeg run there
+            self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        else:
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self.max_workers = self.executor._max_workers
+        self.jobs: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.state_lock = threading.Lock()  # Orders the state writes of a request thread and a done callback
+
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir else None
+        self.cache = ResultCache(self.cache_dir) if cache_dir else None
+        self.watermark_image = os.path.abspath(watermark_image) if watermark_image else None
+
+    @staticmethod
+    def _new_upload_id(filename: str) -> str:
+        extension = os.path.splitext(secure_filename(filename))[1].lower()
+        # A sidecar suffix as extension would make the upload look like one of its own sidecar files
+        return uuid.uuid4().hex + ('' if extension in SIDECAR_SUFFIXES else extension)
+
+    def _spool_file(self, upload_id: str, suffix: str = '') -> str:
+        return os.path.join(self.upload_dir, upload_id + suffix)
+
+    def upload_digest(self, upload_id: str) -> Optional[str]:
+        """Content hash recorded when the upload was completed, or None."""
+        try:
+            with open(self._spool_file(upload_id, DIGEST_SUFFIX), 'r') as file:
+                return file.read().strip() or None
+        except OSError:
+            return None
+
+    def _write_digest(self, upload_id: str, digest: str) -> None:
+        with open(self._spool_file(upload_id, DIGEST_SUFFIX), 'w') as file:
+            file.write(digest)
+
+    def save_upload(self, file) -> str:
+        """
+        Stream an uploaded ``FileStorage`` into the spool directory.
+
+        Returns:
+            str: Upload id to keep in the user's session.
+        """
+        self.cleanup()
+        upload_id = self._new_upload_id(file.filename)
+        with metrics.span('upload'), open(self._spool_file(upload_id), 'wb') as output:
+            # The content hash for the result cache is computed in the same pass as the write
+            digest = stream_digest(file.stream, output)
+        self._write_digest(upload_id, digest)
+        return upload_id
+
+    def start_upload(self, filename: str, size: int) -> str:
+        """
+        Begin a resumable upload of ``size`` bytes sent in chunks by ``append_upload``.
+
+        The data goes to ``<upload id>.part`` and is renamed once complete, so
+        ``upload_path`` (and therefore ``submit``) never sees a partial file.
+        The declared size is kept in ``<upload id>.upload.json`` and the
+        offset is the size of the ``.part`` file, so any web worker can
+        continue the upload.
+
+        Returns:
+            str: Upload id.
+        """
+        if size <= 0:
+            raise ValueError("size must be positive")
+        self.cleanup()
+        upload_id = self._new_upload_id(filename)
+        open(self._spool_file(upload_id, PART_SUFFIX), 'wb').close()
+        with open(self._spool_file(upload_id, UPLOAD_INFO_SUFFIX), 'w') as file:
+            json.dump({'size': size}, file)
+        return upload_id
+
+    def _upload_size(self, upload_id: str) -> Optional[int]:
+        # Declared size of an unfinished upload, None once it is complete (or unknown)
+        if not self._valid_upload_id(upload_id):
+            return None
+        try:
+            with open(self._spool_file(upload_id, UPLOAD_INFO_SUFFIX), 'r') as file:
+                return int(json.load(file)['size'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def upload_offset(self, upload_id: str) -> Optional[Dict]:
+        """Bytes received so far and total size of an upload, or None for unknown ids."""
+        size = self._upload_size(upload_id)
+        if size is not None:
+            try:
+                offset = os.path.getsize(self._spool_file(upload_id, PART_SUFFIX))
+                return {'upload_id': upload_id, 'offset': offset, 'size': size, 'complete': False}
+            except FileNotFoundError:
+                pass  # Completed by a concurrent request, report the finished file
+
+        path = self.upload_path(upload_id)
+        if path is None:
+            return None
+        size = os.path.getsize(path)
+        return {'upload_id': upload_id, 'offset': size, 'size': size, 'complete': True}
+
+    def append_upload(self, upload_id: str, offset: int, stream) -> Dict:
+        """
+        Write one chunk of a resumable upload straight to disk.
+
+        Args:
+            upload_id (str): Id from ``start_upload``.
+            offset (int): Position of the chunk; must equal the bytes received so
+                far, so a retried or duplicated chunk cannot corrupt the file.
+            stream: Request body, read in ``HASH_CHUNK_SIZE`` pieces.
+
+        The chunk is written at ``offset`` rather than appended, so a duplicate
+        of the same chunk handled by another worker at the same time writes
+        the same bytes again instead of corrupting the file. A chunk for an
+        upload that is already complete returns the completed state.
+
+        Returns:
+            Dict: State as returned by ``upload_offset``.
+
+        Raises:
+            KeyError: Unknown upload.
+            ValueError: ``offset`` does not match the received bytes.
+        """
+        size = self._upload_size(upload_id)
+        if size is None:
+            status = self.upload_offset(upload_id)
+            if status is None:
+                raise KeyError(upload_id)
+            return status
+
+        part_path = self._spool_file(upload_id, PART_SUFFIX)
+        try:
+            received = os.path.getsize(part_path)
+            if offset != received:
+                raise ValueError(f"Expected offset {received}, got {offset}")
+            with open(part_path, 'r+b') as output:
+                output.seek(offset)
+                remaining = size - offset
+                while remaining > 0:
+                    chunk = stream.read(min(HASH_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                    remaining -= len(chunk)
+            # cleanup() expires uploads by mtime, an upload that still receives data stays alive
+            os.utime(self._spool_file(upload_id, UPLOAD_INFO_SUFFIX))
+
+            if remaining == 0:
+                os.replace(part_path, self._spool_file(upload_id))
+                self._write_digest(upload_id, file_digest(self._spool_file(upload_id)))
+                os.remove(self._spool_file(upload_id, UPLOAD_INFO_SUFFIX))
+        except FileNotFoundError:
+            pass  # The last chunk was already handled by a concurrent request
+        status = self.upload_offset(upload_id)
+        if status is None:
+            raise KeyError(upload_id)
+        return status
+
+    @staticmethod
+    def _valid_upload_id(upload_id: Optional[str]) -> bool:
+        return bool(upload_id) and upload_id == os.path.basename(upload_id) and not upload_id.endswith(SIDECAR_SUFFIXES)
+
+    def upload_path(self, upload_id: Optional[str]) -> Optional[str]:
+        """Path of a stored, complete upload or None if it does not exist (anymore)."""
+        if not self._valid_upload_id(upload_id):
+            return None
+        path = self._spool_file(upload_id)
+        return path if os.path.isfile(path) else None
+
+    def submit(self, upload_id: str, operation: str) -> str:
+        """
+        Queue an operation on a stored upload.
+
+        Returns:
+            str: Job id for the status and download endpoints.
+        """
+        from media_pipeline import OPERATIONS
+
+        input_file = self.upload_path(upload_id)
+        if input_file is None:
+            raise FileNotFoundError(upload_id)
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}")
+
+        job_id = uuid.uuid4().hex
+        output_file = self._spool_result(job_id, OPERATIONS[operation])
+        # Uploads are hashed while they are saved; without that hash the worker hashes the file itself
+        digest = self.upload_digest(upload_id)
+        with metrics.span('cache'):
+            cached_file = self.cached_result(digest, operation, output_file) if digest else None
+        if cached_file is not None:
+            output_file = cached_file
+            future = Future()
+            future.set_result(output_file)
+        elif self.server_address:
+            future = self.executor.submit(run_remote_job, self.server_address, operation, input_file, output_file)
+        else:
+            future = self._submit_to_pool(run_job, operation, input_file, output_file, self.model_path, self.profile,
+                                          self.cache_dir, digest, self.watermark_image)
+            future.add_done_callback(self._record_timings)
+        job = {
+            'operation': operation,
+            'input_file': input_file,
+            'output_file': output_file,
+            'future': future,
+            'created': time.time(),
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+        self._save_state(job_id, job)
+        future.add_done_callback(lambda _: self._save_state(job_id, job))
+        return job_id
+
+    def _submit_to_pool(self, fn, *args) -> Future:
+        """
+        Submit to the process pool, replacing it first if a worker process died.
+
+        A worker killed by the OOM killer or a crash in native code breaks the
+        whole ``ProcessPoolExecutor``: its pending jobs fail and every later
+        ``submit`` raises ``BrokenProcessPool``. The broken pool is replaced
+        once, so the next jobs run again without a web server restart.
+        """
+        executor = self.executor
+        try:
+            return executor.submit(fn, *args)
+        except BrokenProcessPool:
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    executor.shutdown(wait=False)
+                executor = self.executor
+            return executor.submit(fn, *args)
+
+    def _spool_result(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.result_dir, job_id + suffix)
+
+    @staticmethod
+    def _job_state(job: Dict) -> Dict:
+        future = job['future']
+        if future.done():
+            state = 'failed' if future.exception() else 'done'
+        else:
+            state = 'running' if future.running() else 'queued'
+        record = {key: job[key] for key in ('operation', 'input_file', 'output_file', 'created')}
+        record['status'] = state
+        if state == 'failed':
+            record['error'] = str(future.exception())
+        return record
+
+    def _save_state(self, job_id: str, job: Dict) -> Dict:
+        # Written to a temporary file and renamed, so other workers never read a half-written state
+        with self.state_lock:
+            record = self._job_state(job)
+            if job.get('saved') != record['status']:
+                path = self._spool_result(job_id, STATUS_SUFFIX)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as file:
+                    json.dump(record, file)
+                os.replace(tmp_path, path)
+                job['saved'] = record['status']
+        return record
+
+    def _load_state(self, job_id: str) -> Optional[Dict]:
+        # State of a job submitted through another web worker
+        try:
+            with open(self._spool_result(job_id, STATUS_SUFFIX), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def job_record(self, job_id: Optional[str]) -> Optional[Dict]:
+        """Operation, files and state of a job of any web worker, or None for unknown ids."""
+        if not job_id or not job_id.isalnum():
+            return None
+        job = self.jobs.get(job_id)
+        if job is not None:
+            # The worker that runs the job keeps the file up to date (e.g. queued -> running)
+            return self._save_state(job_id, job)
+        return self._load_state(job_id)
+
+    def cached_result(self, digest: str, operation: str, output_file: str) -> Optional[str]:
+        """
+        Result of the same input, model and operation from the cache, without copying it.
+
+        The cached entry is hard-linked to ``output_file``, so a later eviction
+        does not delete the download. Where the cache folder is on another
+        file system the entry itself is returned.
+
+        Returns:
+            Optional[str]: Path of the result or None on a cache miss.
+        """
+        from inference_backends import resolve_model_path
+        from media_pipeline import OPERATIONS, result_kind
+
+        if self.cache is None:
+            return None
+        try:
+            model_file = resolve_model_path(self.model_path)[0]
+            version = '' if operation == 'extract_audio' else model_version(model_file, self.profile)
+        except OSError:
+            return None  # The model is missing, let the job report the error
+        kind = result_kind(operation, None if self.server_address else self.watermark_image)
+        path = self.cache.get(self.cache.key(digest, version, kind), OPERATIONS[operation])
+        if path is None:
+            return None
+        try:
+            os.link(path, output_file)
+        except FileNotFoundError:
+            return None  # Evicted by another process in the meantime
+        except OSError:
+            return path
+        return output_file
+
+    @staticmethod
+    def _record_timings(future: Future) -> None:
+        # Worker processes have their own metrics, so their timings are sent back with the result
+        if not future.cancelled() and future.exception() is None:
+            timings = future.result()
+            metrics.observe_job(timings['stages'], timings['operation'], timings['seconds'])
+
+    def cache_stats(self) -> Optional[Dict]:
+        """Hit/miss counters of the "Enhance" requests or None without a cache."""
+        return self.cache.stats() if self.cache is not None else None
+
+    def status(self, job_id: Optional[str]) -> Optional[Dict]:
+        """Public status of a job or None for unknown ids."""
+        record = self.job_record(job_id)
+        if record is None:
+            return None
+        status = {'job_id': job_id, 'operation': record['operation'], 'status': record['status']}
+        if 'error' in record:
+            status['error'] = record['error']
+        return status
+
+    def result_path(self, job_id: str) -> Optional[str]:
+        """Path of the finished result or None if the job is not done."""
+        record = self.job_record(job_id)
+        if record is None or record['status'] != 'done' or not os.path.exists(record['output_file']):
+            return None
+        return record['output_file']
+
+    def queue_depth(self) -> int:
+        """Number of jobs that are queued or running."""
+        with self.lock:
+            return sum(not job['future'].done() for job in self.jobs.values())
+
+    def running_jobs(self) -> int:
+        """Number of jobs a worker is processing right now."""
+        with self.lock:
+            return sum(job['future'].running() for job in self.jobs.values())
+
+    def cleanup(self) -> None:
+        """Forget finished jobs and delete spool files older than ``JOB_TTL``."""
+        deadline = time.time() - JOB_TTL
+        with self.lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job['future'].done() and job['created'] < deadline]
+            for job_id in expired:
+                del self.jobs[job_id]
+            active = {job['output_file'] for job in self.jobs.values()}
+            active.update(job['input_file'] for job in self.jobs.values() if not job['future'].done())
+            active.update(self._spool_result(job_id, STATUS_SUFFIX) for job_id in self.jobs)
+        # Unfinished jobs of the other web workers keep their files too
+        for name in os.listdir(self.result_dir):
+            if name.endswith(STATUS_SUFFIX):
+                record = self._load_state(name[:-len(STATUS_SUFFIX)])
+                if record is not None and record['status'] in ('queued', 'running'):
+                    active.update((os.path.join(self.result_dir, name), record['input_file'], record['output_file']))
+
+        for folder in (self.upload_dir, self.result_dir):
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if path in active or not os.path.isfile(path):
+                    continue
+                try:
+                    # An interrupted upload can be resumed until it has been idle for JOB_TTL
+                    if os.path.getmtime(path) < deadline:
+                        os.remove(path)
+                except OSError:
+                    pass  # Already removed by another request
@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+BUSY_TIMEOUT = 5.0  # Seconds a writer waits for another process's write lock before failing
+
+
+class UserStore:
+    """
+    Users in a local SQLite database instead of a rewritten ``users.json``.
+
+    The username is the primary key, so lookups use its index and a new user
+    is one ``INSERT``: two workers registering at the same time can no longer
+    overwrite each other's file. The database runs in WAL mode, so logins
+    (reads) never wait for a registration (write).
+
+    Found users are cached in the process; misses are not, so unknown
+    usernames cannot grow the cache and a user registered by another thread
+    is seen at once. The cache is dropped when this process writes, and when
+    ``PRAGMA data_version`` shows that another process (e.g. another gunicorn
+    worker) has committed a change.
+    """
+    def __init__(self, db_path: str, json_path: Optional[str] = None):
+        self.db_path = os.path.abspath(db_path)
+        self.local = threading.local()
+        self.cache: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS users ("
+                               "username TEXT PRIMARY KEY NOT NULL, password TEXT NOT NULL, created REAL NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if json_path is not None:
+            self.migrate_json(json_path)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, every thread opens its own
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, one fsync per checkpoint
+            self.local.connection = connection
+            self.local.data_version = None
+        return connection
+
+    def _check_cache(self, connection: sqlite3.Connection) -> None:
+        # data_version changes when another connection commits, then cached users may be stale
+        version = connection.execute("PRAGMA data_version").fetchone()[0]
+        if self.local.data_version is not None and version != self.local.data_version:
+            with self.lock:
+                self.cache.clear()
+        self.local.data_version = version
+
+    def migrate_json(self, json_path: str) -> int:
+        """
+        Import the users of a ``users.json`` file once.
+
+        The migration is recorded in the database, so later starts do not
+        import the file again and users deleted since then do not come back.
+
+        Returns:
+            int: Number of imported users (0 if already migrated or there is no file).
+        """
+        connection = self._connection()
+        if not os.path.exists(json_path):
+            return 0
+        with connection:
+            if connection.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+                return 0
+            with open(json_path, 'r') as file:
+                users = json.load(file).get('users', [])
+            now = time.time()
+            imported = 0
+            for user in users:
+                cursor = connection.execute("INSERT OR IGNORE INTO users (username, password, created) VALUES (?, ?, ?)",
+                                            (user['username'], user['password'], now))
+                imported += cursor.rowcount
+            connection.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (json_path,))
+        with self.lock:
+            self.cache.clear()
+        return imported
+
+    def get(self, username: str) -> Optional[Dict]:
+        """User record (``username``, ``password``) or None."""
+        connection = self._connection()
+        self._check_cache(connection)
+        with self.lock:
+            if username in self.cache:
+                return self.cache[username]
+
+        row = connection.execute("SELECT username, password FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        with self.lock:
+            self.cache[username] = user
+        return user
+
+    def add(self, username: str, password: str) -> bool:
+        """
+        Register a user.
+
+        Returns:
+            bool: False if the username is already taken.
+
+        Raises:
+            ValueError: If the username or the password is empty.
+        """
+        if not username or not password:
+            raise ValueError("Username and password must not be empty")
+        connection = self._connection()
+        try:
+            with connection:
+                connection.execute("INSERT INTO users (username, password, created) VALUES (?, ?, ?)",
+                                   (username, password, time.time()))
+        except sqlite3.IntegrityError:
+            return False
+        finally:
+            with self.lock:
+                self.cache.pop(username, None)
+        return True
+
+    def check(self, username: str, password: str) -> bool:
+        """True if the user exists and the password matches."""
+        if not username or not password:
+            return False
+        user = self.get(username)
+        return user is not None and user['password'] == password
@@ -23,6 +23,15 @@ TRANSLATIONS = {
         'login_successful': 'Login successful! Welcome back.',
         'invalid_credentials': 'Invalid credentials. Please try again.',
         'Return_to_Main_Page': 'Return to Main Page',
+        'job_queued': 'Processing started. The result will be available below.',
+        'job_status': 'Processing status',
+        'download_result': 'Download result',
+        'status_queued': 'Waiting in queue',
+        'status_running': 'Processing...',
+        'status_done': 'Done',
+        'status_failed': 'Processing failed',
+        'uploading': 'Uploading',
+        'upload_failed': 'Upload interrupted. Select the same file again to resume.',
     },
     'uk': {
         'page_title': 'Mr. Mill CleanTone',
@@ -48,5 +57,14 @@ TRANSLATIONS = {
         'login_successful': 'Вхід успішний! Ласкаво просимо назад.',
         'invalid_credentials': 'Неправильні дані. Спробуйте ще раз.',
         'Return_to_Main_Page': 'Повернутися на головну сторінку',
+        'job_queued': 'Обробку розпочато. Результат з\'явиться нижче.',
+        'job_status': 'Статус обробки',
+        'download_result': 'Завантажити результат',
+        'status_queued': 'Очікує в черзі',
+        'status_running': 'Обробляється...',
+        'status_done': 'Готово',
+        'status_failed': 'Помилка обробки',
+        'uploading': 'Завантаження',
+        'upload_failed': 'Завантаження перервано. Виберіть той самий файл ще раз, щоб продовжити.',
     }
 }
@@ -1,22 +1,183 @@
+import argparse
+import os
+import shutil
+import subprocess
 import sys
-# from interfaces import website
-# from interfaces.app import desktop
-# from interfaces.bot import tg_bot
+import tempfile
+import time
+
+# Only the standard library is imported here. Every command imports its own
+# front-end (PyQt5, telebot, Flask) and the processing code (numpy, ffmpeg
+# helpers, TensorFlow) only when it runs, so `python main.py denoise` does not
+# pay for the GUI or the web app.
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(ROOT_DIR, 'scripts')
+
+# Folder and module of every command, also used by --import-profile
+COMMAND_MODULES = {
+    'desktop': (os.path.join(ROOT_DIR, 'interfaces', 'app'), 'desktop'),
+    'telegram': (os.path.join(ROOT_DIR, 'interfaces', 'bot'), 'tg_bot'),
+    'web': (os.path.join(ROOT_DIR, 'interfaces', 'web'), 'app'),
+    'denoise': (SCRIPTS_DIR, 'batch_inference'),
+    'serve': (SCRIPTS_DIR, 'model_server'),
+}
+DEFAULT_MODEL = os.path.join(ROOT_DIR, 'models', 'ML-DAN_v4.0.keras')
+DEFAULT_PROFILE = 'v4'
+DEFAULT_SPOOL_DIR = os.path.join(ROOT_DIR, 'spool')  # Files exchanged with the "serve" daemon
+IMPORT_PROFILE_TOP = 15  # Slowest imports listed by --import-profile
+
+
+def import_command(command):
+    """Import the module of a command with its folder (and scripts/) on sys.path."""
+    folder, module = COMMAND_MODULES[command]
+    for path in (SCRIPTS_DIR, folder):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+    return __import__(module)
+
+
+def run_frontend(command, args):
+    # The front-ends use paths relative to the repository root (models/, spool/, interfaces/images/)
+    os.chdir(ROOT_DIR)
+    module = import_command(command)
+    if command == 'web':
+        module.run(host=args.host, port=args.port, debug=args.debug)
+    else:
+        module.run()
+
+
+def output_paths(files, output_dir):
+    """Same unique output names as ``batch_inference.output_paths``, without importing numpy for --server."""
+    used = set()
+    paths = []
+    for path in files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, index = stem, 1
+        while name.lower() in used:
+            index += 1
+            name = f"{stem}_{index}"
+        used.add(name.lower())
+        paths.append(os.path.join(output_dir, name + '.wav'))
+    return paths
+
+
+def denoise(args):
+    output_dir = args.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    output_files = output_paths(args.files, output_dir)
+
+    if args.server:
+        # The daemon already has the model loaded: only the stdlib client is imported here
+        sys.path.insert(0, SCRIPTS_DIR)
+        from model_server import ModelClient
+
+        client = ModelClient(args.server, spool_dir=args.spool_dir)
+        # The daemon only reads and writes inside its spool directory, so files are staged there
+        os.makedirs(args.spool_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=args.spool_dir) as work_dir:
+            for input_file, output_file in zip(args.files, output_files):
+                staged_input = os.path.join(work_dir, 'input' + os.path.splitext(input_file)[1])
+                staged_output = os.path.join(work_dir, 'result.wav')
+                try:
+                    os.link(input_file, staged_input)
+                except OSError:
+                    shutil.copyfile(input_file, staged_input)  # Other file system or no hard link support
+                client.process('enhance_audio', staged_input, staged_output)
+                shutil.move(staged_output, output_file)
+                os.remove(staged_input)
+    else:
+        batch_inference = import_command('denoise')
+        model = batch_inference.load_inference_model(args.model, args.profile, backend=args.backend)
+        stats = batch_inference.denoise_files(model, args.files, output_files, profile=args.profile,
+                                              skip_silence=args.skip_silence)
+        print(f"Пропущено тихих вікон: {stats['skipped_windows']} з {stats['windows']}")
+    print(f"Очищені аудіо збережено у {output_dir}")
+
+
+def serve(args):
+    model_server = import_command('serve')
+    model_server.serve(args.model, args.profile, args.address, args.max_jobs, args.cache_dir, args.spool_dir,
+                       args.watermark)
+
+
+def import_profile(command):
+    """
+    Import the module of ``command`` in a fresh interpreter with ``-X importtime`` and list the slowest imports.
+
+    Nothing is run, so the numbers show what starting the command costs before it does any work.
+    """
+    folder, module = COMMAND_MODULES[command]
+    code = f"import sys; sys.path[:0] = [{SCRIPTS_DIR!r}, {folder!r}]; import {module}"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT_DIR,
+                            stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative), name.rstrip()))
+    if result.returncode != 0:
+        print(f"Не вдалося імпортувати {module}:")
+        print('\n'.join(line for line in result.stderr.splitlines() if not line.startswith('import time:')))
+
+    print(f"{command}: interpreter start + imports {wall:.3f} s")
+    for cumulative, name in sorted(imports, reverse=True)[:IMPORT_PROFILE_TOP]:
+        print(f"{cumulative / 1e6:8.3f} s  {name}")
+
 
 def main():
-    if len(sys.argv) < 2:
-        return
-    
-    # interface = sys.argv[1].lower()
-
-    # if interface == 'desktop':
-    #     desktop.run()
-    # elif interface == 'telegram':
-    #     tg_bot.run()
-    # elif interface == 'web':
-    #     website.run()
-    # else:
-    #     print(f"Unknown interface: {interface}")
+    parser = argparse.ArgumentParser(description='Mr. Mill CleanTone: ML-DAN audio denoising.')
+    parser.add_argument('--import-profile', action='store_true',
+                        help='show how long the imports of the command take instead of running it')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('desktop', help='desktop application (PyQt5)')
+    commands.add_parser('telegram', help='Telegram bot')
+    web = commands.add_parser('web', help='web interface (Flask)')
+    web.add_argument('--host', default='127.0.0.1')
+    web.add_argument('--port', type=int, default=5000)
+    web.add_argument('--debug', action='store_true')
+
+    denoise_parser = commands.add_parser('denoise', help='denoise audio/video files into WAV files')
+    denoise_parser.add_argument('files', nargs='*', help='noisy audio or video files')
+    denoise_parser.add_argument('--output-dir', default='.', help='folder for the denoised WAV files')
+    denoise_parser.add_argument('--model', default=DEFAULT_MODEL, help='path to the .keras/.h5 model')
+    denoise_parser.add_argument('--profile', default=DEFAULT_PROFILE, help='model generation (v1, v3, v4)')
+    denoise_parser.add_argument('--backend', default='auto', help='auto, tflite, onnx or keras')
+    denoise_parser.add_argument('--server', default=None,
+                                help='address of a running "serve" daemon to use instead of loading the model')
+    denoise_parser.add_argument('--skip-silence', action='store_true',
+                                help='bypass the model for windows the VAD finds silent (not with --server)')
+    denoise_parser.add_argument('--spool-dir', default=DEFAULT_SPOOL_DIR, help='spool folder of the "serve" daemon')
+
+    serve_parser = commands.add_parser('serve', help='keep the model loaded and serve jobs locally')
+    serve_parser.add_argument('--model', default=DEFAULT_MODEL, help='path to the .keras/.h5 model')
+    serve_parser.add_argument('--profile', default=DEFAULT_PROFILE, help='model generation (v1, v3, v4)')
+    serve_parser.add_argument('--address', default='http://127.0.0.1:8765',
+                              help='http://127.0.0.1:<port> or unix:///path/to/socket')
+    serve_parser.add_argument('--max-jobs', type=int, default=4, help='jobs processed at the same time')
+    serve_parser.add_argument('--cache-dir', default=None, help='result cache folder, e.g. spool/cache')
+    serve_parser.add_argument('--spool-dir', default=DEFAULT_SPOOL_DIR,
+                              help='only files inside this folder are processed; it also holds the access token')
+    serve_parser.add_argument('--watermark', default=None,
+                              help='image overlaid on enhanced videos, e.g. scripts/images/watermark.png')
+
+    args = parser.parse_args()
+    if args.command == 'denoise' and not args.files and not args.import_profile:
+        parser.error('denoise: at least one file is required')
+    if args.import_profile:
+        import_profile(args.command)
+    elif args.command == 'denoise':
+        denoise(args)
+    elif args.command == 'serve':
+        serve(args)
+    else:
+        run_frontend(args.command, args)
+
 
 if __name__ == "__main__":
     main()
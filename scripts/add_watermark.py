@@ -1,5 +1,11 @@
 import subprocess
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+# Налаштування кодування для finish_video
+ENCODER_PRESET = 'veryfast'  # Пресет libx264: швидше кодування ціною трохи більшого файлу
+ENCODER_THREADS = 0  # Потоки ffmpeg на одне завдання (0 - ffmpeg вибирає сам)
 
 def change_to_script_directory():
     script_path = os.path.abspath(__file__)  # Отримуємо повний шлях до поточного файлу
@@ -26,6 +32,51 @@ def add_watermark(input_video: str, output_video: str, watermark_image: str, pos
     except subprocess.CalledProcessError as e:
         print(f"Помилка при додаванні водяного знаку: {e}")
 
+def build_finish_command(input_video: str, audio_input: str, output_video: str, watermark_image: str,
+                         position: str = '10:10', preset: str = ENCODER_PRESET, threads: int = ENCODER_THREADS,
+                         audio_format: Optional[str] = None, sample_rate: int = 16000) -> List[str]:
+    # Одна команда ffmpeg: накладання водяного знаку і заміна аудіо за одне декодування/кодування відео.
+    # audio_input - аудіофайл (wav, mp3) або сирий моно PCM (audio_format='f32le', наприклад 'pipe:0')
+    command = ['ffmpeg', '-loglevel', 'warning', '-y',
+               '-i', input_video,  # Вхідне відео (0)
+               '-i', watermark_image]  # Зображення водяного знаку (1)
+    if audio_format is not None:
+        command += ['-f', audio_format, '-ar', str(sample_rate), '-ac', '1']
+    command += ['-i', audio_input,  # Очищене аудіо (2)
+                '-filter_complex', f"[0:v][1:v]overlay={position}[v]",  # Позиція водяного знаку
+                '-map', '[v]', '-map', '2:a:0',
+                '-c:v', 'libx264', '-preset', preset, '-threads', str(threads),  # Єдине перекодування відео
+                '-c:a', 'aac',  # Кодек для аудіо
+                output_video]
+    return command
+
+def finish_video(input_video: str, audio_file: str, output_video: str, watermark_image: str, position: str = '10:10',
+                 preset: str = ENCODER_PRESET, threads: int = ENCODER_THREADS) -> bool:
+    # Водяний знак + заміна аудіодоріжки одним проходом замість add_watermark і combine_video_audio
+    # (без проміжного відеофайлу і без другого кодування)
+    try:
+        command = build_finish_command(input_video, audio_file, output_video, watermark_image, position, preset, threads,
+                                       audio_format='f32le' if audio_file.endswith('.f32le') else None)
+        subprocess.run(command, check=True)
+        print(f"Водяний знак і аудіо додано до {output_video}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Помилка при обробці {input_video}: {e}")
+        return False
+
+def finish_videos(jobs: Sequence[Tuple[str, str, str]], watermark_image: str, position: str = '10:10',
+                  preset: str = ENCODER_PRESET, max_jobs: Optional[int] = None,
+                  threads_per_job: Optional[int] = None) -> List[bool]:
+    # Пакетний режим: кілька finish_video одночасно, загалом не більше потоків, ніж ядер.
+    # jobs - список (вхідне відео, очищене аудіо, вихідне відео); повертає успіх кожного завдання
+    cores = os.cpu_count() or 1
+    max_jobs = max(1, min(max_jobs or cores, len(jobs) or 1))
+    threads_per_job = threads_per_job or max(1, cores // max_jobs)
+    # Потоки лише чекають на процеси ffmpeg, кодування відбувається в самих процесах
+    with ThreadPoolExecutor(max_workers=max_jobs) as executor:
+        return list(executor.map(lambda job: finish_video(*job, watermark_image, position, preset, threads_per_job),
+                                 jobs))
+
 if __name__ == '__main__':
     input_video = '..\\sources\\video.mp4'  # Шлях до вхідного відео
     output_video = '..\\videos\\watermarked_video.mp4'  # Шлях до вихідного відео
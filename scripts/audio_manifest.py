@@ -0,0 +1,172 @@
+import argparse
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Configuration parameters
+AUDIO_EXTENSIONS = ('.flac', '.mp3', '.wav')
+MANIFEST_DB = '.audio_manifest.db'  # Default manifest file (inside the data folder)
+PROBE_CHUNKSIZE = 64                 # Files probed per task sent to a worker process
+
+
+def probe_audio(path: str) -> Tuple[Optional[float], Optional[int], Optional[int]]:
+    """
+    Read duration, sample rate and channel count from the file header without decoding the audio.
+
+    Returns:
+        Tuple[Optional[float], Optional[int], Optional[int]]: Duration in seconds,
+        sample rate and channels, or Nones if the file cannot be read.
+    """
+    import soundfile as sf
+
+    try:
+        info = sf.info(path)
+    except RuntimeError:  # LibsndfileError: unknown format or a broken header
+        return None, None, None
+    return float(info.duration), int(info.samplerate), int(info.channels)
+
+
+def _probe_task(path: str) -> Tuple[str, Optional[float], Optional[int], Optional[int]]:
+    return (path,) + probe_audio(path)
+
+
+class AudioManifest:
+    """
+    Persistent index of the audio files of a dataset (path, size, mtime, duration, sample rate, channels, pair).
+
+    ``scan`` only stats the files of a folder and probes the new or changed
+    ones (different size or mtime) in parallel, so after the first run
+    selecting files by duration and pairing clean/noisy files no longer
+    opens any audio file.
+
+    Example:
+        manifest = AudioManifest('../data/audios/english/train/.audio_manifest.db')
+        manifest.scan(CLEAN_DIR, ['.flac'])
+        manifest.scan(NOISY_DIR, ['.mp3'])
+        noisy_files, clean_files = manifest.pairs(NOISY_DIR, CLEAN_DIR, min_duration=MIN_LENGTH_SECONDS)
+    """
+    def __init__(self, db_path: str = MANIFEST_DB):
+        self.db_path = os.path.abspath(db_path)
+        self.connection = sqlite3.connect(self.db_path)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS files ("
+                                    "path TEXT PRIMARY KEY, root TEXT NOT NULL, stem TEXT NOT NULL, "
+                                    "size INTEGER NOT NULL, mtime REAL NOT NULL, duration REAL, "
+                                    "sample_rate INTEGER, channels INTEGER, pair TEXT)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS files_root_stem ON files (root, stem)")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def scan(self, directory: str, extensions: Sequence[str] = AUDIO_EXTENSIONS,
+             workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bring the manifest of ``directory`` up to date.
+
+        Args:
+            directory (str): Root folder, searched recursively.
+            extensions (Sequence[str]): Accepted file extensions.
+            workers (Optional[int]): Processes probing new files (None - one per CPU core).
+
+        Returns:
+            Dict[str, int]: Number of ``probed``, ``unchanged`` and ``removed`` files.
+        """
+        root = os.path.abspath(directory)
+        extensions = tuple(extension.lower() for extension in extensions)
+        known = {path: (size, mtime) for path, size, mtime in
+                 self.connection.execute("SELECT path, size, mtime FROM files WHERE root = ?", (root,))}
+
+        found, changed = {}, []
+        for folder, _, files in os.walk(root):
+            for file in files:
+                if not file.lower().endswith(extensions):
+                    continue
+                path = os.path.join(folder, file)
+                stat = os.stat(path)
+                found[path] = (stat.st_size, stat.st_mtime)
+                if known.get(path) != found[path]:
+                    changed.append(path)
+
+        removed = [path for path in known if path not in found]
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in removed))
+            if changed:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    rows = [(path, root, os.path.splitext(os.path.basename(path))[0]) + found[path]
+                            + (duration, sample_rate, channels)
+                            for path, duration, sample_rate, channels in
+                            executor.map(_probe_task, changed, chunksize=PROBE_CHUNKSIZE)]
+                # A changed file keeps no stale pair, pair() sets it again
+                self.connection.executemany("INSERT OR REPLACE INTO files (path, root, stem, size, mtime, duration, "
+                                            "sample_rate, channels) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return {'probed': len(changed), 'unchanged': len(found) - len(changed), 'removed': len(removed)}
+
+    def select(self, directory: str, min_duration: float = 0.0, limit: Optional[int] = None) -> List[str]:
+        """
+        Files of a scanned folder that are at least ``min_duration`` seconds long, sorted by path.
+
+        Replaces ``load_audio_files_from_directory(..., return_paths=True, min_length_seconds=...)``.
+        """
+        rows = self.connection.execute("SELECT path FROM files WHERE root = ? AND duration >= ? ORDER BY path "
+                                       "LIMIT ?", (os.path.abspath(directory), min_duration,
+                                                   -1 if limit is None else limit))
+        return [path for path, in rows]
+
+    def pair(self, noisy_dir: str, clean_dir: str) -> int:
+        """
+        Store the counterpart of every file with the same name (e.g. ``19-198-0001``) in the other folder.
+
+        Returns:
+            int: Number of pairs.
+        """
+        noisy_root, clean_root = os.path.abspath(noisy_dir), os.path.abspath(clean_dir)
+        with self.connection:
+            for root, other in ((noisy_root, clean_root), (clean_root, noisy_root)):
+                self.connection.execute("UPDATE files SET pair = (SELECT other.path FROM files AS other "
+                                        "WHERE other.root = ? AND other.stem = files.stem ORDER BY other.path LIMIT 1) "
+                                        "WHERE root = ?", (other, root))
+        return self.connection.execute("SELECT COUNT(*) FROM files WHERE root = ? AND pair IS NOT NULL",
+                                       (noisy_root,)).fetchone()[0]
+
+    def pairs(self, noisy_dir: str, clean_dir: str, min_duration: float = 0.0,
+              limit: Optional[int] = None) -> Tuple[List[str], List[str]]:
+        """
+        Noisy/clean pairs whose files are both at least ``min_duration`` seconds long, sorted by name.
+
+        Same result as ``feature_store.pair_by_name`` plus the duration filter,
+        answered from the manifest (``pair`` is refreshed first).
+
+        Returns:
+            Tuple[List[str], List[str]]: Noisy and clean paths of every pair.
+        """
+        self.pair(noisy_dir, clean_dir)
+        rows = self.connection.execute(
+            "SELECT noisy.path, clean.path FROM files AS noisy JOIN files AS clean ON clean.path = noisy.pair "
+            "WHERE noisy.root = ? AND noisy.duration >= ? AND clean.duration >= ? ORDER BY noisy.stem LIMIT ?",
+            (os.path.abspath(noisy_dir), min_duration, min_duration, -1 if limit is None else limit)).fetchall()
+        return [noisy for noisy, _ in rows], [clean for _, clean in rows]
+
+    def info(self, path: str) -> Optional[Dict]:
+        """Manifest entry of one file or None."""
+        self.connection.row_factory = sqlite3.Row
+        try:
+            row = self.connection.execute("SELECT * FROM files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        finally:
+            self.connection.row_factory = None
+        return dict(row) if row is not None else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or update the duration manifest of audio folders.')
+    parser.add_argument('directories', nargs='+', help='audio folders, e.g. ../data/audios/english/train/clean')
+    parser.add_argument('--db', default=MANIFEST_DB, help='manifest database file')
+    parser.add_argument('--extensions', nargs='+', default=list(AUDIO_EXTENSIONS), help='accepted file extensions')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    args = parser.parse_args()
+
+    manifest = AudioManifest(args.db)
+    for directory in args.directories:
+        counts = manifest.scan(directory, args.extensions, workers=args.workers)
+        print(f"{directory}: {counts['probed']} probed, {counts['unchanged']} unchanged, {counts['removed']} removed")
+    manifest.close()
@@ -0,0 +1,270 @@
+import argparse
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from denoise_audio import (BLOCK_SIZE, DEFAULT_PROFILE, MODEL_PROFILES, SAMPLE_RATE, SKIP_SILENCE,
+                           StreamingDenoiser, read_audio_blocks)
+from inference_backends import BACKENDS, load_inference_model
+
+# Configuration parameters
+MAX_BATCH_SIZE = 16       # Maximum number of windows per model call
+MAX_BATCH_MB = 256        # Maximum size of one packed input tensor (in MB)
+MAX_OPEN_FILES = 8        # Number of files decoded at the same time by denoise_files
+COALESCE_WAIT = 0.01      # Seconds CoalescingPredictor waits for more callers before running a batch
+
+
+class BatchPredictor:
+    """
+    Keras-like wrapper that runs large window batches through the model in bounded chunks.
+
+    A chunk holds at most ``max_batch_size`` windows and its float32 input
+    tensor is never larger than ``max_batch_mb`` megabytes, whichever limit is
+    hit first. Every chunk is a single forward pass, so the model sees as many
+    windows per call as the limits allow instead of one.
+    """
+    def __init__(self, model, max_batch_size: int = MAX_BATCH_SIZE, max_batch_mb: float = MAX_BATCH_MB):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be positive, got {max_batch_size}")
+
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = int(max_batch_mb * 1024 * 1024)
+
+    def batch_limit(self, window_shape: Tuple[int, ...]) -> int:
+        """
+        Number of windows of the given shape that fit into one model call.
+
+        Args:
+            window_shape (Tuple[int, ...]): Shape of one window, without the batch axis.
+
+        Returns:
+            int: Batch size, at least 1.
+        """
+        window_bytes = int(np.prod(window_shape)) * np.dtype(np.float32).itemsize
+        return max(1, min(self.max_batch_size, self.max_batch_bytes // window_bytes))
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """
+        Predict a batch of any size.
+
+        Args:
+            batch (np.ndarray): Input of shape (N, n_features, frames, 1).
+            verbose (int): Passed on to ``model.predict``.
+
+        Returns:
+            np.ndarray: Model output for all N windows.
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        limit = self.batch_limit(batch.shape[1:])
+        outputs = [self.model.predict(batch[start:start + limit], batch_size=limit, verbose=verbose)
+                   for start in range(0, len(batch), limit)]
+        return np.concatenate(outputs)
+
+
+class CoalescingPredictor:
+    """
+    Thread-safe Keras-like ``predict`` that merges concurrent calls into shared model batches.
+
+    Callers (e.g. one ``StreamingDenoiser`` per job thread) block in
+    ``predict`` while a single thread owns the model. That thread takes the
+    first pending request, waits up to ``max_wait`` seconds for more until
+    ``max_batch_size`` windows are collected, runs them in one forward pass
+    and hands every caller its slice of the output.
+    """
+    def __init__(self, model, max_batch_size: int = MAX_BATCH_SIZE, max_wait: float = COALESCE_WAIT):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests = queue.Queue()
+        self.model_calls = 0
+        self.windows = 0
+        self.thread = threading.Thread(target=self._serve, name='CoalescingPredictor', daemon=True)
+        self.thread.start()
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """Queue a batch, wait for the shared model call and return this batch's output."""
+        request = {'batch': np.asarray(batch, dtype=np.float32), 'done': threading.Event(), 'result': None, 'error': None}
+        self.requests.put(request)
+        request['done'].wait()
+        if request['error'] is not None:
+            raise request['error']
+        return request['result']
+
+    def _collect(self) -> List[dict]:
+        requests = [self.requests.get()]
+        size = len(requests[0]['batch'])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self.requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            requests.append(request)
+            size += len(request['batch'])
+        return requests
+
+    def _serve(self) -> None:
+        while True:
+            requests = self._collect()
+            try:
+                predictions = self.model.predict(np.concatenate([request['batch'] for request in requests]), verbose=0)
+                self.model_calls += 1
+                self.windows += len(predictions)
+                start = 0
+                for request in requests:
+                    request['result'] = predictions[start:start + len(request['batch'])]
+                    start += len(request['batch'])
+            except Exception as e:
+                for request in requests:
+                    request['error'] = e
+            finally:
+                for request in requests:
+                    request['done'].set()
+
+
+def predict_sessions(denoiser: StreamingDenoiser, sessions: Sequence) -> List[np.ndarray]:
+    """
+    Pack the queued windows of several sessions into one batch and scatter the results back.
+
+    Args:
+        denoiser (StreamingDenoiser): Denoiser that owns the sessions.
+        sessions (Sequence[DenoiseSession]): Sessions with queued windows.
+
+    Returns:
+        List[np.ndarray]: Output samples released by every session, in order.
+    """
+    windows = [session.take_windows() for session in sessions]
+    counts = [len(session_windows) for session_windows in windows]
+    flat = [window for session_windows in windows for window in session_windows]
+    predictions = denoiser.predict_windows(flat) if flat else []
+
+    samples, start = [], 0
+    for session, count in zip(sessions, counts):
+        samples.append(session.complete(predictions[start:start + count]))
+        start += count
+    return samples
+
+
+def output_paths(input_files: Sequence[str], output_dir: str) -> List[str]:
+    """
+    WAV output path in ``output_dir`` for every input file.
+
+    Outputs are named after the input file. Inputs from different folders
+    with the same name (``a/clip.mp3``, ``b/clip.mp3``) get a numbered name
+    (``clip.wav``, ``clip_2.wav``), so no output overwrites another one.
+
+    Args:
+        input_files (Sequence[str]): Noisy audio/video files.
+        output_dir (str): Folder for the denoised WAV files.
+
+    Returns:
+        List[str]: One unique WAV path per input file.
+    """
+    used = set()
+    paths = []
+    for path in input_files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, index = stem, 1
+        while name.lower() in used:  # Case-insensitive, the names must also differ on Windows/macOS
+            index += 1
+            name = f"{stem}_{index}"
+        used.add(name.lower())
+        paths.append(os.path.join(output_dir, name + '.wav'))
+    return paths
+
+
+def denoise_files(model, input_files: Sequence[str], output_files: Sequence[str], profile: str = DEFAULT_PROFILE,
+                  max_batch_size: int = MAX_BATCH_SIZE, max_batch_mb: float = MAX_BATCH_MB,
+                  max_open_files: int = MAX_OPEN_FILES, block_size: int = BLOCK_SIZE,
+                  skip_silence: bool = SKIP_SILENCE) -> Dict[str, int]:
+    """
+    Denoise several media files, batching model windows across all of them.
+
+    Up to ``max_open_files`` inputs are decoded at the same time. Their windows
+    are collected until a full batch is ready (or the inputs run out), predicted
+    in one call and the results are written to the matching WAV outputs.
+
+    Args:
+        model (tf.keras.Model): Trained noise reduction model.
+        input_files (Sequence[str]): Noisy audio/video files.
+        output_files (Sequence[str]): Distinct WAV paths, one per input file (see ``output_paths``).
+        profile (str): Key of ``MODEL_PROFILES`` describing the model.
+        max_batch_size (int): Maximum number of windows per model call.
+        max_batch_mb (float): Maximum size of one packed input tensor (in MB).
+        max_open_files (int): Number of files decoded at the same time.
+        block_size (int): Number of samples decoded per block.
+        skip_silence (bool): Bypass the model for windows the VAD finds silent.
+
+    Returns:
+        Dict[str, int]: Windows processed and skipped as silence (``StreamingDenoiser.stats``).
+    """
+    if len(input_files) != len(output_files):
+        raise ValueError("input_files and output_files must have the same length")
+    if len({os.path.normcase(os.path.abspath(path)) for path in output_files}) != len(output_files):
+        raise ValueError("output_files must not contain the same path twice")
+
+    predictor = BatchPredictor(model, max_batch_size=max_batch_size, max_batch_mb=max_batch_mb)
+    denoiser = StreamingDenoiser(predictor, profile=profile, skip_silence=skip_silence)
+    limit = predictor.batch_limit(denoiser.window_shape)
+
+    for group in range(0, len(input_files), max_open_files):
+        inputs = input_files[group:group + max_open_files]
+        outputs = output_files[group:group + max_open_files]
+        readers = [read_audio_blocks(path, block_size=block_size) for path in inputs]
+        writers = [sf.SoundFile(path, 'w', samplerate=SAMPLE_RATE, channels=1) for path in outputs]
+        sessions = [denoiser.new_session() for _ in inputs]
+        try:
+            while not all(session.done for session in sessions):
+                # Decode one block of every unfinished input
+                for reader, session in zip(readers, sessions):
+                    if not session.finished:
+                        block = next(reader, None)
+                        if block is None:
+                            session.finish()
+                        else:
+                            session.feed(block)
+
+                queued = sum(len(session.pending) for session in sessions)
+                if queued >= limit or all(session.finished for session in sessions):
+                    for writer, samples in zip(writers, predict_sessions(denoiser, sessions)):
+                        if len(samples):
+                            writer.write(samples)
+        finally:
+            for reader in readers:
+                reader.close()
+            for writer in writers:
+                writer.close()
+        for session in sessions:
+            denoiser.record_session(session)
+    return denoiser.stats()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Denoise several audio/video files with batched model inference.')
+    parser.add_argument('input_files', nargs='+', help='noisy audio or video files')
+    parser.add_argument('--output-dir', required=True, help='folder for the denoised WAV files')
+    parser.add_argument('--model', required=True, help='path to the .keras/.h5 model')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(MODEL_PROFILES), help='model generation')
+    parser.add_argument('--batch-size', type=int, default=MAX_BATCH_SIZE, help='maximum windows per model call')
+    parser.add_argument('--batch-mb', type=float, default=MAX_BATCH_MB, help='maximum input tensor size in MB')
+    parser.add_argument('--backend', default='auto', choices=BACKENDS, help='auto prefers an exported TFLite/ONNX model')
+    parser.add_argument('--skip-silence', action='store_true', help='bypass the model for windows the VAD finds silent')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_files = output_paths(args.input_files, args.output_dir)
+
+    model = load_inference_model(args.model, args.profile, backend=args.backend)
+    stats = denoise_files(model, args.input_files, output_files, profile=args.profile,
+                          max_batch_size=args.batch_size, max_batch_mb=args.batch_mb, skip_silence=args.skip_silence)
+    print(f"Очищені аудіо збережено у {args.output_dir}")
+    print(f"Пропущено тихих вікон: {stats['skipped_windows']} з {stats['windows']}")
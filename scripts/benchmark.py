@@ -0,0 +1,238 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import soundfile as sf
+
+from denoise_audio import FIXED_LENGTH, read_audio_blocks
+from featurizer import (AUTOENCODER_PROFILE, DEFAULT_PROFILE, MODEL_PROFILES, SAMPLE_RATE, features_to_magnitude,
+                        istft, magnitude_to_features, stft, unit_phase)
+from inference_backends import resolve_model_path
+
+try:
+    import resource
+except ImportError:  # Windows has no resource module, peak_rss_mb falls back to psutil
+    resource = None
+
+# Configuration parameters
+STAGES = ('decode', 'stft', 'predict', 'inverse', 'encode')
+BUNDLED_AUDIO = (  # Test clips shipped with the training notebooks
+    'notebooks/train_models/ML-DAN_v.3.0/testV3.wav',
+    'notebooks/train_models/ML-DAN_v.4.0/testV4.wav',
+)
+SYNTHETIC_SECONDS = 30.0  # Length of the generated clip when no audio is given or bundled
+REPEATS = 3               # Runs of every file per configuration (the first one also warms the model up)
+
+# Model generations that can be benchmarked: feature settings, window length and sample rate
+BENCHMARK_PROFILES = {name: (profile, FIXED_LENGTH, SAMPLE_RATE) for name, profile in MODEL_PROFILES.items()}
+BENCHMARK_PROFILES['autoencoder'] = (AUTOENCODER_PROFILE, 128, 22050)  # Training_notebook_autoencoder_DB_norm.ipynb
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, or None if it cannot be measured."""
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak_rss / (1024 * 1024) if platform.system() == 'Darwin' else peak_rss / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    # peak_wset is the peak working set on Windows
+    info = psutil.Process().memory_info()
+    return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+
+
+class IdentityModel:
+    """Stand-in model that returns its input, to measure everything except the network."""
+    def predict(self, batch: np.ndarray, batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        return batch
+
+
+def synthetic_audio(path: str, seconds: float = SYNTHETIC_SECONDS, sr: int = SAMPLE_RATE, seed: int = 0) -> str:
+    """Write a reproducible noisy harmonic signal to ``path`` (used when no real audio is available)."""
+    t = np.arange(int(seconds * sr), dtype=np.float32) / sr
+    rng = np.random.default_rng(seed)
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((220.0, 440.0, 660.0, 880.0)))
+    signal = 0.3 * voice * (0.5 + 0.5 * np.sin(2 * np.pi * 0.5 * t)) + 0.05 * rng.standard_normal(len(t))
+    sf.write(path, (signal / np.max(np.abs(signal))).astype(np.float32), sr)
+    return path
+
+
+def decode_audio(path: str, sr: int) -> np.ndarray:
+    """Decode with ffmpeg like production; fall back to soundfile when ffmpeg is not installed."""
+    try:
+        return np.concatenate(list(read_audio_blocks(path, sr=sr)))
+    except FileNotFoundError:
+        audio, file_sr = sf.read(path, dtype='float32', always_2d=True)
+        audio = audio.mean(axis=1)
+        if file_sr != sr:
+            positions = np.arange(int(len(audio) * sr / file_sr)) * file_sr / sr
+            audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+        return audio
+
+
+def run_file(model, path: str, profile: Dict, window_length: int, sr: int, batch_size: int) -> Dict[str, float]:
+    """
+    Denoise one file stage by stage and time every stage.
+
+    Windows do not overlap here, so the timings cover exactly the work of
+    the production kernels (decode, batched STFT and feature scaling, model,
+    inverse scaling and ISTFT, WAV encoding) without the streaming bookkeeping.
+
+    Returns:
+        Dict[str, float]: Seconds per stage plus ``audio_seconds``.
+    """
+    timings = {}
+    start = time.perf_counter()
+    audio = decode_audio(path, sr)
+    timings['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    spectrum = stft(audio, profile['n_fft'], profile['hop_length'])
+    n_frames = spectrum.shape[1]
+    n_windows = max(1, -(-n_frames // window_length))
+    magnitude = np.pad(np.abs(spectrum), ((0, 0), (0, n_windows * window_length - n_frames)))
+    windows = magnitude.reshape(magnitude.shape[0], n_windows, window_length).transpose(1, 0, 2)
+    features, ref_power = magnitude_to_features(windows, profile, sr)
+    timings['stft'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = features[..., np.newaxis]
+    predictions = np.concatenate([model.predict(batch[i:i + batch_size], verbose=0)
+                                  for i in range(0, len(batch), batch_size)])
+    predictions = predictions[:, :features.shape[1], :features.shape[2], 0]
+    timings['predict'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    denoised = features_to_magnitude(predictions, ref_power, profile, sr)
+    denoised = denoised.transpose(1, 0, 2).reshape(denoised.shape[1], -1)[:, :n_frames]
+    output = istft(denoised * unit_phase(spectrum), profile['n_fft'], profile['hop_length'], length=len(audio))
+    timings['inverse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sf.write(io.BytesIO(), output, sr, format='WAV')
+    timings['encode'] = time.perf_counter() - start
+
+    timings['audio_seconds'] = len(audio) / sr
+    return timings
+
+
+def run_configuration(model_path: str, profile_name: str, backend: str, batch_size: int,
+                      audio_files: Sequence[str], repeats: int = REPEATS) -> Dict:
+    """
+    Benchmark one model/backend/batch size; meant to run in a fresh process so peak RSS is its own.
+
+    Returns:
+        Dict: JSON-serializable result with per-stage latency, RTF, files/minute and peak RSS.
+    """
+    profile, window_length, sr = BENCHMARK_PROFILES[profile_name]
+
+    start = time.perf_counter()
+    if model_path == 'identity':
+        model, resolved = IdentityModel(), 'identity'
+    else:
+        from inference_backends import load_inference_model
+
+        resolved = resolve_model_path(model_path, backend)[1]
+        # The profile only picks the ResizeLayer variant here; the autoencoder has none
+        model = load_inference_model(model_path, profile_name if profile_name in MODEL_PROFILES else DEFAULT_PROFILE,
+                                     backend=backend)
+    load_seconds = time.perf_counter() - start
+
+    # The first pass warms up the model (graph tracing, allocations) and is not measured
+    run_file(model, audio_files[0], profile, window_length, sr, batch_size)
+
+    runs = [run_file(model, path, profile, window_length, sr, batch_size)
+            for _ in range(repeats) for path in audio_files]
+    wall_seconds = sum(sum(run[stage] for stage in STAGES) for run in runs)
+    audio_seconds = sum(run['audio_seconds'] for run in runs)
+
+    return {
+        'model': model_path,
+        'profile': profile_name,
+        'backend': resolved,
+        'batch_size': batch_size,
+        'files': len(runs),
+        'audio_seconds': audio_seconds,
+        'load_seconds': load_seconds,
+        'stages': {stage: {'mean': float(np.mean([run[stage] for run in runs])),
+                           'p95': float(np.percentile([run[stage] for run in runs], 95))}
+                   for stage in STAGES},
+        'total_seconds': wall_seconds,
+        'rtf': wall_seconds / audio_seconds,
+        'files_per_minute': len(runs) / wall_seconds * 60.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmark(models: Sequence[str], audio_files: Sequence[str], batch_sizes: Sequence[int],
+                  backends: Sequence[str], repeats: int = REPEATS) -> Dict:
+    """
+    Benchmark every combination of model, backend and batch size, each in its own process.
+
+    Args:
+        models (Sequence[str]): ``path:profile`` entries, e.g. ``models/ML-DAN_v3.1.keras:v3`` or ``identity:v4``.
+        audio_files (Sequence[str]): Audio files to denoise.
+        batch_sizes (Sequence[int]): Windows per model call.
+        backends (Sequence[str]): ``inference_backends.BACKENDS`` entries.
+        repeats (int): Runs of every file.
+
+    Returns:
+        Dict: Environment description and one result per configuration.
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for entry in models:
+        model_path, _, profile_name = entry.rpartition(':')
+        for backend in (['keras'] if model_path == 'identity' else backends):
+            if backend in ('tflite', 'onnx') and resolve_model_path(model_path, backend)[1] != backend:
+                print(f"{entry}: no exported {backend} model, skipped (see export_model.py)")
+                continue
+            for batch_size in batch_sizes:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(run_configuration, model_path, profile_name, backend, batch_size,
+                                             audio_files, repeats).result()
+                results.append(result)
+                peak = 'n/a' if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.0f} MB"
+                print(f"{entry} [{result['backend']}, batch {batch_size}]: RTF {result['rtf']:.3f}, "
+                      f"{result['files_per_minute']:.1f} files/min, peak RSS {peak}")
+
+    return {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'machine': platform.machine(), 'cpu_count': os.cpu_count()},
+        'audio_files': list(audio_files),
+        'results': results,
+    }
+
+
+def default_audio(work_dir: str) -> List[str]:
+    """Bundled test clips if they exist, otherwise one synthetic clip."""
+    bundled = [path for path in BUNDLED_AUDIO if os.path.exists(path)]
+    return bundled or [synthetic_audio(os.path.join(work_dir, 'benchmark_synthetic.wav'))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure speed and memory of ML-DAN models.')
+    parser.add_argument('--model', action='append', required=True,
+                        help='path:profile, e.g. notebooks/train_models/ML-DAN_v.3.0/ML-DAN_v3.1.keras:v3 '
+                             'or identity:v4 (no network); may be repeated')
+    parser.add_argument('--audio', nargs='*', default=None, help='audio files (default: bundled test clips)')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 8], help='windows per model call')
+    parser.add_argument('--backend', nargs='+', default=['keras'], help='keras, tflite, onnx and/or auto')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--output', default='bench_output.json', help='where to write the JSON report')
+    args = parser.parse_args()
+
+    audio_files = args.audio or default_audio(os.path.dirname(os.path.abspath(args.output)))
+    report = run_benchmark(args.model, audio_files, args.batch_size, args.backend, args.repeats)
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Результати збережено у {args.output}")
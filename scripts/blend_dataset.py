@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+# Configuration parameters
+SAMPLE_RATE = 16000       # Sample rate of LibriSpeech and of the blended files
+NOISE_GAIN_DB = -5.0      # Noise level change before mixing (the notebook used `noise_audio - 5`)
+NOISE_CACHE = '.noise_cache.npy'  # Decoded noise of the whole noise folder (inside the blended folder)
+
+# Noise cache opened by every worker process (see _init_worker)
+_noise = None
+_noise_offsets = None
+
+
+def find_files(directory: str, extension: str) -> List[str]:
+    """
+    Recursively list files with the given extension, sorted for a stable order.
+
+    Args:
+        directory (str): Root directory.
+        extension (str): File extension, e.g. ``'.flac'``.
+
+    Returns:
+        List[str]: Sorted file paths.
+    """
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, file) for file in files if file.lower().endswith(extension))
+    return sorted(paths)
+
+
+def build_noise_cache(noise_dir: str, cache_path: str, sr: int = SAMPLE_RATE) -> None:
+    """
+    Decode every noise WAV once and store all of them in one contiguous float32 array.
+
+    The cache consists of ``cache_path`` (all samples back to back) and a
+    ``.json`` file with the file names and their offsets. It is rebuilt when
+    a noise file is added, removed or modified (name, size and mtime).
+
+    Args:
+        noise_dir (str): Directory with noise ``.wav`` files.
+        cache_path (str): Path of the ``.npy`` cache file.
+        sr (int): Sample rate to resample the noise to.
+    """
+    import librosa
+
+    noise_files = find_files(noise_dir, '.wav')
+    if not noise_files:
+        raise FileNotFoundError(f"No .wav noise files in {noise_dir}")
+
+    index_path = os.path.splitext(cache_path)[0] + '.json'
+    files = [[os.path.relpath(path, noise_dir), os.path.getsize(path), os.path.getmtime(path)]
+             for path in noise_files]
+    if os.path.exists(cache_path) and os.path.exists(index_path):
+        with open(index_path, 'r') as file:
+            index = json.load(file)
+        if index['files'] == files and index.get('sample_rate') == sr:
+            return
+
+    offsets, lengths, signals = [], [], []
+    total = 0
+    for path in noise_files:
+        signal, _ = librosa.load(path, sr=sr, mono=True)
+        offsets.append(total)
+        lengths.append(len(signal))
+        signals.append(signal.astype(np.float32))
+        total += len(signal)
+
+    np.save(cache_path, np.concatenate(signals))
+    with open(index_path, 'w') as file:
+        json.dump({'files': files, 'offsets': offsets, 'lengths': lengths, 'sample_rate': sr}, file)
+
+
+def _init_worker(cache_path: str) -> None:
+    # Memory-mapped, so all workers share one copy of the decoded noise through the page cache
+    global _noise, _noise_offsets
+    _noise = np.load(cache_path, mmap_mode='r')
+    with open(os.path.splitext(cache_path)[0] + '.json', 'r') as file:
+        index = json.load(file)
+    _noise_offsets = list(zip(index['offsets'], index['lengths']))
+
+
+def mix_noise(clean: np.ndarray, noise: np.ndarray, gain_db: float = NOISE_GAIN_DB) -> np.ndarray:
+    """
+    Loop the noise to the length of the clean signal, apply the gain and add it.
+
+    Args:
+        clean (np.ndarray): Clean mono signal in [-1, 1].
+        noise (np.ndarray): Noise mono signal in [-1, 1].
+        gain_db (float): Noise level change in dB.
+
+    Returns:
+        np.ndarray: Blended float32 signal clipped to [-1, 1].
+    """
+    repeats = len(clean) // max(1, len(noise)) + 1
+    looped = np.tile(noise, repeats)[:len(clean)]
+    blended = clean + looped * np.float32(10.0 ** (gain_db / 20.0))
+    return np.clip(blended, -1.0, 1.0).astype(np.float32)
+
+
+def blend_file(task: Tuple[str, str, int, float]) -> Optional[Tuple[str, float]]:
+    """
+    Blend one clean file with a noise file chosen deterministically and save it as MP3.
+
+    The noise choice depends only on the seed and the clean file name, so the
+    result does not depend on the number of workers or on which files were
+    already done. Files that already exist are skipped, which makes an
+    interrupted run resumable. Clean files at another sample rate are
+    resampled to ``SAMPLE_RATE`` to match the noise cache.
+
+    Args:
+        task (Tuple[str, str, int, float]): Clean path, blended path, seed, noise gain in dB.
+
+    Returns:
+        Optional[Tuple[str, float]]: Blended path and size in MB, or None if skipped.
+    """
+    clean_path, blended_path, seed, gain_db = task
+    if os.path.exists(blended_path) and os.path.getsize(blended_path) > 0:
+        return None
+
+    name = os.path.basename(clean_path)
+    rng = np.random.default_rng([seed, zlib.crc32(name.encode('utf-8'))])
+    offset, length = _noise_offsets[rng.integers(len(_noise_offsets))]
+    noise = np.asarray(_noise[offset:offset + length])
+
+    clean, sr = sf.read(clean_path, dtype='float32', always_2d=True)
+    clean = clean.mean(axis=1)
+    if sr != SAMPLE_RATE:
+        # The noise cache is decoded at SAMPLE_RATE, so the clean signal has to match it
+        import librosa
+        clean = librosa.resample(clean, orig_sr=sr, target_sr=SAMPLE_RATE).astype(np.float32)
+    blended = mix_noise(clean, noise, gain_db)
+
+    # Write under a temporary name first so an interrupted write is never taken for a finished file
+    tmp_path = blended_path + '.part'
+    try:
+        sf.write(tmp_path, blended, SAMPLE_RATE, format='MP3')
+        os.replace(tmp_path, blended_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return blended_path, os.path.getsize(blended_path) / (1024 * 1024)
+
+
+def blend_dataset(clean_dir: str, noise_dir: str, blended_dir: str, workers: Optional[int] = None,
+                  seed: int = 0, gain_db: float = NOISE_GAIN_DB) -> None:
+    """
+    Blend every clean ``.flac`` file under ``clean_dir`` with noise from ``noise_dir``.
+
+    Args:
+        clean_dir (str): Directory with clean LibriSpeech ``.flac`` files.
+        noise_dir (str): Directory with noise ``.wav`` files.
+        blended_dir (str): Output directory for the blended ``.mp3`` files.
+        workers (Optional[int]): Number of worker processes (None - one per CPU core).
+        seed (int): Seed of the noise choice.
+        gain_db (float): Noise level change in dB.
+    """
+    os.makedirs(blended_dir, exist_ok=True)
+    cache_path = os.path.join(blended_dir, NOISE_CACHE)
+    build_noise_cache(noise_dir, cache_path)
+
+    tasks = [(path, os.path.join(blended_dir, os.path.splitext(os.path.basename(path))[0] + '.mp3'), seed, gain_db)
+             for path in find_files(clean_dir, '.flac')]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_path,)) as executor:
+        for file_index, result in enumerate(executor.map(blend_file, tasks, chunksize=16), start=1):
+            if result is None:
+                continue
+            blended_path, file_size_mb = result
+            current_time = datetime.now().strftime('%H:%M:%S_%d.%m.%Y')
+            print(f"[INFO] [{current_time}] File #{file_index} created: {os.path.basename(blended_path)} ({file_size_mb:.2f} MB)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Blend clean speech with noise to build a training dataset.')
+    parser.add_argument('--clean-dir', required=True, help='e.g. ../data/audios/english/train/clean')
+    parser.add_argument('--noise-dir', required=True, help='e.g. ../data/audios/english/train/noise')
+    parser.add_argument('--blended-dir', required=True, help='e.g. ../data/audios/english/train/blended')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the noise choice')
+    parser.add_argument('--gain-db', type=float, default=NOISE_GAIN_DB, help='noise level change in dB')
+    args = parser.parse_args()
+
+    blend_dataset(args.clean_dir, args.noise_dir, args.blended_dir, workers=args.workers,
+                  seed=args.seed, gain_db=args.gain_db)
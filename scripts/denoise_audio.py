@@ -0,0 +1,540 @@
+import argparse
+import os
+import subprocess
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from featurizer import (DEFAULT_PROFILE, MODEL_PROFILES, SAMPLE_RATE, features_to_magnitude, hann_window,
+                        magnitude_to_features, n_features, overlap_add, stft, unit_phase)
+from metrics import WINDOWS, span, timed_iter
+from vad import SILENCE_GAIN, is_silent
+
+# Configuration parameters
+FIXED_LENGTH = 300        # Time length of one model window (in frames)
+WINDOW_OVERLAP = 60       # Overlap between neighbouring windows (in frames)
+BLOCK_SIZE = 65536        # Number of samples decoded from disk per block
+SKIP_SILENCE = False      # Bypass the model for windows the VAD (vad.py) finds silent (opt-in, changes the output)
+
+
+def load_denoising_model(model_path: str, profile: str = DEFAULT_PROFILE):
+    """
+    Load a saved ML-DAN model together with the ResizeLayer variant it was trained with.
+
+    TensorFlow is imported here and not at module level, so that importing this
+    module stays cheap for callers that never touch the model.
+
+    Args:
+        model_path (str): Path to the ``.keras``/``.h5`` model.
+        profile (str): Key of ``MODEL_PROFILES`` describing the model.
+
+    Returns:
+        tf.keras.Model: Loaded model.
+    """
+    from tensorflow.keras.models import load_model
+    from model_layers import RESIZE_LAYERS
+
+    resize_layer = RESIZE_LAYERS[MODEL_PROFILES[profile]['resize_mode']]
+    # Models built by kfold_training.build_unet_model save the v4 layer under its own class name
+    custom_objects = {'ResizeLayer': resize_layer, 'CropOrPadResizeLayer': RESIZE_LAYERS['crop_or_pad']}
+    return load_model(model_path, custom_objects=custom_objects, compile=False)
+
+
+def read_pcm_blocks(stream: BinaryIO, block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Read raw little-endian float32 PCM from a binary stream in fixed-size blocks.
+
+    Args:
+        stream (BinaryIO): Stream to read from (file, pipe).
+        block_size (int): Number of samples per block.
+
+    Yields:
+        np.ndarray: 1D float32 block of samples (the last one may be shorter).
+    """
+    bytes_per_block = block_size * 4
+    while True:
+        data = stream.read(bytes_per_block)
+        if not data:
+            break
+        usable = len(data) - len(data) % 4
+        if usable:
+            yield np.frombuffer(data[:usable], dtype='<f4')
+
+
+def read_command_blocks(command: List[str], block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Run a command that writes raw float32 PCM to stdout and stream its output in blocks.
+
+    Args:
+        command (List[str]): ffmpeg command ending with ``-f f32le pipe:1``.
+        block_size (int): Number of samples per block.
+
+    Yields:
+        np.ndarray: 1D float32 block of samples.
+    """
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        yield from read_pcm_blocks(process.stdout, block_size)
+    except GeneratorExit:
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def read_audio_blocks(input_file: str, sr: int = SAMPLE_RATE, block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Decode any audio/video file with ffmpeg and stream it as mono float32 blocks.
+
+    Only one block is held in memory at a time, so the file length does not
+    affect memory usage.
+
+    Args:
+        input_file (str): Path to the media file.
+        sr (int): Output sample rate.
+        block_size (int): Number of samples per block.
+
+    Yields:
+        np.ndarray: 1D float32 block of samples.
+    """
+    command = [
+        'ffmpeg',
+        '-loglevel', 'warning',
+        '-i', input_file,  # Вхідний файл
+        '-vn',  # Без відео
+        '-ac', '1',  # Моно
+        '-ar', str(sr),  # Частота дискретизації моделі
+        '-f', 'f32le',  # Сирі float32 семпли
+        'pipe:1'
+    ]
+    yield from read_command_blocks(command, block_size)
+
+
+def read_pcm_file_blocks(pcm_file: str, audio_format: str = 'f32le', block_size: int = BLOCK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Stream a raw mono PCM file (e.g. from ``split_video_audio_single_pass``) through a memory map.
+
+    Float32 blocks are views into the mapped file, so nothing is decoded or
+    copied and the OS pages the data in as the denoiser advances.
+
+    Args:
+        pcm_file (str): Path to the raw PCM file at the model sample rate.
+        audio_format (str): ``'f32le'`` or ``'s16le'``.
+        block_size (int): Number of samples per block.
+
+    Yields:
+        np.ndarray: 1D float32 block of samples.
+    """
+    if os.path.getsize(pcm_file) == 0:
+        return
+    samples = np.memmap(pcm_file, dtype='<f4' if audio_format == 'f32le' else '<i2', mode='r')
+    for start in range(0, len(samples), block_size):
+        block = samples[start:start + block_size]
+        yield block if audio_format == 'f32le' else block.astype(np.float32) / 32768.0
+
+
+class StreamingSTFT:
+    """
+    Incremental STFT equivalent to ``librosa.stft(y, center=True, pad_mode='constant')``.
+
+    Samples are pushed block by block and only the frames that are complete so
+    far are returned; a tail of ``n_fft - hop_length`` samples is carried over.
+    """
+    def __init__(self, n_fft: int, hop_length: int):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.buffer = np.zeros(n_fft // 2, dtype=np.float32)  # Center padding
+
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Add samples and return the newly completed frames.
+
+        Returns:
+            np.ndarray: Complex STFT of shape (1 + n_fft // 2, n_new_frames).
+        """
+        self.buffer = np.concatenate([self.buffer, np.asarray(samples, dtype=np.float32)])
+        if len(self.buffer) < self.n_fft:
+            return np.zeros((self.n_fft // 2 + 1, 0), dtype=np.complex64)
+
+        spectrum = stft(self.buffer, self.n_fft, self.hop_length, center=False)
+        self.buffer = self.buffer[spectrum.shape[1] * self.hop_length:]
+        return spectrum
+
+    def flush(self) -> np.ndarray:
+        """Pad the end of the signal and return the remaining frames."""
+        return self.push(np.zeros(self.n_fft // 2, dtype=np.float32))
+
+
+class StreamingISTFT:
+    """
+    Incremental inverse of ``StreamingSTFT`` (windowed overlap-add).
+
+    Every pushed frame finalizes ``hop_length`` output samples, so the output is
+    emitted with a constant delay of one FFT window.
+    """
+    def __init__(self, n_fft: int, hop_length: int):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = hann_window(n_fft)
+        self.buffer = np.zeros(n_fft, dtype=np.float32)
+        self.norm = np.zeros(n_fft, dtype=np.float32)
+        self.to_skip = n_fft // 2  # Center padding added by StreamingSTFT
+
+    def _emit(self, samples: np.ndarray, norm: np.ndarray) -> np.ndarray:
+        nonzero = norm > np.finfo(np.float32).tiny
+        samples[nonzero] /= norm[nonzero]
+        skip = min(self.to_skip, len(samples))
+        self.to_skip -= skip
+        return samples[skip:]
+
+    def push(self, spectrum: np.ndarray) -> np.ndarray:
+        """
+        Add complex STFT frames and return the output samples that are final.
+
+        Args:
+            spectrum (np.ndarray): Complex STFT of shape (1 + n_fft // 2, n_frames).
+
+        Returns:
+            np.ndarray: 1D float32 array of finished samples.
+        """
+        n_frames = spectrum.shape[1]
+        if n_frames == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        frames = np.fft.irfft(spectrum.T, n=self.n_fft, axis=1).astype(np.float32) * self.window
+        # One extra hop of zeros keeps the carried-over buffer at n_fft samples
+        window_sq = np.broadcast_to(self.window ** 2, frames.shape)
+        output = np.pad(overlap_add(frames, self.hop_length), (0, self.hop_length))
+        norm = np.pad(overlap_add(window_sq, self.hop_length), (0, self.hop_length))
+        output[:self.n_fft] += self.buffer
+        norm[:self.n_fft] += self.norm
+
+        done = n_frames * self.hop_length
+        self.buffer, self.norm = output[done:], norm[done:]
+        return self._emit(output[:done], norm[:done])
+
+    def flush(self) -> np.ndarray:
+        """Return whatever is left in the overlap-add buffer."""
+        samples = self._emit(self.buffer, self.norm)
+        self.buffer = np.zeros(self.n_fft, dtype=np.float32)
+        self.norm = np.zeros(self.n_fft, dtype=np.float32)
+        return samples
+
+
+class DenoiseSession:
+    """
+    Denoising state of one audio stream.
+
+    The STFT of the input is cut into overlapping windows of ``window_length``
+    frames. Windows are queued as soon as all their frames are known and the
+    caller runs them through the model (possibly batched together with windows
+    of other sessions). Every prediction is converted back to a linear
+    magnitude and cross-faded with its neighbours (overlap-add). Denoised
+    magnitudes are recombined with the phase of the noisy signal and turned
+    back into audio as soon as no later window can touch them, so memory use
+    is bounded by a couple of windows regardless of the input length.
+
+    With ``skip_silence`` a window that ``vad.is_silent`` classifies as
+    silence is not queued for the model; its noisy magnitude is passed
+    through scaled by ``silence_gain``.
+    """
+    def __init__(self, profile: Dict, window_length: int, step: int, taper: np.ndarray, sr: int,
+                 skip_silence: bool = False, silence_gain: float = SILENCE_GAIN):
+        self.profile = profile
+        self.window_length = window_length
+        self.step = step
+        self.taper = taper
+        self.sr = sr
+        self.skip_silence = skip_silence
+        self.silence_gain = silence_gain
+
+        n_bins = profile['n_fft'] // 2 + 1
+        self.stft = StreamingSTFT(profile['n_fft'], profile['hop_length'])
+        self.istft = StreamingISTFT(profile['n_fft'], profile['hop_length'])
+
+        # Noisy STFT frames and overlap-add accumulators, starting at frame `first_frame`
+        self.noisy = np.zeros((n_bins, 0), dtype=np.complex64)
+        self.denoised = np.zeros((n_bins, 0), dtype=np.float32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.first_frame = 0
+
+        self.next_window = 0      # Start frame of the next window to queue
+        self.pending = []         # Queued windows: (start frame, valid frames, reference level, bypass magnitude)
+        self.pending_features = []
+        self.windows = 0          # Windows seen so far
+        self.skipped_windows = 0  # Windows that bypassed the model
+        self.total_samples = 0
+        self.emitted_samples = 0
+        self.finished = False
+
+    @property
+    def end_frame(self) -> int:
+        return self.first_frame + self.noisy.shape[1]
+
+    @property
+    def done(self) -> bool:
+        """True when the input has ended and every sample has been emitted."""
+        return self.finished and not self.pending and self.noisy.shape[1] == 0
+
+    def feed(self, samples: np.ndarray) -> None:
+        """Add a block of input samples and queue the windows it completes."""
+        self.total_samples += len(samples)
+        self._append(self.stft.push(samples))
+
+    def finish(self) -> None:
+        """Mark the end of the input and queue the remaining (padded) windows."""
+        self.finished = True
+        self._append(self.stft.flush())
+
+    def take_windows(self) -> List[np.ndarray]:
+        """Return the features of all queued windows that need the model, in order (may be empty)."""
+        features, self.pending_features = self.pending_features, []
+        return features
+
+    def complete(self, predictions: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Consume model outputs for the windows returned by ``take_windows``.
+
+        Args:
+            predictions (Sequence[np.ndarray]): One (n_features, window_length)
+                model output per window, in the same order.
+
+        Returns:
+            np.ndarray: Output samples that became final.
+        """
+        predicted = iter(())
+        if len(predictions):
+            # Undo the feature scaling of every window in one batched call
+            refs = np.stack([ref for _, _, ref, bypass in self.pending if bypass is None])
+            predicted = iter(features_to_magnitude(np.stack(predictions), refs, self.profile, self.sr))
+        for start, valid, _, bypass in self.pending:
+            # Skipped (silent) windows bring their attenuated noisy magnitude instead of a prediction
+            magnitude = next(predicted) if bypass is None else bypass
+            offset = start - self.first_frame
+            self.denoised[:, offset:offset + valid] += magnitude[:, :valid] * self.taper[:valid]
+            self.weights[offset:offset + valid] += self.taper[:valid]
+        self.pending = []
+
+        if self.finished and self.next_window >= self.end_frame:
+            return self._emit(np.concatenate([self._release(self.noisy.shape[1]), self.istft.flush()]))
+        # Frames before the next window will not receive any more contributions
+        return self._emit(self._release(min(self.next_window, self.end_frame) - self.first_frame))
+
+    def _append(self, spectrum: np.ndarray) -> None:
+        self.noisy = np.concatenate([self.noisy, spectrum], axis=1)
+        self.denoised = np.concatenate([self.denoised, np.zeros(spectrum.shape, dtype=np.float32)], axis=1)
+        self.weights = np.concatenate([self.weights, np.zeros(spectrum.shape[1], dtype=np.float32)])
+
+        while (self.end_frame >= self.next_window + self.window_length
+               or (self.finished and self.next_window < self.end_frame)):
+            offset = self.next_window - self.first_frame
+            window = np.abs(self.noisy[:, offset:offset + self.window_length])
+            valid = window.shape[1]
+            if valid < self.window_length:
+                window = np.pad(window, ((0, 0), (0, self.window_length - valid)))
+            self.windows += 1
+            if self.skip_silence and is_silent(window[:, :valid], self.profile['n_fft']):
+                self.skipped_windows += 1
+                self.pending.append((self.next_window, valid, None, window * self.silence_gain))
+            else:
+                features, ref = magnitude_to_features(window, self.profile, self.sr)
+                self.pending.append((self.next_window, valid, ref, None))
+                self.pending_features.append(features.astype(np.float32))
+            self.next_window += self.step
+
+    def _release(self, n_frames: int) -> np.ndarray:
+        phase = unit_phase(self.noisy[:, :n_frames])
+        spectrum = self.denoised[:, :n_frames] / np.maximum(self.weights[:n_frames], 1e-12) * phase
+        self.noisy = self.noisy[:, n_frames:]
+        self.denoised = self.denoised[:, n_frames:]
+        self.weights = self.weights[n_frames:]
+        self.first_frame += n_frames
+        return self.istft.push(spectrum)
+
+    def _emit(self, samples: np.ndarray) -> np.ndarray:
+        # The STFT padding may produce a few samples past the end of the input
+        samples = samples[:max(0, self.total_samples - self.emitted_samples)]
+        self.emitted_samples += len(samples)
+        return samples
+
+
+class StreamingDenoiser:
+    """
+    Denoise audio of any length with a fixed-size ML-DAN model.
+
+    ``model`` only needs a Keras-like ``predict(batch, verbose=0)`` method, so a
+    ``batch_inference.BatchPredictor`` can be passed instead of a bare model.
+    With ``skip_silence`` silent windows bypass the model (see ``DenoiseSession``);
+    ``windows``/``skipped_windows`` count them over all recorded sessions.
+    """
+    def __init__(self, model, profile: str = DEFAULT_PROFILE, window_length: int = FIXED_LENGTH,
+                 overlap: int = WINDOW_OVERLAP, batch_windows: int = 1, sr: int = SAMPLE_RATE,
+                 skip_silence: bool = SKIP_SILENCE, silence_gain: float = SILENCE_GAIN):
+        if not 0 <= overlap < window_length:
+            raise ValueError(f"overlap must be in [0, {window_length}), got {overlap}")
+
+        self.model = model
+        self.profile = MODEL_PROFILES[profile]
+        self.window_length = window_length
+        self.step = window_length - overlap
+        self.batch_windows = max(1, batch_windows)
+        self.sr = sr
+        self.skip_silence = skip_silence
+        self.silence_gain = silence_gain
+        self.windows = 0
+        self.skipped_windows = 0
+
+        # Linear fade-in/fade-out over the overlapping frames
+        self.taper = np.ones(window_length, dtype=np.float32)
+        if overlap:
+            ramp = np.linspace(0.0, 1.0, overlap + 2, dtype=np.float32)[1:-1]
+            self.taper[:overlap] = ramp
+            self.taper[-overlap:] = ramp[::-1]
+
+    @property
+    def window_shape(self) -> Tuple[int, int, int]:
+        """Shape of one model input window, without the batch axis."""
+        return n_features(self.profile), self.window_length, 1
+
+    def new_session(self) -> DenoiseSession:
+        """Create the state for one more input stream."""
+        return DenoiseSession(self.profile, self.window_length, self.step, self.taper, self.sr,
+                              skip_silence=self.skip_silence, silence_gain=self.silence_gain)
+
+    def record_session(self, session: DenoiseSession) -> None:
+        """Add the window counts of a finished session to the totals and to ``metrics.WINDOWS``."""
+        self.windows += session.windows
+        self.skipped_windows += session.skipped_windows
+        WINDOWS.inc('model', session.windows - session.skipped_windows)
+        WINDOWS.inc('skipped', session.skipped_windows)
+
+    def stats(self) -> Dict[str, int]:
+        """Windows processed and skipped as silence so far."""
+        return {'windows': self.windows, 'skipped_windows': self.skipped_windows}
+
+    def predict_windows(self, windows: Sequence[np.ndarray]) -> np.ndarray:
+        """
+        Run a list of feature windows through the model in one call.
+
+        Args:
+            windows (Sequence[np.ndarray]): Windows of shape (n_features, window_length).
+
+        Returns:
+            np.ndarray: Predictions of shape (N, n_features, window_length).
+        """
+        batch = np.stack(windows)[..., np.newaxis]
+        with span('predict'):
+            predictions = self.model.predict(batch, verbose=0)
+        # Some models (v3.1) output a slightly larger map than their input
+        return predictions[:, :batch.shape[1], :batch.shape[2], 0]
+
+    def denoise_blocks(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """
+        Denoise a stream of audio blocks.
+
+        Args:
+            blocks (Iterable[np.ndarray]): Mono float32 blocks at ``sr``.
+
+        Yields:
+            np.ndarray: Denoised mono float32 blocks; together they have exactly
+            as many samples as the input.
+        """
+        session = self.new_session()
+        for block in timed_iter(blocks, 'decode'):
+            with span('features'):
+                session.feed(block)
+            if len(session.pending) >= self.batch_windows:
+                windows = session.take_windows()
+                predictions = self.predict_windows(windows) if windows else []
+                with span('reconstruct'):
+                    samples = session.complete(predictions)
+                if len(samples):
+                    yield samples
+
+        with span('features'):
+            session.finish()
+        while not session.done:
+            windows = session.take_windows()
+            predictions = self.predict_windows(windows) if windows else []
+            with span('reconstruct'):
+                samples = session.complete(predictions)
+            if len(samples):
+                yield samples
+        self.record_session(session)
+
+
+def denoise_blocks_to_file(model, blocks: Iterable[np.ndarray], output_file: str, profile: str = DEFAULT_PROFILE,
+                           progress: Optional[Callable[[float], None]] = None,
+                           skip_silence: bool = SKIP_SILENCE) -> Dict[str, int]:
+    """
+    Denoise a stream of audio blocks and write the result to a WAV file as it is produced.
+
+    Args:
+        model (tf.keras.Model): Trained noise reduction model.
+        blocks (Iterable[np.ndarray]): Mono float32 blocks at ``SAMPLE_RATE``.
+        output_file (str): Path where the denoised audio will be saved.
+        profile (str): Key of ``MODEL_PROFILES`` describing the model.
+        progress (Optional[Callable[[float], None]]): Called with the number of
+            seconds of audio written so far after every denoised chunk.
+        skip_silence (bool): Bypass the model for silent windows.
+
+    Returns:
+        Dict[str, int]: ``StreamingDenoiser.stats`` (windows and skipped windows).
+    """
+    denoiser = StreamingDenoiser(model, profile=profile, skip_silence=skip_silence)
+    written = 0
+    with sf.SoundFile(output_file, 'w', samplerate=SAMPLE_RATE, channels=1) as output:
+        for samples in denoiser.denoise_blocks(blocks):
+            with span('encode'):
+                output.write(samples)
+            written += len(samples)
+            if progress is not None:
+                progress(written / SAMPLE_RATE)
+    return denoiser.stats()
+
+
+def denoise_file(model, input_file: str, output_file: str, profile: str = DEFAULT_PROFILE,
+                 block_size: int = BLOCK_SIZE, progress: Optional[Callable[[float], None]] = None,
+                 skip_silence: bool = SKIP_SILENCE) -> Dict[str, int]:
+    """
+    Denoise a media file of any length and save the result as a WAV file.
+
+    The input is decoded, denoised and written block by block, so even hours of
+    audio are processed in constant memory.
+
+    Args:
+        model (tf.keras.Model): Trained noise reduction model.
+        input_file (str): Path to the noisy audio/video file.
+        output_file (str): Path where the denoised audio will be saved.
+        profile (str): Key of ``MODEL_PROFILES`` describing the model.
+        block_size (int): Number of samples decoded per block.
+        progress (Optional[Callable[[float], None]]): Called with the number of
+            seconds of audio denoised so far.
+        skip_silence (bool): Bypass the model for silent windows.
+
+    Returns:
+        Dict[str, int]: Windows processed and skipped as silence.
+    """
+    return denoise_blocks_to_file(model, read_audio_blocks(input_file, block_size=block_size), output_file,
+                                  profile=profile, progress=progress, skip_silence=skip_silence)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Denoise an audio/video file of any length with an ML-DAN model.')
+    parser.add_argument('input_file', help='noisy audio or video file')
+    parser.add_argument('output_file', help='where to save the denoised WAV file')
+    parser.add_argument('--model', required=True, help='path to the .keras/.h5 model')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(MODEL_PROFILES), help='model generation')
+    parser.add_argument('--skip-silence', action='store_true',
+                        help='pass windows the VAD finds silent through at SILENCE_GAIN instead of running the model')
+    args = parser.parse_args()
+
+    model = load_denoising_model(args.model, args.profile)
+    stats = denoise_file(model, args.input_file, args.output_file, profile=args.profile,
+                         skip_silence=args.skip_silence)
+    print(f"Очищене аудіо збережено у {args.output_file}")
+    print(f"Пропущено тихих вікон: {stats['skipped_windows']} з {stats['windows']}")
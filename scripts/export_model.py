@@ -0,0 +1,209 @@
+import argparse
+import os
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from denoise_audio import DEFAULT_PROFILE, FIXED_LENGTH, MODEL_PROFILES, load_denoising_model
+from featurizer import SAMPLE_RATE, featurize
+
+# Configuration parameters
+QUANTIZATIONS = ('float16', 'int8', 'dynamic')  # float16 weights / full int8 / int8 weights with float activations
+CALIBRATION_WINDOWS = 64  # Windows used to calibrate full int8 quantization
+PARITY_WINDOWS = 16       # Windows compared by check_parity
+PARITY_TOLERANCE = 0.05   # Maximum mean absolute difference accepted by check_parity, relative to the output range
+
+
+def synthetic_speech(count: int, samples: int, sr: int = SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    """
+    Seeded noisy voice-like signals: harmonics of a gliding pitch, syllable-rate envelope and noise.
+
+    Every signal gets its own pitch, level and SNR, so the windows cover the
+    range of levels the model meets in real files.
+
+    Returns:
+        np.ndarray: float32 array of shape (count, samples) in [-1, 1].
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(samples, dtype=np.float32) / sr
+    signals = np.empty((count, samples), dtype=np.float32)
+    for i in range(count):
+        pitch = rng.uniform(90.0, 260.0) * (1.0 + 0.1 * np.sin(2 * np.pi * rng.uniform(0.2, 1.0) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sr
+        voice = sum(np.sin(k * phase) / k for k in range(1, 9))
+        envelope = np.maximum(np.sin(2 * np.pi * rng.uniform(2.0, 5.0) * t + rng.uniform(0, 2 * np.pi)), 0.0)
+        speech = voice * envelope
+        noise = rng.standard_normal(samples)
+        snr = rng.uniform(0.0, 20.0)
+        noise *= np.sqrt(np.mean(speech ** 2) / (np.mean(noise ** 2) * 10.0 ** (snr / 10.0)))
+        mix = speech + noise
+        signals[i] = mix / np.max(np.abs(mix)) * rng.uniform(0.05, 1.0)
+    return signals
+
+
+def sample_windows(profile: str, count: int, store_dir: Optional[str] = None, seed: int = 0,
+                   audio_files: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    Model inputs for calibration and parity checks.
+
+    Real features from a feature store (``feature_store.py``) are preferred,
+    then windows of ``audio_files``, then seeded synthetic speech
+    (``synthetic_speech``). Audio goes through ``featurizer.featurize`` with
+    the profile's settings, so the windows have the value range the model
+    sees in production (dB for v1, linear magnitude for v3, [0, 1] for v4).
+
+    Returns:
+        np.ndarray: float32 array of shape (count, n_features, FIXED_LENGTH, 1).
+    """
+    if store_dir is not None:
+        from feature_store import open_feature_store
+
+        noisy, _, _ = open_feature_store(store_dir, 'train')
+        rows = np.random.default_rng(seed).choice(len(noisy), size=min(count, len(noisy)), replace=False)
+        return noisy[np.sort(rows)].astype(np.float32)[..., np.newaxis]
+
+    settings = MODEL_PROFILES[profile]
+    samples = (FIXED_LENGTH - 1) * settings['hop_length']  # Exactly FIXED_LENGTH centered frames
+    if audio_files:
+        import soundfile as sf
+
+        windows = []
+        for path in audio_files:
+            audio, sr = sf.read(path, dtype='float32', always_2d=True)
+            if sr != SAMPLE_RATE:
+                raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz audio, got {sr} Hz")
+            audio = audio.mean(axis=1)
+            windows.extend(audio[start:start + samples] for start in range(0, len(audio) - samples + 1, samples))
+        if not windows:
+            raise ValueError(f"The audio files are shorter than one window ({samples / SAMPLE_RATE:.1f} s)")
+        rows = np.random.default_rng(seed).choice(len(windows), size=min(count, len(windows)), replace=False)
+        signals = np.stack([windows[row] for row in np.sort(rows)])
+    else:
+        signals = synthetic_speech(count, samples, seed=seed)
+
+    features, _ = featurize(signals, settings, fixed_length=FIXED_LENGTH)
+    return features[..., np.newaxis]
+
+
+def export_tflite(model_path: str, output_path: str, profile: str = DEFAULT_PROFILE, quantization: str = 'float16',
+                  calibration: Optional[np.ndarray] = None) -> str:
+    """
+    Convert a saved Keras model to a quantized TFLite model.
+
+    Args:
+        model_path (str): Path to the ``.keras``/``.h5`` model.
+        output_path (str): Path of the ``.tflite`` file.
+        profile (str): Key of ``MODEL_PROFILES`` describing the model.
+        quantization (str): One of ``QUANTIZATIONS``.
+        calibration (Optional[np.ndarray]): Representative inputs for ``'int8'``.
+
+    Returns:
+        str: ``output_path``.
+    """
+    import tensorflow as tf
+
+    model = load_denoising_model(model_path, profile)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if calibration is None:
+            calibration = sample_windows(profile, CALIBRATION_WINDOWS)
+        converter.representative_dataset = lambda: ([window[np.newaxis]] for window in calibration)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    elif quantization != 'dynamic':
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    with open(output_path, 'wb') as file:
+        file.write(converter.convert())
+    return output_path
+
+
+def export_onnx(model_path: str, output_path: str, profile: str = DEFAULT_PROFILE, quantize: bool = True) -> str:
+    """
+    Convert a saved Keras model to ONNX, optionally with int8 dynamic quantization of the weights.
+
+    Requires the optional ``tf2onnx`` package (and ``onnxruntime`` for ``quantize``).
+
+    Returns:
+        str: ``output_path``.
+    """
+    import tensorflow as tf
+    import tf2onnx
+
+    model = load_denoising_model(model_path, profile)
+    signature = [tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name='features')]
+    float_path = output_path + '.float32' if quantize else output_path
+    tf2onnx.convert.from_keras(model, input_signature=signature, output_path=float_path)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(float_path, output_path, weight_type=QuantType.QInt8)
+        os.remove(float_path)
+    return output_path
+
+
+def check_parity(reference, candidate, windows: np.ndarray, tolerance: float = PARITY_TOLERANCE) -> Dict:
+    """
+    Compare the outputs of an exported model with the original Keras model.
+
+    Args:
+        reference: Original model (Keras-like ``predict``).
+        candidate: Exported model, e.g. from ``inference_backends.load_inference_model``.
+        windows (np.ndarray): Inputs of shape (N, n_features, frames, 1).
+        tolerance (float): Maximum accepted mean absolute difference as a fraction of the
+            range of the reference outputs (the profiles output dB, magnitudes or [0, 1]).
+
+    Returns:
+        Dict: ``max_abs``, ``mean_abs``, ``relative`` (``mean_abs`` over the
+        output range) and ``ok`` (False means the export drifted).
+    """
+    expected = reference.predict(windows, verbose=0)
+    actual = candidate.predict(windows, verbose=0)
+    # Crop to the common shape, some models (v3.1) output a slightly larger map than their input
+    height = min(expected.shape[1], actual.shape[1])
+    width = min(expected.shape[2], actual.shape[2])
+    difference = np.abs(expected[:, :height, :width] - actual[:, :height, :width])
+    mean_abs = float(difference.mean())
+    output_range = float(np.ptp(expected[:, :height, :width]))
+    relative = mean_abs / output_range if output_range > 0 else mean_abs
+    return {'max_abs': float(difference.max()), 'mean_abs': mean_abs, 'relative': relative,
+            'ok': relative <= tolerance}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export an ML-DAN model to a quantized TFLite/ONNX artifact.')
+    parser.add_argument('--model', required=True, help='path to the .keras/.h5 model, e.g. models/ML-DAN_v3.1.keras')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(MODEL_PROFILES), help='model generation')
+    parser.add_argument('--format', default='tflite', choices=['tflite', 'onnx'])
+    parser.add_argument('--quantization', default='float16', choices=QUANTIZATIONS, help='TFLite quantization')
+    parser.add_argument('--store-dir', default=None, help='feature store with real windows for calibration/parity')
+    parser.add_argument('--audio', nargs='+', default=None,
+                        help='16 kHz audio files for calibration/parity when there is no feature store')
+    parser.add_argument('--tolerance', type=float, default=PARITY_TOLERANCE,
+                        help='accepted mean absolute drift relative to the output range')
+    args = parser.parse_args()
+
+    stem = os.path.splitext(args.model)[0]
+    if args.format == 'tflite':
+        calibration = sample_windows(args.profile, CALIBRATION_WINDOWS, args.store_dir, audio_files=args.audio)
+        output_path = export_tflite(args.model, f"{stem}.{args.quantization}.tflite", args.profile,
+                                    args.quantization, calibration)
+    else:
+        output_path = export_onnx(args.model, stem + '.onnx', args.profile)
+    print(f"Модель збережена у {output_path}")
+
+    from inference_backends import OnnxPredictor, TFLitePredictor
+
+    exported = OnnxPredictor(output_path) if args.format == 'onnx' else TFLitePredictor(output_path)
+    parity = check_parity(load_denoising_model(args.model, args.profile), exported,
+                          sample_windows(args.profile, PARITY_WINDOWS, args.store_dir, seed=1, audio_files=args.audio),
+                          args.tolerance)
+    print(f"Parity: max_abs={parity['max_abs']:.4f} mean_abs={parity['mean_abs']:.4f} "
+          f"relative={parity['relative']:.4f}")
+    if not parity['ok']:
+        # load_inference_model picks up any artifact next to the model, so a drifted one must not stay there
+        os.remove(output_path)
+        raise SystemExit(f"Вихід моделі відрізняється від оригіналу, {output_path} видалено")
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from denoise_audio import FIXED_LENGTH
+from featurizer import DEFAULT_PROFILE, MODEL_PROFILES, SAMPLE_RATE, featurize, n_features
+
+# Configuration parameters
+STORE_DTYPE = 'float16'   # Features are in [0, 1], float16 halves the disk and page cache footprint
+MANIFEST_FILE = 'manifest.json'
+
+
+def featurize_file(path: str, profile: str = DEFAULT_PROFILE, fixed_length: int = FIXED_LENGTH) -> np.ndarray:
+    """
+    Load an audio file and convert it to one fixed-length model input.
+
+    Uses ``featurizer.featurize``, the same STFT and feature scaling as the
+    inference code, so training data and served data are computed identically.
+
+    Args:
+        path (str): Path to the audio file.
+        profile (str): Key of ``featurizer.MODEL_PROFILES``.
+        fixed_length (int): Number of frames to keep (shorter files are padded with silence).
+
+    Returns:
+        np.ndarray: Features of shape (n_features, fixed_length).
+    """
+    import librosa
+
+    settings = MODEL_PROFILES[profile]
+    audio, _ = librosa.load(path, sr=SAMPLE_RATE)
+    max_amplitude = np.max(np.abs(audio)) if len(audio) else 0.0
+    if max_amplitude > 0:
+        audio = audio / max_amplitude
+
+    features, _ = featurize(audio, settings, fixed_length=fixed_length)
+    return features
+
+
+def _featurize_pair(task: Tuple[str, str, str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    noisy_path, clean_path, profile, fixed_length = task
+    return featurize_file(noisy_path, profile, fixed_length), featurize_file(clean_path, profile, fixed_length)
+
+
+def build_feature_store(noisy_files: Sequence[str], clean_files: Sequence[str], store_dir: str, split: str,
+                        profile: str = DEFAULT_PROFILE, fixed_length: int = FIXED_LENGTH,
+                        dtype: str = STORE_DTYPE, workers: Optional[int] = None) -> str:
+    """
+    Featurize noisy/clean pairs into one contiguous ``.npy`` array per side.
+
+    Arrays are created with ``open_memmap`` and filled row by row, so the
+    dataset never has to fit in RAM. The manifest is written last and marks
+    the split as complete.
+
+    Args:
+        noisy_files (Sequence[str]): Noisy audio files.
+        clean_files (Sequence[str]): Matching clean audio files.
+        store_dir (str): Root folder of the feature store.
+        split (str): Split name, e.g. ``'train'``.
+        profile (str): Key of ``featurizer.MODEL_PROFILES``.
+        fixed_length (int): Number of frames per sample.
+        dtype (str): ``'float16'`` or ``'float32'``.
+        workers (Optional[int]): Number of worker processes (None - one per CPU core).
+
+    Returns:
+        str: Path of the split folder.
+    """
+    if len(noisy_files) != len(clean_files):
+        raise ValueError("noisy_files and clean_files must have the same length")
+
+    split_dir = os.path.join(store_dir, split)
+    os.makedirs(split_dir, exist_ok=True)
+    manifest_path = os.path.join(split_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    settings = MODEL_PROFILES[profile]
+    shape = (len(noisy_files), n_features(settings), fixed_length)
+    noisy = np.lib.format.open_memmap(os.path.join(split_dir, 'noisy.npy'), mode='w+', dtype=dtype, shape=shape)
+    clean = np.lib.format.open_memmap(os.path.join(split_dir, 'clean.npy'), mode='w+', dtype=dtype, shape=shape)
+
+    tasks = [(noisy_path, clean_path, profile, fixed_length) for noisy_path, clean_path in zip(noisy_files, clean_files)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for i, (noisy_features, clean_features) in enumerate(executor.map(_featurize_pair, tasks, chunksize=16)):
+            noisy[i] = noisy_features
+            clean[i] = clean_features
+    noisy.flush()
+    clean.flush()
+    del noisy, clean
+
+    with open(manifest_path, 'w') as file:
+        json.dump({
+            'split': split,
+            'count': shape[0],
+            'shape': list(shape[1:]),
+            'dtype': dtype,
+            'profile': profile,
+            'files': [{'noisy': noisy_path, 'clean': clean_path}
+                      for noisy_path, clean_path in zip(noisy_files, clean_files)],
+        }, file)
+    return split_dir
+
+
+def open_feature_store(store_dir: str, split: str) -> Tuple[np.ndarray, np.ndarray, Dict]:
+    """
+    Open a split read-only through memory maps.
+
+    Args:
+        store_dir (str): Root folder of the feature store.
+        split (str): Split name.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, Dict]: Noisy and clean arrays of shape
+        (N, n_features, frames) and the manifest.
+    """
+    split_dir = os.path.join(store_dir, split)
+    manifest_path = os.path.join(split_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"Feature store split is missing or incomplete: {split_dir}")
+
+    with open(manifest_path, 'r') as file:
+        manifest = json.load(file)
+    noisy = np.load(os.path.join(split_dir, 'noisy.npy'), mmap_mode='r')
+    clean = np.load(os.path.join(split_dir, 'clean.npy'), mmap_mode='r')
+    return noisy, clean, manifest
+
+
+def pair_by_name(noisy_dir: str, clean_dir: str) -> Tuple[List[str], List[str]]:
+    """
+    Pair blended ``.mp3`` files with clean ``.flac`` files by file name (e.g. ``19-198-0001``).
+
+    Returns:
+        Tuple[List[str], List[str]]: Noisy and clean paths of every pair.
+    """
+    def stems(directory, extension):
+        found = {}
+        for root, _, files in os.walk(directory):
+            for file in files:
+                if file.lower().endswith(extension):
+                    found[os.path.splitext(file)[0]] = os.path.join(root, file)
+        return found
+
+    noisy, clean = stems(noisy_dir, '.mp3'), stems(clean_dir, '.flac')
+    names = sorted(noisy.keys() & clean.keys())
+    return [noisy[name] for name in names], [clean[name] for name in names]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute model features of a dataset split.')
+    parser.add_argument('--noisy-dir', required=True, help='e.g. ../data/audios/english/train/blended')
+    parser.add_argument('--clean-dir', required=True, help='e.g. ../data/audios/english/train/clean')
+    parser.add_argument('--store-dir', required=True, help='root folder of the feature store')
+    parser.add_argument('--split', required=True, help='split name, e.g. train')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(MODEL_PROFILES), help='model generation')
+    parser.add_argument('--dtype', default=STORE_DTYPE, choices=['float16', 'float32'])
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--manifest', default=None,
+                        help='audio_manifest database used for pairing, e.g. ../data/.audio_manifest.db')
+    parser.add_argument('--min-seconds', type=float, default=0.0,
+                        help='skip pairs shorter than this (needs --manifest)')
+    args = parser.parse_args()
+
+    if args.manifest:
+        from audio_manifest import AudioManifest
+
+        manifest = AudioManifest(args.manifest)
+        manifest.scan(args.noisy_dir, ['.mp3'], workers=args.workers)
+        manifest.scan(args.clean_dir, ['.flac'], workers=args.workers)
+        noisy_files, clean_files = manifest.pairs(args.noisy_dir, args.clean_dir, min_duration=args.min_seconds)
+        manifest.close()
+    else:
+        noisy_files, clean_files = pair_by_name(args.noisy_dir, args.clean_dir)
+    split_dir = build_feature_store(noisy_files, clean_files, args.store_dir, args.split, profile=args.profile,
+                                    dtype=args.dtype, workers=args.workers)
+    print(f"{len(noisy_files)} pairs saved to {split_dir}")
@@ -0,0 +1,320 @@
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+# Configuration parameters
+SAMPLE_RATE = 16000       # Sample rate expected by every ML-DAN model
+TOP_DB = 80.0             # Dynamic range kept by the dB scaling
+MIN_DB, MAX_DB = -TOP_DB, 0.0  # dB range mapped to [0, 1] by normalize_db
+
+# Feature settings of every trained model generation
+MODEL_PROFILES = {
+    # audio_denoising_unet.h5 (notebooks/test_models): STFT in dB, no normalization
+    'v1': {'features': 'stft_db', 'n_fft': 1024, 'hop_length': 512, 'resize_mode': 'resize'},
+    # ML-DAN v3.1: linear STFT magnitude
+    'v3': {'features': 'stft', 'n_fft': 1024, 'hop_length': 512, 'resize_mode': 'resize'},
+    # ML-DAN v3.2 / v4.0: mel-spectrogram in dB normalized to [0, 1]
+    'v4': {'features': 'mel', 'n_fft': 2048, 'hop_length': 512, 'n_mels': 128, 'resize_mode': 'crop_or_pad'},
+}
+DEFAULT_PROFILE = 'v4'
+
+# Training_notebook_autoencoder_DB_norm.ipynb: 22 kHz STFT in dB (ref=max) scaled with (x + 80) / 80
+AUTOENCODER_PROFILE = {'features': 'stft_db_norm', 'n_fft': 255, 'hop_length': 63}
+
+
+@lru_cache(maxsize=None)
+def hann_window(n_fft: int) -> np.ndarray:
+    """Periodic Hann window, the same one librosa uses by default."""
+    return (0.5 - 0.5 * np.cos(2.0 * np.pi * np.arange(n_fft) / n_fft)).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def mel_filterbank(sr: int, n_fft: int, n_mels: int) -> np.ndarray:
+    """Mel filterbank matching ``librosa.feature.melspectrogram`` defaults."""
+    import librosa
+
+    return librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def mel_pseudo_inverse(sr: int, n_fft: int, n_mels: int) -> np.ndarray:
+    """
+    Moore-Penrose pseudo-inverse of ``mel_filterbank``, computed once per configuration.
+
+    Mapping mel power back to STFT power is then a single matrix product
+    instead of librosa's iterative non-negative least squares (``mel_to_stft``).
+    """
+    inverse = np.linalg.pinv(mel_filterbank(sr, n_fft, n_mels)).astype(np.float32)
+    inverse.setflags(write=False)  # Shared by every caller
+    return inverse
+
+
+def n_features(profile: Dict) -> int:
+    """Height of the model input for a profile (mel bands or STFT bins)."""
+    return profile.get('n_mels', profile['n_fft'] // 2 + 1)
+
+
+def stft(signals: np.ndarray, n_fft: int, hop_length: int, center: bool = True) -> np.ndarray:
+    """
+    STFT of one signal or a whole batch at once.
+
+    Equivalent to ``librosa.stft(y, n_fft, hop_length, center=center, pad_mode='constant')``
+    applied to every row, but framing is a strided view and all frames go
+    through a single FFT call.
+
+    Args:
+        signals (np.ndarray): Signals of shape (..., samples).
+        n_fft (int): FFT size (and window length).
+        hop_length (int): Number of samples between frames.
+        center (bool): Pad ``n_fft // 2`` zeros on both sides like librosa.
+
+    Returns:
+        np.ndarray: complex64 array of shape (..., 1 + n_fft // 2, frames).
+    """
+    signals = np.asarray(signals, dtype=np.float32)
+    if center:
+        pad = [(0, 0)] * (signals.ndim - 1) + [(n_fft // 2, n_fft // 2)]
+        signals = np.pad(signals, pad)
+    if signals.shape[-1] < n_fft:
+        return np.zeros(signals.shape[:-1] + (n_fft // 2 + 1, 0), dtype=np.complex64)
+
+    frames = np.lib.stride_tricks.sliding_window_view(signals, n_fft, axis=-1)[..., ::hop_length, :]
+    spectrum = np.fft.rfft(frames * hann_window(n_fft), axis=-1)
+    return np.swapaxes(spectrum, -1, -2).astype(np.complex64)
+
+
+def overlap_add(frames: np.ndarray, hop_length: int) -> np.ndarray:
+    """
+    Overlap-add frames of shape (..., n_frames, frame_length) into (..., samples).
+
+    Frames are split into hop-sized pieces, so the sum takes
+    ``ceil(frame_length / hop_length)`` vectorized additions instead of one
+    addition per frame.
+    """
+    n_frames, frame_length = frames.shape[-2:]
+    pieces = -(-frame_length // hop_length)
+    padded = np.zeros(frames.shape[:-1] + (pieces * hop_length,), dtype=frames.dtype)
+    padded[..., :frame_length] = frames
+
+    output = np.zeros(frames.shape[:-2] + ((n_frames - 1 + pieces) * hop_length,), dtype=frames.dtype)
+    for k in range(pieces):
+        piece = padded[..., k * hop_length:(k + 1) * hop_length].reshape(frames.shape[:-2] + (-1,))
+        output[..., k * hop_length:k * hop_length + piece.shape[-1]] += piece
+    return output[..., :(n_frames - 1) * hop_length + frame_length]
+
+
+def istft(spectrum: np.ndarray, n_fft: int, hop_length: int, length: Optional[int] = None,
+          center: bool = True) -> np.ndarray:
+    """
+    Exact inverse of ``stft`` for one spectrum or a whole batch.
+
+    Args:
+        spectrum (np.ndarray): Complex STFT of shape (..., 1 + n_fft // 2, frames).
+        n_fft (int): FFT size.
+        hop_length (int): Number of samples between frames.
+        length (Optional[int]): Length of the original signals.
+        center (bool): Whether ``stft`` was called with ``center=True``.
+
+    Returns:
+        np.ndarray: float32 signals of shape (..., samples).
+    """
+    window = hann_window(n_fft)
+    n_frames = spectrum.shape[-1]
+    frames = np.fft.irfft(np.swapaxes(spectrum, -1, -2), n=n_fft, axis=-1).astype(np.float32) * window
+    signals = overlap_add(frames, hop_length)
+    norm = overlap_add(np.broadcast_to(window ** 2, (n_frames, n_fft)), hop_length)
+    nonzero = norm > np.finfo(np.float32).tiny
+    signals[..., nonzero] /= norm[nonzero]
+
+    if center:
+        signals = signals[..., n_fft // 2:]
+    if length is not None:
+        signals = signals[..., :length]
+        if signals.shape[-1] < length:
+            pad = [(0, 0)] * (signals.ndim - 1) + [(0, length - signals.shape[-1])]
+            signals = np.pad(signals, pad)
+    return signals
+
+
+def unit_phase(spectrum: np.ndarray) -> np.ndarray:
+    """Phase of a complex STFT as unit-magnitude values (1 where the magnitude is zero)."""
+    magnitude = np.abs(spectrum)
+    return np.divide(spectrum, magnitude, out=np.ones_like(spectrum), where=magnitude > 0)
+
+
+def power_to_db(power: np.ndarray, ref: Union[float, str] = 1.0, amin: float = 1e-10,
+                top_db: Optional[float] = TOP_DB) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched ``librosa.power_to_db``; ``ref='max'`` uses the maximum of every spectrogram.
+
+    Args:
+        power (np.ndarray): Power spectrograms of shape (..., bins, frames).
+        ref (Union[float, str]): Reference power or ``'max'``.
+        amin (float): Minimum power.
+        top_db (Optional[float]): Dynamic range to keep below the maximum of every spectrogram.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: dB spectrograms and the reference power
+        used for each of them (shape (..., 1, 1)).
+    """
+    power = np.asarray(power, dtype=np.float32)
+    if ref == 'max':
+        ref_power = np.max(power, axis=(-2, -1), keepdims=True) if power.size else np.ones(power.shape[:-2] + (1, 1))
+    else:
+        ref_power = np.full(power.shape[:-2] + (1, 1), ref, dtype=np.float32)
+    ref_power = np.maximum(amin, ref_power).astype(np.float32)
+
+    db = 10.0 * np.log10(np.maximum(amin, power)) - 10.0 * np.log10(ref_power)
+    if top_db is not None and db.size:
+        db = np.maximum(db, np.max(db, axis=(-2, -1), keepdims=True) - top_db)
+    return db.astype(np.float32), ref_power
+
+
+def db_to_power(db: np.ndarray, ref_power: Union[float, np.ndarray] = 1.0) -> np.ndarray:
+    """Inverse of ``power_to_db`` (up to the ``amin``/``top_db`` clipping)."""
+    return (ref_power * 10.0 ** (np.asarray(db, dtype=np.float32) / 10.0)).astype(np.float32)
+
+
+def normalize_db(db: np.ndarray, min_db: float = MIN_DB, max_db: float = MAX_DB) -> np.ndarray:
+    """Map ``[min_db, max_db]`` to ``[0, 1]`` (the ``(x + 80) / 80`` scaling of the notebooks)."""
+    return ((db - min_db) / (max_db - min_db)).astype(np.float32)
+
+
+def denormalize_db(features: np.ndarray, min_db: float = MIN_DB, max_db: float = MAX_DB) -> np.ndarray:
+    """Inverse of ``normalize_db``."""
+    return (np.asarray(features, dtype=np.float32) * (max_db - min_db) + min_db).astype(np.float32)
+
+
+def magnitude_to_features(magnitude: np.ndarray, profile: Dict, sr: int = SAMPLE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert linear STFT magnitudes to the model input representation.
+
+    Works on one window of shape (bins, frames) or a batch (N, bins, frames).
+
+    Args:
+        magnitude (np.ndarray): Linear STFT magnitude.
+        profile (Dict): Entry of ``MODEL_PROFILES`` (or ``AUTOENCODER_PROFILE``).
+        sr (int): Sample rate.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Model features and the reference power
+        that ``features_to_magnitude`` needs to undo the scaling.
+    """
+    magnitude = np.asarray(magnitude, dtype=np.float32)
+    kind = profile['features']
+    if kind == 'stft':
+        return magnitude, np.ones(magnitude.shape[:-2] + (1, 1), dtype=np.float32)
+    if kind == 'stft_db':
+        return power_to_db(magnitude ** 2, ref=1.0)
+    if kind == 'stft_db_norm':
+        db, ref_power = power_to_db(magnitude ** 2, ref='max')
+        return normalize_db(db), ref_power
+
+    mel = mel_filterbank(sr, profile['n_fft'], profile['n_mels']) @ (magnitude ** 2)
+    db, ref_power = power_to_db(mel, ref='max')
+    return normalize_db(db), ref_power
+
+
+def features_to_magnitude(features: np.ndarray, ref_power: np.ndarray, profile: Dict,
+                          sr: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Invert ``magnitude_to_features`` back to linear STFT magnitudes.
+
+    Args:
+        features (np.ndarray): Model output of shape (..., n_features, frames).
+        ref_power (np.ndarray): Reference power returned by ``magnitude_to_features``.
+        profile (Dict): Entry of ``MODEL_PROFILES`` (or ``AUTOENCODER_PROFILE``).
+        sr (int): Sample rate.
+
+    Returns:
+        np.ndarray: Linear STFT magnitude of shape (..., 1 + n_fft // 2, frames).
+    """
+    kind = profile['features']
+    if kind == 'stft':
+        return np.maximum(np.asarray(features, dtype=np.float32), 0.0)
+    if kind == 'stft_db':
+        return np.sqrt(db_to_power(features, ref_power))
+    if kind == 'stft_db_norm':
+        return np.sqrt(db_to_power(denormalize_db(features), ref_power))
+
+    mel = db_to_power(denormalize_db(features), ref_power)
+    power = mel_pseudo_inverse(sr, profile['n_fft'], profile['n_mels']) @ mel
+    return np.sqrt(np.maximum(power, 0.0))
+
+
+def analyze(signals: np.ndarray, profile: Dict, sr: int = SAMPLE_RATE,
+            fixed_length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Forward path that also keeps the noisy STFT for ``reconstruct``.
+
+    The complex spectrum is returned as computed (truncating is a view), so
+    the phase is kept without an extra ``angle``/``exp`` pass or copy.
+
+    Args:
+        signals (np.ndarray): Signals of shape (N, samples) or (samples,).
+        profile (Dict): Entry of ``MODEL_PROFILES`` (or ``AUTOENCODER_PROFILE``).
+        sr (int): Sample rate.
+        fixed_length (Optional[int]): Pad with silence or truncate to this many frames.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Features of shape
+        (N, n_features, frames), the reference power of every sample and the
+        complex STFT of shape (N, 1 + n_fft // 2, frames).
+    """
+    spectrum = stft(signals, profile['n_fft'], profile['hop_length'])
+    if fixed_length is not None:
+        spectrum = spectrum[..., :fixed_length]
+        if spectrum.shape[-1] < fixed_length:
+            pad = [(0, 0)] * (spectrum.ndim - 1) + [(0, fixed_length - spectrum.shape[-1])]
+            spectrum = np.pad(spectrum, pad)
+    features, ref_power = magnitude_to_features(np.abs(spectrum), profile, sr)
+    return features, ref_power, spectrum
+
+
+def featurize(signals: np.ndarray, profile: Dict, sr: int = SAMPLE_RATE,
+              fixed_length: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Full forward path for a batch of equally long signals: STFT -> magnitude -> features.
+
+    Replaces per-sample ``librosa.stft``/``magphase``/``amplitude_to_db`` loops, e.g.
+    ``featurize(noisy_signal_data_split, AUTOENCODER_PROFILE, sr=22050)``.
+
+    Args:
+        signals (np.ndarray): Signals of shape (N, samples) or (samples,).
+        profile (Dict): Entry of ``MODEL_PROFILES`` (or ``AUTOENCODER_PROFILE``).
+        sr (int): Sample rate.
+        fixed_length (Optional[int]): Pad with silence or truncate to this many frames.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Features of shape (N, n_features, frames)
+        and the reference power of every sample.
+    """
+    return analyze(signals, profile, sr, fixed_length)[:2]
+
+
+def reconstruct(features: np.ndarray, ref_power: np.ndarray, spectrum: np.ndarray, profile: Dict,
+                sr: int = SAMPLE_RATE, length: Optional[int] = None) -> np.ndarray:
+    """
+    Turn model outputs back into audio in one non-iterative pass.
+
+    The scaling of the features is undone (``features_to_magnitude``), the
+    magnitude is combined with the phase of the noisy STFT from ``analyze``
+    and the result goes through a single batched ISTFT, so no Griffin-Lim
+    iterations are needed.
+
+    Args:
+        features (np.ndarray): Model output of shape (..., n_features, frames).
+        ref_power (np.ndarray): Reference power returned by ``analyze``.
+        spectrum (np.ndarray): Noisy complex STFT returned by ``analyze``.
+        profile (Dict): Entry of ``MODEL_PROFILES`` (or ``AUTOENCODER_PROFILE``).
+        sr (int): Sample rate.
+        length (Optional[int]): Length of the original signals.
+
+    Returns:
+        np.ndarray: float32 signals of shape (..., samples).
+    """
+    magnitude = features_to_magnitude(features, ref_power, profile, sr)
+    n_frames = min(magnitude.shape[-1], spectrum.shape[-1])
+    denoised = magnitude[..., :n_frames] * unit_phase(spectrum[..., :n_frames])
+    return istft(denoised, profile['n_fft'], profile['hop_length'], length=length)
@@ -0,0 +1,132 @@
+import os
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Quantized artifacts written by export_model.py next to the Keras model, in order of preference
+QUANTIZED_ARTIFACTS = ('.int8.tflite', '.float16.tflite', '.dynamic.tflite', '.onnx')
+BACKENDS = ('auto', 'tflite', 'onnx', 'keras')
+
+
+class TFLitePredictor:
+    """
+    Keras-like ``predict`` on top of a TFLite interpreter.
+
+    The input tensor is resized to the batch size of every call (the resize is
+    skipped while the size does not change). Integer-quantized models get their
+    input quantized and their output dequantized, so callers always exchange
+    float32 arrays. Calls are serialized because an interpreter is not
+    thread-safe.
+    """
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self.batch_size = None
+        self.lock = threading.Lock()
+
+    def _resize(self, batch_size: int) -> None:
+        if batch_size != self.batch_size:
+            shape = [batch_size] + list(self.input['shape'][1:])
+            self.interpreter.resize_tensor_input(self.input['index'], shape)
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+            self.batch_size = batch_size
+
+    def predict(self, batch: np.ndarray, batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        batch = np.asarray(batch, dtype=np.float32)
+        with self.lock:
+            self._resize(len(batch))
+            scale, zero_point = self.input['quantization']
+            if self.input['dtype'] != np.float32 and scale:
+                info = np.iinfo(self.input['dtype'])
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+            self.interpreter.set_tensor(self.input['index'], batch.astype(self.input['dtype']))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output['index'])
+
+        scale, zero_point = self.output['quantization']
+        if self.output['dtype'] != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output.astype(np.float32)
+
+
+class OnnxPredictor:
+    """Keras-like ``predict`` on top of an ONNX Runtime CPU session."""
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray, batch_size: Optional[int] = None, verbose: int = 0) -> np.ndarray:
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+def resolve_model_path(model_path: str, backend: str = 'auto') -> Tuple[str, str]:
+    """
+    Choose the file and backend ``load_inference_model`` will use.
+
+    Args:
+        model_path (str): Path to the ``.keras``/``.h5`` model.
+        backend (str): One of ``BACKENDS``; ``'auto'`` prefers a quantized artifact.
+
+    Returns:
+        Tuple[str, str]: Path of the model file and the backend name.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {backend}")
+    if backend == 'keras':
+        return model_path, 'keras'
+
+    stem = os.path.splitext(model_path)[0]
+    for suffix in QUANTIZED_ARTIFACTS:
+        artifact_backend = 'onnx' if suffix == '.onnx' else 'tflite'
+        if backend in ('auto', artifact_backend) and os.path.exists(stem + suffix):
+            return stem + suffix, artifact_backend
+    return model_path, 'keras'
+
+
+def load_inference_model(model_path: str, profile: str, backend: str = 'auto', num_threads: Optional[int] = None):
+    """
+    Load the fastest available variant of a model, falling back to Keras.
+
+    A quantized artifact exported by ``export_model.py`` is used when it exists
+    and its runtime can be imported; otherwise (or if loading it fails) the
+    original Keras model is loaded. Every variant has the same
+    ``predict(batch, verbose=0)`` interface.
+
+    Args:
+        model_path (str): Path to the ``.keras``/``.h5`` model.
+        profile (str): Key of ``MODEL_PROFILES`` describing the model.
+        backend (str): One of ``BACKENDS``.
+        num_threads (Optional[int]): CPU threads of the TFLite/ONNX runtime (None - all cores).
+
+    Returns:
+        Model or predictor with a Keras-like ``predict``.
+    """
+    from denoise_audio import load_denoising_model
+
+    path, resolved = resolve_model_path(model_path, backend)
+    try:
+        if resolved == 'tflite':
+            return TFLitePredictor(path, num_threads)
+        if resolved == 'onnx':
+            return OnnxPredictor(path, num_threads)
+    except (ImportError, RuntimeError, ValueError) as e:
+        if backend != 'auto':
+            raise
+        print(f"Не вдалося завантажити {path} ({e}), використовується Keras-модель")
+    return load_denoising_model(model_path, profile)
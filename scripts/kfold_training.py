@@ -0,0 +1,183 @@
+import argparse
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from feature_store import open_feature_store
+
+# Configuration parameters
+KFOLDS = 5                # Number of K-Fold cross-validation folds
+EPOCHS = 20               # Maximum training epochs per fold
+BATCH_SIZE = 32           # Batch size for training
+LEARNING_RATE = 1e-6      # Learning rate of the Adam optimizer
+PATIENCE = 10             # Epochs without val_loss improvement before a fold stops early
+
+
+def kfold_splits(n_samples: int, k: int, seed: Optional[int] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Shuffled K-Fold split like ``sklearn.model_selection.KFold(n_splits=k, shuffle=True)``.
+
+    Only index arrays are returned: a fold never copies the features, the
+    loaders read their rows from the memory-mapped feature store per batch.
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray]]: Sorted train and validation indices of every fold.
+    """
+    if not 2 <= k <= n_samples:
+        raise ValueError(f"k must be between 2 and the number of samples ({n_samples}), got {k}")
+    order = np.random.default_rng(seed).permutation(n_samples)
+    folds = np.array_split(order, k)
+    return [(np.sort(np.concatenate(folds[:i] + folds[i + 1:])), np.sort(folds[i])) for i in range(k)]
+
+
+def build_unet_model(input_shape: Tuple[int, int, int]):
+    """
+    Build the ML-DAN v4.0 U-Net for mel-spectrogram denoising (same layers as the v4 notebook).
+
+    Args:
+        input_shape (Tuple[int, int, int]): Shape of input mel-spectrograms, e.g. (128, 300, 1).
+
+    Returns:
+        tf.keras.Model: Uncompiled model.
+    """
+    from tensorflow.keras import layers, models
+    from model_layers import CropOrPadResizeLayer
+
+    inputs = layers.Input(shape=input_shape)
+
+    # Encoder
+    conv1 = layers.Conv2D(32, (3, 3), activation='relu', padding='same')(inputs)
+    conv1 = layers.Conv2D(32, (3, 3), activation='relu', padding='same')(conv1)
+    pool1 = layers.MaxPooling2D((2, 2), padding='same')(conv1)
+
+    conv2 = layers.Conv2D(64, (3, 3), activation='relu', padding='same')(pool1)
+    conv2 = layers.Conv2D(64, (3, 3), activation='relu', padding='same')(conv2)
+    pool2 = layers.MaxPooling2D((2, 2), padding='same')(conv2)
+
+    # Bottleneck
+    conv3 = layers.Conv2D(128, (3, 3), activation='relu', padding='same')(pool2)
+    conv3 = layers.Conv2D(128, (3, 3), activation='relu', padding='same')(conv3)
+
+    # Decoder
+    up1 = layers.UpSampling2D((2, 2))(conv3)
+    upconv1 = layers.Conv2D(64, (3, 3), activation='relu', padding='same')(up1)
+    upconv1_resized = CropOrPadResizeLayer(conv2.shape[1], conv2.shape[2])(upconv1)
+    concat1 = layers.Concatenate()([upconv1_resized, conv2])
+
+    up2 = layers.UpSampling2D((2, 2))(concat1)
+    upconv2 = layers.Conv2D(32, (3, 3), activation='relu', padding='same')(up2)
+    upconv2_resized = CropOrPadResizeLayer(conv1.shape[1], conv1.shape[2])(upconv2)
+    concat2 = layers.Concatenate()([upconv2_resized, conv1])
+
+    outputs = layers.Conv2D(1, (3, 3), activation='sigmoid', padding='same')(concat2)
+    return models.Model(inputs, outputs)
+
+
+def _train_fold(task: Tuple) -> Tuple[int, Dict[str, List[float]], str]:
+    """Worker entry point: train one fold and save its model."""
+    fold, store_dir, split, train_idx, val_idx, output_dir, epochs, batch_size, learning_rate, threads, seed = task
+
+    # Cap the thread pools before TensorFlow is imported, otherwise every fold
+    # would start one thread per core and the folds would fight over them
+    if threads:
+        for variable in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+            os.environ[variable] = str(threads)
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.optimizers import Adam
+    from training_data import FeatureStoreSequence
+
+    if threads:
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+    train = FeatureStoreSequence(store_dir, split, batch_size=batch_size, indices=train_idx, seed=seed)
+    validation = FeatureStoreSequence(store_dir, split, batch_size=batch_size, shuffle=False, indices=val_idx)
+
+    model = build_unet_model(train.noisy.shape[1:] + (1,))
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse', metrics=['mae'])
+    early_stopping = EarlyStopping(monitor='val_loss', patience=PATIENCE, restore_best_weights=True)
+    history = model.fit(train, validation_data=validation, epochs=epochs, callbacks=[early_stopping], verbose=2)
+
+    model_path = os.path.join(output_dir, f"fold_{fold + 1}.keras")
+    model.save(model_path)
+    return fold, history.history, model_path
+
+
+def train_with_kfold(store_dir: str, split: str, output_dir: str, k: int = KFOLDS, epochs: int = EPOCHS,
+                     batch_size: int = BATCH_SIZE, learning_rate: float = LEARNING_RATE,
+                     max_workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                     seed: Optional[int] = None) -> List[Dict]:
+    """
+    K-Fold cross-validation over a feature store, with the folds trained in parallel processes.
+
+    Replaces the notebook's ``noisy_data[train_idx]`` copies: every fold gets
+    ``FeatureStoreSequence`` loaders over the same memory-mapped arrays with
+    its own index list, so the page cache holds the dataset once no matter
+    how many folds run. Each worker process trains one fold at a time with
+    ``threads_per_worker`` TensorFlow threads.
+
+    Args:
+        store_dir (str): Root folder of the feature store (``feature_store.build_feature_store``).
+        split (str): Split name, e.g. ``'train'``.
+        output_dir (str): Folder for the ``fold_<n>.keras`` models and ``kfold_history.json``.
+        k (int): Number of folds.
+        epochs (int): Maximum epochs per fold.
+        batch_size (int): Batch size for training.
+        learning_rate (float): Learning rate of the Adam optimizer.
+        max_workers (Optional[int]): Folds trained at the same time (None - min(k, CPU cores)).
+        threads_per_worker (Optional[int]): TensorFlow threads per fold (None - cores split evenly between workers).
+        seed (Optional[int]): Seed of the split and of the batch order.
+
+    Returns:
+        List[Dict]: ``fold``, ``history`` and ``model`` path of every fold, in fold order.
+    """
+    noisy, _, _ = open_feature_store(store_dir, split)
+    splits = kfold_splits(len(noisy), k, seed)
+    del noisy
+
+    max_workers = max_workers or min(k, os.cpu_count())
+    threads_per_worker = threads_per_worker or max(1, os.cpu_count() // max_workers)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tasks = [(fold, store_dir, split, train_idx, val_idx, output_dir, epochs, batch_size, learning_rate,
+              threads_per_worker, None if seed is None else seed + fold)
+             for fold, (train_idx, val_idx) in enumerate(splits)]
+    results = []
+    # Spawned workers: TensorFlow must not be inherited through fork
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = [executor.submit(_train_fold, task) for task in tasks]
+        for future in as_completed(futures):
+            fold, history, model_path = future.result()
+            best = min(history.get('val_loss', [float('nan')]))
+            print(f"Fold {fold + 1}/{k} done: best val_loss {best:.6f} -> {model_path}")
+            results.append({'fold': fold + 1, 'history': history, 'model': model_path})
+
+    results.sort(key=lambda result: result['fold'])
+    with open(os.path.join(output_dir, 'kfold_history.json'), 'w') as file:
+        json.dump(results, file)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='K-Fold training of ML-DAN v4 on a feature store.')
+    parser.add_argument('--store-dir', required=True, help='root folder of the feature store')
+    parser.add_argument('--split', default='train', help='split name')
+    parser.add_argument('--output-dir', required=True, help='folder for the fold models')
+    parser.add_argument('--k', type=int, default=KFOLDS, help='number of folds')
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--learning-rate', type=float, default=LEARNING_RATE)
+    parser.add_argument('--workers', type=int, default=None, help='folds trained at the same time')
+    parser.add_argument('--threads', type=int, default=None, help='TensorFlow threads per fold')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    train_with_kfold(args.store_dir, args.split, args.output_dir, k=args.k, epochs=args.epochs,
+                     batch_size=args.batch_size, learning_rate=args.learning_rate, max_workers=args.workers,
+                     threads_per_worker=args.threads, seed=args.seed)
@@ -0,0 +1,275 @@
+import os
+import subprocess
+import threading
+from functools import lru_cache
+from typing import Callable, List, Optional
+
+import soundfile as sf
+
+from add_watermark import build_finish_command
+from denoise_audio import (BLOCK_SIZE, DEFAULT_PROFILE, SAMPLE_RATE, StreamingDenoiser, denoise_file,
+                           read_audio_blocks, read_pcm_file_blocks)
+from inference_backends import load_inference_model, resolve_model_path
+from metrics import span
+from result_cache import ResultCache, file_digest, model_version
+from split_video_audio import split_video_audio_single_pass
+
+# Output file extension of every operation offered by the interfaces
+OPERATIONS = {
+    'enhance_video': '.mp4',  # Video with the denoised audio track
+    'enhance_audio': '.wav',  # Denoised audio track only
+    'extract_audio': '.mp3',  # Original audio track only
+}
+WATERMARK_POSITION = '10:10'  # Default overlay position (X:Y) of an optional watermark on enhanced videos
+
+
+# Serializes the first load, so threads that ask for the same model at once do not each load a copy
+_model_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+@span('model_load')
+def _load_model(model_path: str, profile: str):
+    return load_inference_model(model_path, profile)
+
+
+def get_model(model_path: str, profile: str = DEFAULT_PROFILE):
+    """Load a model (its quantized export if there is one) once per process and reuse it for every following job."""
+    with _model_lock:
+        return _load_model(model_path, profile)
+
+
+@lru_cache(maxsize=None)
+def get_cache(cache_dir: str) -> ResultCache:
+    """One ``ResultCache`` per process and cache folder, so its counters accumulate."""
+    return ResultCache(cache_dir)
+
+
+def build_mux_command(input_file: str, output_file: str, sample_rate: int = SAMPLE_RATE,
+                      audio_input: str = 'pipe:0') -> List[str]:
+    """
+    ffmpeg command that copies the video of ``input_file`` and muxes raw denoised audio.
+
+    Args:
+        input_file (str): Original video (only its video stream is used).
+        output_file (str): Path of the resulting video.
+        sample_rate (int): Sample rate of the raw float32 mono audio.
+        audio_input (str): Where the raw audio comes from: ``'pipe:0'`` (stdin) or a ``.f32le`` file.
+
+    Returns:
+        List[str]: Command for ``subprocess.Popen(..., stdin=subprocess.PIPE)``.
+    """
+    return [
+        'ffmpeg',
+        '-loglevel', 'warning', '-y',
+        '-i', input_file,  # Вхідне відео
+        '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', audio_input,  # Очищене аудіо (stdin або файл)
+        '-map', '0:v:0', '-map', '1:a:0',
+        '-c:v', 'copy',  # Копіюємо відео без змін
+        '-c:a', 'aac',  # Кодек для аудіо
+        output_file
+    ]
+
+
+def build_video_command(input_file: str, output_file: str, audio_input: str = 'pipe:0',
+                        watermark_image: Optional[str] = None,
+                        watermark_position: str = WATERMARK_POSITION) -> List[str]:
+    """
+    ffmpeg command that writes the enhanced video.
+
+    Without a watermark this is ``build_mux_command`` (the video stream is
+    copied); with one it is ``add_watermark.build_finish_command``, which
+    overlays the image and replaces the audio in a single encode.
+    """
+    if watermark_image is None:
+        return build_mux_command(input_file, output_file, audio_input=audio_input)
+    return build_finish_command(input_file, audio_input, output_file, watermark_image, watermark_position,
+                                audio_format='f32le', sample_rate=SAMPLE_RATE)
+
+
+def result_kind(operation: str, watermark_image: Optional[str] = None,
+                watermark_position: str = WATERMARK_POSITION) -> str:
+    """Cache kind of a final result; a watermarked video is a different result than a plain one."""
+    if operation != 'enhance_video' or watermark_image is None:
+        return operation
+    return f"{operation}:watermark:{file_digest(watermark_image)}:{watermark_position}"
+
+
+def enhance_video_stream(model, input_file: str, output_file: str, profile: str = DEFAULT_PROFILE,
+                         block_size: int = BLOCK_SIZE, progress: Optional[Callable[[float], None]] = None,
+                         watermark_image: Optional[str] = None, watermark_position: str = WATERMARK_POSITION) -> None:
+    """
+    Replace the audio of a video with its denoised version without intermediate files.
+
+    One ffmpeg process decodes the audio to a pipe, the chunked denoiser
+    processes it block by block and a second ffmpeg process reads the denoised
+    samples from stdin, copies the original video stream and muxes both. All
+    three stages run concurrently, so throughput is limited by the model and
+    only the final video is written to disk.
+
+    Args:
+        model (tf.keras.Model): Trained noise reduction model.
+        input_file (str): Path to the noisy video.
+        output_file (str): Path of the resulting video.
+        profile (str): Key of ``denoise_audio.MODEL_PROFILES`` describing the model.
+        block_size (int): Number of samples decoded per block.
+        progress (Optional[Callable[[float], None]]): Called with the number of
+            seconds of audio denoised so far.
+        watermark_image (Optional[str]): Image overlaid on the video in the same
+            ffmpeg pass (the video is then re-encoded instead of copied).
+        watermark_position (str): Overlay position ``X:Y``.
+    """
+    denoiser = StreamingDenoiser(model, profile=profile)
+    command = build_video_command(input_file, output_file, 'pipe:0', watermark_image, watermark_position)
+    encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+    written = 0
+    try:
+        for samples in denoiser.denoise_blocks(read_audio_blocks(input_file, block_size=block_size)):
+            with span('mux'):
+                encoder.stdin.write(samples.astype('<f4').tobytes())
+            written += len(samples)
+            if progress is not None:
+                progress(written / SAMPLE_RATE)
+        encoder.stdin.close()
+    except BaseException:
+        encoder.kill()
+        raise
+    finally:
+        with span('mux'):
+            encoder.wait()
+    if encoder.returncode != 0:
+        raise subprocess.CalledProcessError(encoder.returncode, command)
+
+
+def denoise_to_pcm(model, input_file: str, pcm_file: str, profile: str = DEFAULT_PROFILE,
+                   block_size: int = BLOCK_SIZE, progress: Optional[Callable[[float], None]] = None) -> None:
+    """
+    Denoise the audio of a media file into a raw little-endian float32 mono file.
+
+    The raw file is what ``process_media_cached`` keeps, so both enhance
+    operations can be rebuilt from it without the model.
+    """
+    denoiser = StreamingDenoiser(model, profile=profile)
+    written = 0
+    with open(pcm_file, 'wb') as output:
+        for samples in denoiser.denoise_blocks(read_audio_blocks(input_file, block_size=block_size)):
+            with span('encode'):
+                output.write(samples.astype('<f4').tobytes())
+            written += len(samples)
+            if progress is not None:
+                progress(written / SAMPLE_RATE)
+
+
+@span('encode')
+def pcm_to_wav(pcm_file: str, output_file: str) -> None:
+    """Write a raw float32 mono file at ``SAMPLE_RATE`` as a WAV file."""
+    with sf.SoundFile(output_file, 'w', samplerate=SAMPLE_RATE, channels=1) as output:
+        for samples in read_pcm_file_blocks(pcm_file):
+            output.write(samples)
+
+
+def process_media_cached(cache: ResultCache, operation: str, input_file: str, output_file: str, model_path: str,
+                         profile: str = DEFAULT_PROFILE, progress: Optional[Callable[[float], None]] = None,
+                         model=None, input_digest: Optional[str] = None, watermark_image: Optional[str] = None,
+                         watermark_position: str = WATERMARK_POSITION) -> str:
+    """
+    ``process_media`` backed by a content-addressed ``ResultCache``.
+
+    Final results are cached per operation, so a repeated request is a file
+    copy. The denoised audio is cached as raw PCM as well: "Enhance audio"
+    and "Enhance audio on video" of the same clip share it, and the second one
+    only needs a WAV write or an ffmpeg stream copy instead of the model.
+
+    Args:
+        cache (ResultCache): Cache to use.
+        input_digest (Optional[str]): ``result_cache.file_digest`` of the input if already known.
+        Other arguments as in ``process_media``.
+
+    Returns:
+        str: ``output_file``.
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+
+    with span('cache'):
+        input_digest = input_digest or file_digest(input_file)
+        version = '' if operation == 'extract_audio' else model_version(resolve_model_path(model_path)[0], profile)
+        result_key = cache.key(input_digest, version, result_kind(operation, watermark_image, watermark_position))
+        if cache.fetch(result_key, OPERATIONS[operation], output_file):
+            return output_file
+
+    if operation == 'extract_audio':
+        process_media(operation, input_file, output_file, model_path, profile)
+    else:
+        pcm_key = cache.key(input_digest, version, 'denoised_pcm')
+        # Work on a private copy, another process may evict the cache entry meanwhile
+        pcm_file = output_file + '.f32le'
+        try:
+            with span('cache'):
+                cached = cache.fetch(pcm_key, '.f32le', pcm_file)
+            if not cached:
+                model = model if model is not None else get_model(model_path, profile)
+                denoise_to_pcm(model, input_file, pcm_file, profile=profile, progress=progress)
+                with span('cache'):
+                    cache.put(pcm_key, '.f32le', pcm_file)
+
+            if operation == 'enhance_audio':
+                pcm_to_wav(pcm_file, output_file)
+            else:
+                with span('mux'):
+                    subprocess.run(build_video_command(input_file, output_file, pcm_file, watermark_image,
+                                                       watermark_position), check=True)
+        finally:
+            if os.path.exists(pcm_file):
+                os.remove(pcm_file)
+
+    with span('cache'):
+        cache.put(result_key, OPERATIONS[operation], output_file)
+    return output_file
+
+
+def process_media(operation: str, input_file: str, output_file: str, model_path: str,
+                  profile: str = DEFAULT_PROFILE, progress: Optional[Callable[[float], None]] = None,
+                  model=None, cache_dir: Optional[str] = None, watermark_image: Optional[str] = None,
+                  watermark_position: str = WATERMARK_POSITION) -> str:
+    """
+    Run one of ``OPERATIONS`` on a media file, streaming between the stages.
+
+    Args:
+        operation (str): Key of ``OPERATIONS``.
+        input_file (str): Path to the uploaded video.
+        output_file (str): Path of the result.
+        model_path (str): Path to the ``.keras``/``.h5`` model.
+        profile (str): Key of ``denoise_audio.MODEL_PROFILES`` describing the model.
+        progress (Optional[Callable[[float], None]]): Called with the number of
+            seconds of audio denoised so far (enhance operations only).
+        model: Already loaded model (or predictor) to use instead of loading ``model_path``.
+        cache_dir (Optional[str]): Folder of a ``ResultCache`` to reuse earlier results (None - no cache).
+        watermark_image (Optional[str]): Image overlaid on "enhance_video" results while the audio is
+            replaced, in one ffmpeg pass (``add_watermark.build_finish_command``).
+        watermark_position (str): Overlay position ``X:Y``.
+
+    Returns:
+        str: ``output_file``.
+    """
+    if cache_dir is not None:
+        return process_media_cached(get_cache(cache_dir), operation, input_file, output_file, model_path, profile,
+                                    progress=progress, model=model, watermark_image=watermark_image,
+                                    watermark_position=watermark_position)
+
+    if operation == 'extract_audio':
+        with span('demux'):
+            split_video_audio_single_pass(input_file, None, output_file, audio_format='mp3')
+        # The ffmpeg helper only prints its errors, so check that the file was created
+        if not os.path.exists(output_file):
+            raise RuntimeError(f"Audio extraction failed: {output_file} was not created")
+    elif operation == 'enhance_audio':
+        model = model if model is not None else get_model(model_path, profile)
+        denoise_file(model, input_file, output_file, profile=profile, progress=progress)
+    elif operation == 'enhance_video':
+        model = model if model is not None else get_model(model_path, profile)
+        enhance_video_stream(model, input_file, output_file, profile=profile, progress=progress,
+                             watermark_image=watermark_image, watermark_position=watermark_position)
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+    return output_file
@@ -0,0 +1,174 @@
+import bisect
+import threading
+import time
+from contextlib import ContextDecorator, contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+# Configuration parameters
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+# Per-thread stage totals of the job that is being timed (see job_timings)
+_local = threading.local()
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram with one label (e.g. ``stage``).
+
+    Only the standard library is used, so the web app, the bot and the model
+    daemon can all import this module without extra dependencies.
+    """
+    def __init__(self, name: str, help_text: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.series: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_value: str, value: float) -> None:
+        with self.lock:
+            series = self.series.setdefault(label_value, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_value, series in sorted(self.series.items()):
+                label = f'{self.label}="{label_value}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['counts']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{label}}} {series["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    """Prometheus-style counter with one label."""
+    def __init__(self, name: str, help_text: str, label: str):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.values: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_value: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for label_value, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Metrics shared by every part of the pipeline
+STAGE_SECONDS = Histogram('mldan_stage_seconds', 'Time spent in a pipeline stage per job.', 'stage')
+JOB_SECONDS = Histogram('mldan_job_seconds', 'Total processing time per job.', 'operation')
+REQUEST_SECONDS = Histogram('mldan_request_seconds', 'HTTP request latency.', 'endpoint')
+WINDOWS = Counter('mldan_windows_total', 'Model windows by outcome (denoised by the model or skipped as silence).',
+                  'result')
+
+
+def record(stage: str, seconds: float) -> None:
+    """Add time to a stage: to the current job if one is being timed, otherwise as its own observation."""
+    totals = getattr(_local, 'totals', None)
+    if totals is not None:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    else:
+        STAGE_SECONDS.observe(stage, seconds)
+
+
+class span(ContextDecorator):
+    """
+    Time a block or a function as a pipeline stage.
+
+    Example:
+        with span('predict'):
+            predictions = model.predict(batch)
+
+        @span('encode')
+        def write_wav(...): ...
+    """
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def _recreate_cm(self):
+        # A decorated function may run in several threads at once, every call needs its own start time
+        return span(self.stage)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def timed_iter(iterable: Iterable, stage: str) -> Iterator:
+    """Yield from ``iterable`` and count the time spent producing each item as ``stage``."""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            record(stage, time.perf_counter() - start)
+            return
+        record(stage, time.perf_counter() - start)
+        yield item
+
+
+@contextmanager
+def job_timings(operation: Optional[str] = None, observe: bool = True) -> Iterator[Dict[str, float]]:
+    """
+    Sum all spans of the current thread into per-stage totals of one job.
+
+    Streaming stages run many times per job (once per block or window), so
+    their totals, not the individual calls, are observed when the block exits.
+
+    Args:
+        operation (Optional[str]): Label of the job in ``JOB_SECONDS`` (None - stages only).
+        observe (bool): False to only collect the totals, e.g. in a worker
+            process that sends them back to the process serving ``/metrics``.
+
+    Yields:
+        Dict[str, float]: Stage totals, filled in while the job runs.
+    """
+    previous = getattr(_local, 'totals', None)
+    totals = _local.totals = {}
+    start = time.perf_counter()
+    try:
+        yield totals
+    finally:
+        _local.totals = previous
+        if observe:
+            observe_job(totals, operation, time.perf_counter() - start)
+
+
+def observe_job(totals: Dict[str, float], operation: Optional[str] = None, seconds: Optional[float] = None) -> None:
+    """Observe the stage totals of a job (e.g. ones sent back by a worker process)."""
+    for stage, stage_seconds in totals.items():
+        STAGE_SECONDS.observe(stage, stage_seconds)
+    if operation is not None and seconds is not None:
+        JOB_SECONDS.observe(operation, seconds)
+
+
+def format_metric(name: str, kind: str, help_text: str, value: float) -> str:
+    """One gauge or counter in Prometheus text format."""
+    return f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n{name} {value}\n"
+
+
+def render(collectors: Sequence = (STAGE_SECONDS, JOB_SECONDS, REQUEST_SECONDS, WINDOWS)) -> str:
+    """All histograms and counters of this process in Prometheus text format."""
+    return ''.join(collector.render() for collector in collectors)
@@ -0,0 +1,41 @@
+import tensorflow as tf
+from tensorflow.keras.layers import Layer
+
+
+class ResizeLayer(Layer):
+    """
+    Resize layer used by ML-DAN v1.0 - v3.x (bilinear ``tf.image.resize``).
+    """
+    def __init__(self, target_height, target_width, **kwargs):
+        super(ResizeLayer, self).__init__(**kwargs)
+        self.target_height = target_height
+        self.target_width = target_width
+
+    def call(self, inputs):
+        return tf.image.resize(inputs, [self.target_height, self.target_width])
+
+    def get_config(self):
+        config = super(ResizeLayer, self).get_config()
+        config.update({
+            "target_height": self.target_height,
+            "target_width": self.target_width,
+        })
+        return config
+
+
+class CropOrPadResizeLayer(ResizeLayer):
+    """
+    Resize layer used by ML-DAN v4.0 (``tf.image.resize_with_crop_or_pad``).
+
+    It is saved in the model config under the same name ``ResizeLayer``, so the
+    right implementation has to be chosen through ``custom_objects`` on load.
+    """
+    def call(self, inputs):
+        return tf.image.resize_with_crop_or_pad(inputs, self.target_height, self.target_width)
+
+
+# Custom layer implementation for every ResizeLayer variant
+RESIZE_LAYERS = {
+    'resize': ResizeLayer,
+    'crop_or_pad': CropOrPadResizeLayer,
+}
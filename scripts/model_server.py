@@ -0,0 +1,405 @@
+import argparse
+import hmac
+import http.client
+import ipaddress
+import json
+import os
+import secrets
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+
+# Configuration parameters
+SERVER_ADDRESS = 'http://127.0.0.1:8765'  # Default address; 'unix:///path/to/socket' for a Unix socket
+MAX_JOBS = 4              # Jobs processed at the same time (their windows share model batches)
+JOB_TTL = 60 * 60         # Seconds to keep the status of finished jobs
+POLL_INTERVAL = 0.5       # Seconds between status requests of ModelClient.process
+SPOOL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'spool'))  # Only files in here are processed
+TOKEN_FILE = '.model_server_token'  # Shared secret of the daemon and its clients (inside the spool directory)
+TOKEN_HEADER = 'X-Model-Token'
+
+# Only the standard library is imported at module level, so front-ends can use
+# ModelClient without loading numpy or TensorFlow.
+
+
+def load_token(spool_dir: str = SPOOL_DIR, create: bool = False) -> str:
+    """
+    Read the shared token of the daemon from ``<spool_dir>/.model_server_token``.
+
+    The daemon creates the file (readable by its owner only) on start, so any
+    local process of the same user can authenticate, while a web page that
+    makes the browser send a request to the daemon cannot.
+
+    Args:
+        spool_dir (str): Spool directory of the daemon.
+        create (bool): Create a new token if there is none yet.
+    """
+    path = os.path.join(spool_dir, TOKEN_FILE)
+    if create and not os.path.exists(path):
+        os.makedirs(spool_dir, exist_ok=True)
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'w') as file:
+            file.write(secrets.token_hex(32))
+    with open(path, 'r') as file:
+        return file.read().strip()
+
+
+def check_loopback(host: Optional[str]) -> str:
+    """Return ``host`` if it is a loopback address, otherwise raise ValueError."""
+    host = host or '127.0.0.1'
+    if host != 'localhost':
+        try:
+            loopback = ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"The model server only listens on loopback addresses, not on {host}")
+    return host
+
+
+class ModelService:
+    """
+    One warm model shared by every job of the daemon.
+
+    The model is loaded once and wrapped in ``BatchPredictor`` (memory-bounded
+    chunks) and ``CoalescingPredictor`` (windows of concurrent jobs are merged
+    into one forward pass). Jobs run on a thread pool and only exchange file
+    paths with the clients, so the audio never goes over the socket.
+    """
+    def __init__(self, model_path: str, profile: str, max_jobs: int = MAX_JOBS, cache_dir: Optional[str] = None,
+                 spool_dir: str = SPOOL_DIR, watermark_image: Optional[str] = None):
+        from batch_inference import BatchPredictor, CoalescingPredictor
+        from inference_backends import load_inference_model
+
+        self.model_path = model_path
+        self.profile = profile
+        self.cache_dir = cache_dir
+        self.spool_dir = os.path.realpath(spool_dir)
+        self.watermark_image = watermark_image
+        self.predictor = CoalescingPredictor(BatchPredictor(load_inference_model(model_path, profile)))
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs)
+        self.jobs: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, operation: str, input_file: str, output_file: str) -> str:
+        """Queue a ``media_pipeline.process_media`` operation and return its job id."""
+        from media_pipeline import OPERATIONS
+
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {operation}")
+        for path in (input_file, output_file):
+            if not isinstance(path, str) or not os.path.isabs(path):
+                raise ValueError("input_file and output_file must be absolute paths")
+            # realpath also resolves symlinks and '..', so a path cannot leave the spool directory
+            if os.path.commonpath([self.spool_dir, os.path.realpath(path)]) != self.spool_dir:
+                raise ValueError(f"Files must be inside the spool directory {self.spool_dir}")
+
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        job = {'operation': operation, 'progress': 0.0, 'created': time.time()}
+        job['future'] = self.executor.submit(self._run, job, operation, input_file, output_file)
+        with self.lock:
+            self.jobs[job_id] = job
+        return job_id
+
+    def _run(self, job: Dict, operation: str, input_file: str, output_file: str) -> str:
+        from media_pipeline import process_media
+        from metrics import job_timings
+
+        def progress(seconds):
+            job['progress'] = seconds
+
+        with job_timings(operation):
+            return process_media(operation, input_file, output_file, self.model_path, self.profile,
+                                 progress=progress, model=self.predictor, cache_dir=self.cache_dir,
+                                 watermark_image=self.watermark_image)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Public status of a job or None for unknown ids."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+
+        future = job['future']
+        if future.done():
+            state = 'failed' if future.exception() else 'done'
+        else:
+            state = 'running' if future.running() else 'queued'
+        status = {'job_id': job_id, 'operation': job['operation'], 'status': state, 'progress': job['progress']}
+        if state == 'failed':
+            status['error'] = str(future.exception())
+        return status
+
+    def health(self) -> Dict:
+        """Model and load information for ``GET /health``."""
+        from media_pipeline import get_cache
+
+        with self.lock:
+            active = sum(not job['future'].done() for job in self.jobs.values())
+        return {
+            'cache': get_cache(self.cache_dir).stats() if self.cache_dir else None,
+            'model_path': self.model_path,
+            'profile': self.profile,
+            'active_jobs': active,
+            'model_calls': self.predictor.model_calls,
+            'windows': self.predictor.windows,
+        }
+
+    def metrics(self) -> str:
+        """Stage histograms, load and cache counters for ``GET /metrics`` in Prometheus text format."""
+        import metrics
+
+        health = self.health()
+        text = metrics.render()
+        text += metrics.format_metric('mldan_active_jobs', 'gauge', 'Jobs queued or running in the daemon.',
+                                      health['active_jobs'])
+        text += metrics.format_metric('mldan_model_calls_total', 'counter', 'Forward passes of the shared model.',
+                                      health['model_calls'])
+        text += metrics.format_metric('mldan_model_windows_total', 'counter', 'Windows denoised by the model.',
+                                      health['windows'])
+        if health['cache'] is not None:
+            text += metrics.format_metric('mldan_cache_hit_ratio', 'gauge', 'Result cache hit rate.',
+                                          health['cache']['hit_rate'])
+        return text
+
+    def cleanup(self) -> None:
+        """Forget finished jobs older than ``JOB_TTL``."""
+        deadline = time.time() - JOB_TTL
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items()
+                           if job['future'].done() and job['created'] < deadline]:
+                del self.jobs[job_id]
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the daemon.
+
+    POST /jobs           {"operation", "input_file", "output_file"} -> 202 {"job_id"}
+    GET  /jobs/<job_id>  -> {"status": queued|running|done|failed, "progress": seconds, "error"}
+    GET  /health         -> model and load information
+    GET  /metrics        -> stage timings and counters in Prometheus text format
+
+    Job requests need the ``X-Model-Token`` header (see ``load_token``) and
+    POST bodies must be sent as ``application/json``. A browser cannot add
+    either to a cross-origin request without a CORS preflight, which the
+    daemon does not answer.
+    """
+    service: ModelService = None
+    token: str = None
+
+    def _send_json(self, code: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        if hmac.compare_digest(self.headers.get(TOKEN_HEADER, ''), self.token):
+            return True
+        self._send_json(401, {'error': 'missing or wrong token'})
+        return False
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.service.health())
+        elif self.path == '/metrics':
+            body = self.service.metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.startswith('/jobs/'):
+            if not self._authorized():
+                return
+            status = self.service.status(self.path[len('/jobs/'):])
+            if status is None:
+                self._send_json(404, {'error': 'unknown job'})
+            else:
+                self._send_json(200, status)
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/jobs':
+            self._send_json(404, {'error': 'not found'})
+            return
+        if self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            self._send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+        if not self._authorized():
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            job_id = self.service.submit(request['operation'], request['input_file'], request['output_file'])
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+        self._send_json(202, {'job_id': job_id})
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+
+class ThreadingHTTPServerV6(ThreadingHTTPServer):
+    address_family = socket.AF_INET6
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def serve(model_path: str, profile: str, address: str = SERVER_ADDRESS, max_jobs: int = MAX_JOBS,
+          cache_dir: Optional[str] = None, spool_dir: str = SPOOL_DIR, watermark_image: Optional[str] = None) -> None:
+    """
+    Load the model and serve jobs until interrupted.
+
+    Args:
+        model_path (str): Path to the ``.keras``/``.h5`` model.
+        profile (str): Key of ``denoise_audio.MODEL_PROFILES`` describing the model.
+        address (str): ``http://127.0.0.1:<port>`` or ``unix:///path/to/socket``.
+        max_jobs (int): Jobs processed at the same time.
+        cache_dir (Optional[str]): Folder of a ``ResultCache`` shared with the front-ends (None - no cache).
+        spool_dir (str): Only files inside this folder are read or written; it also holds the token file.
+        watermark_image (Optional[str]): Image overlaid on "enhance_video" results (None - no watermark).
+    """
+    url = urlparse(address)
+    if url.scheme != 'unix':
+        check_loopback(url.hostname)
+    ModelRequestHandler.token = load_token(spool_dir, create=True)
+    ModelRequestHandler.service = ModelService(model_path, profile, max_jobs, cache_dir, spool_dir, watermark_image)
+
+    if url.scheme == 'unix':
+        if os.path.exists(url.path):
+            os.remove(url.path)
+        server = ThreadingUnixHTTPServer(url.path, ModelRequestHandler)
+        os.chmod(url.path, 0o600)  # Jobs read and write local files, so only the owner may connect
+    else:
+        # Loopback only (checked above): jobs reference local files and must not be reachable from the network
+        host = check_loopback(url.hostname)
+        server_class = ThreadingHTTPServer if ':' not in host else ThreadingHTTPServerV6
+        server = server_class((host, url.port or 80), ModelRequestHandler)
+
+    print(f"Модель {model_path} завантажена, сервер слухає {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if url.scheme == 'unix' and os.path.exists(url.path):
+            os.remove(url.path)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """``http.client`` connection over a Unix domain socket."""
+    def __init__(self, path: str, timeout: float = 60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ModelClient:
+    """
+    Thin client of the model daemon used by the web app, the bot and the desktop app.
+
+    The token is read from the spool directory of the daemon, and the files
+    of a job must be inside that directory.
+
+    Example:
+        client = ModelClient('http://127.0.0.1:8765')
+        client.process('enhance_audio', '/abs/path/spool/in.mp4', '/abs/path/spool/out.wav')
+    """
+    def __init__(self, address: str = SERVER_ADDRESS, timeout: float = 60, spool_dir: str = SPOOL_DIR,
+                 token: Optional[str] = None):
+        self.url = urlparse(address)
+        self.timeout = timeout
+        self.token = token or load_token(spool_dir)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        if self.url.scheme == 'unix':
+            connection = UnixHTTPConnection(self.url.path, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+        try:
+            body = json.dumps(payload).encode('utf-8') if payload is not None else None
+            headers = {'Content-Type': 'application/json', TOKEN_HEADER: self.token}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            result = json.loads(response.read() or b'{}')
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(f"Model server error {response.status}: {result.get('error')}")
+        return result
+
+    def health(self) -> Dict:
+        return self._request('GET', '/health')
+
+    def submit(self, operation: str, input_file: str, output_file: str) -> str:
+        """Queue a job on the daemon and return its id."""
+        payload = {'operation': operation, 'input_file': os.path.abspath(input_file),
+                   'output_file': os.path.abspath(output_file)}
+        return self._request('POST', '/jobs', payload)['job_id']
+
+    def status(self, job_id: str) -> Dict:
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def process(self, operation: str, input_file: str, output_file: str,
+                progress: Optional[Callable[[float], None]] = None, poll_interval: float = POLL_INTERVAL) -> str:
+        """
+        Run a job on the daemon and wait for it, like ``media_pipeline.process_media``.
+
+        Args:
+            operation (str): Key of ``media_pipeline.OPERATIONS``.
+            input_file (str): Path to the input file.
+            output_file (str): Path of the result (written by the daemon).
+            progress (Optional[Callable[[float], None]]): Called with the number
+                of seconds of audio denoised so far.
+            poll_interval (float): Seconds between status requests.
+
+        Returns:
+            str: ``output_file``.
+        """
+        job_id = self.submit(operation, input_file, output_file)
+        while True:
+            status = self.status(job_id)
+            if status['status'] == 'done':
+                return output_file
+            if status['status'] == 'failed':
+                raise RuntimeError(status.get('error'))
+            if progress is not None and status['progress']:
+                progress(status['progress'])
+            time.sleep(poll_interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Keep an ML-DAN model loaded and serve denoising jobs locally.')
+    parser.add_argument('--model', required=True, help='path to the .keras/.h5 model')
+    parser.add_argument('--profile', default='v4', help='model generation (see denoise_audio.MODEL_PROFILES)')
+    parser.add_argument('--address', default=SERVER_ADDRESS, help='http://127.0.0.1:<port> or unix:///path/to/socket')
+    parser.add_argument('--max-jobs', type=int, default=MAX_JOBS, help='jobs processed at the same time')
+    parser.add_argument('--cache-dir', default=None, help='result cache folder, e.g. spool/cache')
+    parser.add_argument('--spool-dir', default=SPOOL_DIR, help='only files inside this folder are processed')
+    parser.add_argument('--watermark', default=None, help='image overlaid on enhanced videos')
+    args = parser.parse_args()
+
+    serve(args.model, args.profile, args.address, args.max_jobs, args.cache_dir, args.spool_dir, args.watermark)
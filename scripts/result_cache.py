@@ -0,0 +1,184 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from typing import BinaryIO, Dict, Optional
+
+# Configuration parameters
+MAX_CACHE_MB = 2048       # Total size of the cache before the least recently used entries are evicted
+HASH_CHUNK_SIZE = 1024 * 1024  # Bytes hashed per read
+RESCAN_INTERVAL = 300     # Seconds after which ``put`` rescans the cache folder even if its own size estimate fits
+
+
+def stream_digest(stream: BinaryIO, output: Optional[BinaryIO] = None) -> str:
+    """
+    SHA-256 of a binary stream, optionally copying it to ``output`` in the same pass.
+
+    Args:
+        stream (BinaryIO): Stream to hash (e.g. an upload).
+        output (Optional[BinaryIO]): File to write the data to while hashing.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+        if output is not None:
+            output.write(chunk)
+    return digest.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content."""
+    with open(path, 'rb') as file:
+        return stream_digest(file)
+
+
+def model_version(model_path: str, profile: str) -> str:
+    """
+    Identifier of a model file that changes whenever the file is replaced.
+
+    Name, size and modification time are used instead of hashing the weights,
+    so computing it costs one ``stat`` call.
+    """
+    stat = os.stat(model_path)
+    return f"{os.path.basename(model_path)}:{stat.st_size}:{stat.st_mtime_ns}:{profile}"
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache with size-bounded LRU eviction.
+
+    Entries are files named after ``key(input digest, model version, kind)``,
+    so the same clip processed by the same model is found regardless of the
+    upload name. Reading an entry refreshes its modification time, which is
+    the LRU order used by ``evict``; that state lives on disk, so several
+    processes (web workers, the bot, the model daemon) can share one cache.
+    Hit/miss counters are per process.
+
+    ``put`` does not walk the folder every time: it adds the new entry to the
+    size found by the last scan and rescans only when that estimate exceeds
+    the limit or ``RESCAN_INTERVAL`` has passed (entries added by other
+    processes are only seen by a rescan).
+    """
+    def __init__(self, cache_dir: str, max_mb: float = MAX_CACHE_MB):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.size_estimate: Optional[int] = None  # Total size seen by the last scan plus later puts
+        self.scanned_at = 0.0
+
+    @staticmethod
+    def key(input_digest: str, version: str, kind: str) -> str:
+        """Cache key of one result ``kind`` (operation name or intermediate) of an input."""
+        return hashlib.sha256(f"{input_digest}:{version}:{kind}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + extension)
+
+    def get(self, key: str, extension: str) -> Optional[str]:
+        """
+        Path of a cached entry (marked as recently used) or None.
+
+        Args:
+            key (str): Key from ``key``.
+            extension (str): File extension of the entry, e.g. ``'.wav'``.
+
+        Returns:
+            Optional[str]: Path inside the cache; do not modify or delete it.
+        """
+        path = self._path(key, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return path
+
+    def fetch(self, key: str, extension: str, output_file: str) -> bool:
+        """
+        Copy a cached entry to ``output_file``.
+
+        Returns:
+            bool: True on a hit, False if the entry is not cached.
+        """
+        path = self.get(key, extension)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, output_file)
+        except FileNotFoundError:
+            # Evicted by another process between get() and the copy
+            with self.lock:
+                self.hits -= 1
+                self.misses += 1
+            return False
+        return True
+
+    def put(self, key: str, extension: str, source_file: str) -> str:
+        """
+        Store a copy of ``source_file`` and evict old entries if the cache is too large.
+
+        Returns:
+            str: Path of the new entry.
+        """
+        path = self._path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        shutil.copyfile(source_file, tmp_path)
+        os.replace(tmp_path, path)  # Readers never see a half-written entry
+
+        with self.lock:
+            if self.size_estimate is not None:
+                self.size_estimate += os.path.getsize(path)
+            rescan = (self.size_estimate is None or self.size_estimate > self.max_bytes
+                      or time.monotonic() - self.scanned_at > RESCAN_INTERVAL)
+        if rescan:
+            self.evict(keep=path)
+        return path
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Delete least recently used entries until the cache fits into ``max_bytes``."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.part'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # Evicted by another process
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+        with self.lock:
+            self.size_estimate = total
+            self.scanned_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters of this process."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
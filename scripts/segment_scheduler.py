@@ -0,0 +1,188 @@
+import argparse
+import multiprocessing
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from denoise_audio import BLOCK_SIZE, DEFAULT_PROFILE, MODEL_PROFILES, SAMPLE_RATE, StreamingDenoiser
+from media_pipeline import OPERATIONS, build_mux_command, pcm_to_wav
+from metrics import span
+from split_video_audio import build_split_command
+
+# Configuration parameters
+SEGMENT_OVERLAP = 2.0        # Seconds of audio shared by neighbouring segments (crossfaded when stitching)
+MIN_SEGMENT_SECONDS = 30.0   # Shorter files are split into fewer segments, a segment must amortize its model load
+THREADS_PER_WORKER = 1       # Model threads per worker process, the parallelism comes from the segments
+
+# Model of the current worker process, loaded once by _init_worker
+_worker = {}
+
+
+def plan_segments(n_samples: int, n_segments: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Cut ``n_samples`` into ``n_segments`` equal parts, each extended by ``overlap`` samples on both sides.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) sample range of every segment; neighbouring
+        ranges share ``2 * overlap`` samples (less at the ends of the file).
+    """
+    # The core of every segment must be at least as long as the crossfades around it
+    n_segments = max(1, min(n_segments, n_samples // max(1, 2 * overlap)))
+    bounds = np.linspace(0, n_samples, n_segments + 1).astype(int)
+    return [(max(0, int(bounds[k]) - overlap), min(n_samples, int(bounds[k + 1]) + overlap))
+            for k in range(n_segments)]
+
+
+def stitch_segments(segments: List[Tuple[int, int]], segment_files: List[str], output_file: str,
+                    n_samples: int) -> None:
+    """
+    Join denoised segments into one raw float32 file with linear crossfades over the overlaps.
+
+    The fade-out of a segment and the fade-in of the next one cover the same
+    samples and add up to one, so there is neither a seam nor a level change.
+    """
+    if n_samples == 0:
+        open(output_file, 'wb').close()  # np.memmap cannot map an empty file
+        return
+
+    output = np.memmap(output_file, dtype='<f4', mode='w+', shape=(n_samples,))
+    for k, ((start, end), segment_file) in enumerate(zip(segments, segment_files)):
+        weight = np.ones(end - start, dtype=np.float32)
+        fade_in = segments[k - 1][1] - start if k > 0 else 0
+        fade_out = end - segments[k + 1][0] if k + 1 < len(segments) else 0
+        if fade_in > 0:
+            weight[:fade_in] = (np.arange(fade_in, dtype=np.float32) + 0.5) / fade_in
+        if fade_out > 0:
+            weight[-fade_out:] = 1.0 - (np.arange(fade_out, dtype=np.float32) + 0.5) / fade_out
+
+        samples = np.memmap(segment_file, dtype='<f4', mode='r') if os.path.getsize(segment_file) else np.zeros(0)
+        output[start:start + len(samples)] += samples * weight[:len(samples)]
+    output.flush()
+
+
+def _init_worker(model_path: str, profile: str, threads: int) -> None:
+    # Limit the model's own thread pools before TensorFlow/ONNX Runtime is imported,
+    # otherwise every worker would start one thread per core
+    for variable in ('OMP_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        os.environ[variable] = str(threads)
+    from inference_backends import load_inference_model
+
+    _worker['model'] = load_inference_model(model_path, profile, num_threads=threads)
+    _worker['profile'] = profile
+
+
+def _denoise_segment(pcm_file: str, start: int, end: int, output_file: str) -> int:
+    """Worker entry point: denoise samples ``start:end`` of a raw float32 file into ``output_file``."""
+    samples = np.memmap(pcm_file, dtype='<f4', mode='r')[start:end]
+    denoiser = StreamingDenoiser(_worker['model'], profile=_worker['profile'])
+    blocks = (samples[i:i + BLOCK_SIZE] for i in range(0, len(samples), BLOCK_SIZE))
+    with open(output_file, 'wb') as output:
+        for denoised in denoiser.denoise_blocks(blocks):
+            output.write(denoised.astype('<f4').tobytes())
+    return end - start
+
+
+def denoise_pcm_segmented(pcm_file: str, output_file: str, model_path: str, profile: str = DEFAULT_PROFILE,
+                          max_workers: Optional[int] = None, overlap: float = SEGMENT_OVERLAP,
+                          progress: Optional[Callable[[float], None]] = None) -> None:
+    """
+    Denoise a raw float32 mono file by splitting it into overlapping segments processed in parallel.
+
+    Every worker process loads the model once and denoises whole segments, so
+    one long file keeps all cores busy. Segments are read from ``pcm_file``
+    through a memory map and written to temporary files next to
+    ``output_file``, then crossfaded together by ``stitch_segments``.
+
+    Args:
+        pcm_file (str): Raw little-endian float32 mono audio at ``SAMPLE_RATE``.
+        output_file (str): Path of the denoised raw float32 file.
+        model_path (str): Path to the ``.keras``/``.h5`` model.
+        profile (str): Key of ``MODEL_PROFILES`` describing the model.
+        max_workers (Optional[int]): Worker processes (None - one per CPU core).
+        overlap (float): Seconds added on each side of a segment.
+        progress (Optional[Callable[[float], None]]): Called with the number of
+            seconds of audio denoised so far after every finished segment.
+    """
+    n_samples = os.path.getsize(pcm_file) // 4
+    max_workers = max_workers or os.cpu_count()
+    n_segments = min(max_workers, max(1, int(n_samples / SAMPLE_RATE / MIN_SEGMENT_SECONDS)))
+    segments = plan_segments(n_samples, n_segments, int(overlap * SAMPLE_RATE))
+
+    work_dir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(os.path.abspath(output_file)))
+    segment_files = [os.path.join(work_dir, f"{k}.f32le") for k in range(len(segments))]
+    try:
+        # Spawned workers: TensorFlow must not be inherited through fork
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(segments), mp_context=context, initializer=_init_worker,
+                                 initargs=(model_path, profile, THREADS_PER_WORKER)) as executor:
+            futures = [executor.submit(_denoise_segment, pcm_file, start, end, segment_file)
+                       for (start, end), segment_file in zip(segments, segment_files)]
+            done = 0
+            for future in as_completed(futures):
+                done += future.result()
+                if progress is not None:
+                    progress(min(done, n_samples) / SAMPLE_RATE)
+
+        with span('stitch'):
+            stitch_segments(segments, segment_files, output_file, n_samples)
+    finally:
+        for segment_file in segment_files:
+            if os.path.exists(segment_file):
+                os.remove(segment_file)
+        os.rmdir(work_dir)
+
+
+def process_media_segmented(operation: str, input_file: str, output_file: str, model_path: str,
+                            profile: str = DEFAULT_PROFILE, max_workers: Optional[int] = None,
+                            overlap: float = SEGMENT_OVERLAP,
+                            progress: Optional[Callable[[float], None]] = None) -> str:
+    """
+    ``media_pipeline.process_media`` for one long file, parallelized over time segments.
+
+    The audio is demuxed once to raw PCM (``split_video_audio.build_split_command``),
+    denoised by ``denoise_pcm_segmented`` and then written as WAV or muxed with
+    the original video stream like ``combine_video_audio``.
+
+    Returns:
+        str: ``output_file``.
+    """
+    if operation not in ('enhance_audio', 'enhance_video'):
+        raise ValueError(f"Operation {operation} does not use the model, run media_pipeline.process_media instead"
+                         if operation in OPERATIONS else f"Unknown operation: {operation}")
+
+    noisy_file = output_file + '.noisy.f32le'
+    denoised_file = output_file + '.f32le'
+    try:
+        with span('demux'):
+            subprocess.run(build_split_command(input_file, None, noisy_file, 'f32le', SAMPLE_RATE), check=True)
+        denoise_pcm_segmented(noisy_file, denoised_file, model_path, profile, max_workers, overlap, progress)
+        if operation == 'enhance_audio':
+            pcm_to_wav(denoised_file, output_file)
+        else:
+            with span('mux'):
+                subprocess.run(build_mux_command(input_file, output_file, audio_input=denoised_file), check=True)
+    finally:
+        for path in (noisy_file, denoised_file):
+            if os.path.exists(path):
+                os.remove(path)
+    return output_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Denoise one long audio/video file on all CPU cores.')
+    parser.add_argument('input_file', help='noisy audio or video file')
+    parser.add_argument('output_file', help='where to save the result (.wav or a video file)')
+    parser.add_argument('--model', required=True, help='path to the .keras/.h5 model')
+    parser.add_argument('--profile', default=DEFAULT_PROFILE, choices=sorted(MODEL_PROFILES), help='model generation')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU core)')
+    parser.add_argument('--overlap', type=float, default=SEGMENT_OVERLAP, help='seconds crossfaded between segments')
+    args = parser.parse_args()
+
+    operation = 'enhance_audio' if args.output_file.lower().endswith('.wav') else 'enhance_video'
+    process_media_segmented(operation, args.input_file, args.output_file, args.model, args.profile,
+                            max_workers=args.workers, overlap=args.overlap)
+    print(f"Результат збережено у {args.output_file}")
@@ -1,6 +1,10 @@
 import subprocess
 import os
 from datetime import datetime
+from typing import List, Optional
+
+# Формати сирого PCM, які модель може читати без декодування
+PCM_FORMATS = {'f32le', 's16le'}
 
 
 def change_to_script_directory():
@@ -26,6 +30,35 @@ def split_video_audio(input_file: str, video_output: str, audio_output: str):
     except subprocess.CalledProcessError as e:
         print(f"Помилка при розділенні файлу: {e}")
 
+def build_split_command(input_file: str, video_output: Optional[str], audio_output: str,
+                        audio_format: str = 'mp3', sample_rate: int = 16000) -> List[str]:
+    # Одна команда ffmpeg з двома виходами: вхідний файл читається і демультиплексується один раз
+    command = ['ffmpeg', '-loglevel', 'warning', '-y', '-i', input_file]
+    if video_output is not None:
+        command += ['-map', '0:v:0', '-an', '-vcodec', 'copy', video_output]  # Відеоряд без перекодування
+
+    command += ['-map', '0:a:0', '-vn']
+    if audio_format in PCM_FORMATS:
+        # Сирий моно PCM з частотою моделі: без MP3 і без повторного декодування/ресемплінгу
+        command += ['-ac', '1', '-ar', str(sample_rate), '-f', audio_format, audio_output]
+    else:
+        command += ['-acodec', 'libmp3lame', audio_output]
+    return command
+
+def split_video_audio_single_pass(input_file: str, video_output: Optional[str], audio_output: str,
+                                  audio_format: str = 'mp3', sample_rate: int = 16000):
+    # Розділення відео та аудіо одним процесом ffmpeg.
+    # audio_format: 'mp3' або сирий PCM ('f32le', 's16le').
+    # Щоб читати PCM через пайп, запустіть build_split_command(..., 'pipe:1', 'f32le') через subprocess.Popen
+    try:
+        subprocess.run(build_split_command(input_file, video_output, audio_output, audio_format, sample_rate), check=True)
+
+        if video_output is not None:
+            print(f"Відеоряд збережено у {video_output}")
+        print(f"Аудіодоріжку збережено у {audio_output}")
+    except subprocess.CalledProcessError as e:
+        print(f"Помилка при розділенні файлу: {e}")
+
 if __name__ == '__main__':
     input_file = '..\\sources\\videoplayback.mp4'
     timestamp = get_timestamp()  # Отримуємо дату та час
@@ -0,0 +1,193 @@
+import math
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import tensorflow as tf
+
+from blend_dataset import NOISE_CACHE, build_noise_cache
+from denoise_audio import FIXED_LENGTH
+from feature_store import open_feature_store
+from featurizer import DEFAULT_PROFILE, MIN_DB, MODEL_PROFILES, SAMPLE_RATE, TOP_DB, mel_filterbank, n_features
+
+# Configuration parameters
+SNR_RANGE = (-5.0, 20.0)  # Signal-to-noise ratios (dB) drawn uniformly for every mixed example
+SHUFFLE_BUFFER = 256      # Examples shuffled after the files are cut into windows
+DECODE_CYCLE = 16         # Files decoded at the same time by the interleave
+
+
+class FeatureStoreSequence(tf.keras.utils.Sequence):
+    """
+    Keras data loader that reads training batches straight from a memory-mapped feature store.
+
+    Only the rows of the current batch are read from disk (and cast to
+    float32), so the size of the dataset is limited by the disk, not by RAM.
+
+    Example:
+        train = FeatureStoreSequence('../data/features', 'train', batch_size=BATCH_SIZE)
+        model.fit(train, validation_data=FeatureStoreSequence('../data/features', 'validation', shuffle=False))
+    """
+    def __init__(self, store_dir: str, split: str, batch_size: int = 32, shuffle: bool = True,
+                 indices: Optional[Sequence[int]] = None, seed: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.noisy, self.clean, self.manifest = open_feature_store(store_dir, split)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.order = np.arange(len(self.noisy)) if indices is None else np.asarray(indices)
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+    def __len__(self) -> int:
+        return math.ceil(len(self.order) / self.batch_size)
+
+    def __getitem__(self, index: int):
+        # Sorted indices turn the read into mostly sequential access of the mapped file
+        batch = np.sort(self.order[index * self.batch_size:(index + 1) * self.batch_size])
+        noisy = self.noisy[batch].astype(np.float32)[..., np.newaxis]
+        clean = self.clean[batch].astype(np.float32)[..., np.newaxis]
+        return noisy, clean
+
+    def on_epoch_end(self) -> None:
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+
+
+def _decode_audio(path: bytes) -> np.ndarray:
+    # soundfile decodes LibriSpeech FLAC directly; other sample rates are resampled like librosa.load does
+    import soundfile as sf
+
+    audio, sr = sf.read(path.decode('utf-8'), dtype='float32', always_2d=True)
+    audio = audio.mean(axis=1)
+    if sr != SAMPLE_RATE:
+        import librosa
+
+        audio = librosa.resample(audio, orig_sr=sr, target_sr=SAMPLE_RATE)
+    return audio.astype(np.float32)
+
+
+def tf_stft(signals: tf.Tensor, n_fft: int, hop_length: int) -> tf.Tensor:
+    """
+    In-graph equivalent of ``featurizer.stft`` (centered, zero-padded, periodic Hann window).
+
+    Args:
+        signals (tf.Tensor): Signals of shape (..., samples).
+
+    Returns:
+        tf.Tensor: complex64 tensor of shape (..., 1 + n_fft // 2, frames).
+    """
+    pad = [[0, 0]] * (len(signals.shape) - 1) + [[n_fft // 2, n_fft // 2]]
+    spectrum = tf.signal.stft(tf.pad(signals, pad), frame_length=n_fft, frame_step=hop_length, fft_length=n_fft,
+                              window_fn=tf.signal.hann_window)
+    return tf.linalg.matrix_transpose(spectrum)
+
+
+def tf_features(signals: tf.Tensor, profile: Dict, sr: int = SAMPLE_RATE) -> tf.Tensor:
+    """
+    In-graph equivalent of ``featurizer.featurize`` for one profile.
+
+    The mel filterbank is the same matrix as on the NumPy path (librosa's
+    Slaney filters, not ``tf.signal.linear_to_mel_weight_matrix``), so a model
+    trained on these features sees exactly what inference feeds it.
+
+    Args:
+        signals (tf.Tensor): Signals of shape (..., samples).
+        profile (Dict): Entry of ``MODEL_PROFILES``.
+        sr (int): Sample rate.
+
+    Returns:
+        tf.Tensor: Features of shape (..., n_features, frames).
+    """
+    magnitude = tf.abs(tf_stft(signals, profile['n_fft'], profile['hop_length']))
+    kind = profile['features']
+    if kind == 'stft':
+        return magnitude
+
+    power = tf.square(magnitude)
+    if kind == 'mel':
+        power = tf.matmul(tf.constant(mel_filterbank(sr, profile['n_fft'], profile['n_mels'])), power)
+    db = 10.0 * tf.math.log(tf.maximum(power, 1e-10)) / tf.math.log(10.0)
+    if kind == 'stft_db':
+        return tf.maximum(db, tf.reduce_max(db, axis=[-2, -1], keepdims=True) - TOP_DB)
+
+    # ref='max' + top_db, then normalize_db: (x + 80) / 80
+    db = db - tf.reduce_max(db, axis=[-2, -1], keepdims=True)
+    return (tf.maximum(db, -TOP_DB) - MIN_DB) / -MIN_DB
+
+
+def noise_mixing_dataset(clean_files: Sequence[str], noise_dir: str, cache_dir: str,
+                         profile: str = DEFAULT_PROFILE, batch_size: int = 32,
+                         fixed_length: int = FIXED_LENGTH, snr_range: Tuple[float, float] = SNR_RANGE,
+                         shuffle: bool = True, seed: Optional[int] = None) -> tf.data.Dataset:
+    """
+    Streaming (noisy, clean) training batches mixed on the fly instead of read from pre-blended files.
+
+    Clean files are decoded in parallel by an ``interleave`` and cut into
+    windows of ``fixed_length`` frames, so every second of a long file is
+    used. Each window gets a random slice of the noise cache
+    (``blend_dataset.build_noise_cache``, memory-mapped) at a random SNR, and
+    both sides are featurized in the graph. Nothing is blended to disk and
+    the corpus size is not limited by RAM.
+
+    Example:
+        train = noise_mixing_dataset(find_files(CLEAN_DIR, '.flac'), NOISE_DIR, '../data/cache')
+        model.fit(train, steps_per_epoch=STEPS, epochs=EPOCHS)
+
+    Args:
+        clean_files (Sequence[str]): Clean audio files.
+        noise_dir (str): Directory with noise ``.wav`` files.
+        cache_dir (str): Folder of the decoded noise cache.
+        profile (str): Key of ``MODEL_PROFILES``.
+        batch_size (int): Examples per batch.
+        fixed_length (int): Frames per example.
+        snr_range (Tuple[float, float]): Lowest and highest SNR in dB.
+        shuffle (bool): Shuffle the files every epoch and the windows in a buffer.
+        seed (Optional[int]): Seed of the file order, the noise slices and the SNRs.
+
+    Returns:
+        tf.data.Dataset: Repeating dataset of (noisy, clean) batches of shape
+        (batch, n_features, fixed_length, 1).
+    """
+    settings = MODEL_PROFILES[profile]
+    window = (fixed_length - 1) * settings['hop_length']  # Samples that give exactly fixed_length centered frames
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, NOISE_CACHE)
+    build_noise_cache(noise_dir, cache_path)
+    noise = np.load(cache_path, mmap_mode='r')  # Shared by the decode threads through the page cache
+
+    def noise_slice(offset):
+        # Loop the noise cache like mix_noise loops a short noise file
+        positions = (int(offset) + np.arange(window)) % len(noise)
+        return np.asarray(noise[positions], dtype=np.float32)
+
+    def windows(path):
+        audio = tf.numpy_function(_decode_audio, [path], tf.float32, stateful=False)
+        audio = tf.reshape(audio, [-1])
+        # The last, partial window is padded with silence; files shorter than a window still give one
+        return tf.data.Dataset.from_tensor_slices(tf.signal.frame(audio, window, window, pad_end=True))
+
+    def mix(clean):
+        offset = tf.random.uniform([], 0, len(noise), dtype=tf.int64, seed=seed)
+        noise_window = tf.reshape(tf.numpy_function(noise_slice, [offset], tf.float32), [window])
+        snr = tf.random.uniform([], snr_range[0], snr_range[1], seed=seed)
+
+        clean_power = tf.reduce_mean(tf.square(clean))
+        noise_power = tf.maximum(tf.reduce_mean(tf.square(noise_window)), 1e-10)
+        gain = tf.sqrt(clean_power / (noise_power * 10.0 ** (snr / 10.0)))
+        noisy = tf.clip_by_value(clean + gain * noise_window, -1.0, 1.0)
+
+        features = tf_features(tf.stack([noisy, clean]), settings)
+        features = tf.ensure_shape(features, [2, n_features(settings), fixed_length])[..., tf.newaxis]
+        return features[0], features[1]
+
+    dataset = tf.data.Dataset.from_tensor_slices(list(clean_files))
+    if shuffle:
+        dataset = dataset.shuffle(len(clean_files), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.repeat()
+    dataset = dataset.interleave(windows, cycle_length=DECODE_CYCLE, num_parallel_calls=tf.data.AUTOTUNE,
+                                 deterministic=False)
+    if shuffle:
+        dataset = dataset.shuffle(SHUFFLE_BUFFER, seed=seed)
+    dataset = dataset.map(mix, num_parallel_calls=tf.data.AUTOTUNE, deterministic=False)
+    return dataset.batch(batch_size, drop_remainder=True).prefetch(tf.data.AUTOTUNE)
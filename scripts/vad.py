@@ -0,0 +1,73 @@
+import numpy as np
+
+from featurizer import hann_window
+
+# Configuration parameters
+# The thresholds are starting values that have not been measured against the
+# training data yet, so skipping is opt-in (denoise_audio.SKIP_SILENCE).
+SILENCE_DB = -55.0        # Frames quieter than this (dBFS) count as silence
+FLUX_THRESHOLD = 0.25     # Normalized spectral flux above which a quiet frame still counts as an onset
+FLUX_MARGIN_DB = 15.0     # How far below SILENCE_DB a frame may be and still count through its flux
+MIN_ACTIVE_RATIO = 0.02   # A window with fewer active frames than this is skipped
+SILENCE_GAIN = 0.1        # Gain applied to skipped windows (-20 dB); 0 replaces them with silence
+
+
+def frame_energy_db(magnitude: np.ndarray, n_fft: int) -> np.ndarray:
+    """
+    Level of every STFT frame in dBFS (a full-scale sine is about -3 dBFS).
+
+    Args:
+        magnitude (np.ndarray): Linear STFT magnitude of shape (..., 1 + n_fft // 2, frames).
+        n_fft (int): FFT size of the STFT.
+
+    Returns:
+        np.ndarray: Energy of shape (..., frames).
+    """
+    # Parseval for a one-sided spectrum of a Hann-windowed frame
+    window_energy = float(np.sum(hann_window(n_fft).astype(np.float64) ** 2))
+    mean_square = 2.0 * np.sum(np.square(magnitude, dtype=np.float64), axis=-2) / (n_fft * window_energy)
+    return (10.0 * np.log10(np.maximum(mean_square, 1e-12))).astype(np.float32)
+
+
+def spectral_flux(magnitude: np.ndarray) -> np.ndarray:
+    """
+    Positive spectral flux between consecutive frames of unit-normalized spectra.
+
+    Normalizing makes the flux independent of the level: stationary noise
+    stays near 0 while speech onsets jump towards 1.
+
+    Returns:
+        np.ndarray: Flux of shape (..., frames); the first frame gets 0.
+    """
+    norm = np.linalg.norm(magnitude, axis=-2, keepdims=True)
+    spectra = magnitude / np.maximum(norm, 1e-12)
+    rise = np.maximum(np.diff(spectra, axis=-1), 0.0)
+    flux = np.linalg.norm(rise, axis=-2)
+    return np.concatenate([np.zeros(flux.shape[:-1] + (1,), dtype=flux.dtype), flux], axis=-1)
+
+
+def is_silent(magnitude: np.ndarray, n_fft: int, silence_db: float = SILENCE_DB,
+              flux_threshold: float = FLUX_THRESHOLD, min_active_ratio: float = MIN_ACTIVE_RATIO) -> bool:
+    """
+    Decide whether a model window can bypass the network.
+
+    A frame is active when it is louder than ``silence_db``, or when it is
+    at most ``FLUX_MARGIN_DB`` quieter and its spectral flux marks an onset
+    (quiet speech). Windows with fewer than ``min_active_ratio`` active
+    frames are silent.
+
+    Args:
+        magnitude (np.ndarray): Linear STFT magnitude of one window (bins, frames).
+        n_fft (int): FFT size of the STFT.
+
+    Returns:
+        bool: True if the window holds no speech.
+    """
+    if magnitude.shape[-1] == 0:
+        return True
+    energy = frame_energy_db(magnitude, n_fft)
+    active = energy > silence_db
+    candidates = ~active & (energy > silence_db - FLUX_MARGIN_DB)
+    if candidates.any():
+        active |= candidates & (spectral_flux(magnitude) > flux_threshold)
+    return bool(np.mean(active) < min_active_ratio)